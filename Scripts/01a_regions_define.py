@@ -4,80 +4,105 @@ import shapely
 from shapely.geometry import LineString
 from shapely.ops import split
 
+from eez_partition import eez_by_region
+from geometry_store import write_layer
+from network_topology import cluster_zones, derive_links, dissolve_clusters, manual_links, write_links
+
 ###########################################
 # INPUT
 ###########################################
+SPATIAL_MODE = "manual" #"manual": GADM level 1 with Hovedstaden split at SPLIT_LON (6 buses, hand-made links); "admin": one bus per GADM zone of ADMIN_LEVEL; "cluster": GADM zones of ADMIN_LEVEL clustered to N_BUSES
+ADMIN_LEVEL = 2 #GADM level used by "admin" and "cluster" (1 = regions, 2 = municipalities)
+N_BUSES = 12 #target number of buses for "cluster"
+CLUSTER_METHOD = "hierarchical" #"hierarchical": contiguous clusters; "kmeans": k-means of the zone representative points
+EEZ_METHOD = "vector" #"vector": sea goes to the closest representative point (Voronoi); "raster": to the closest region, fast for thousands of regions
+EEZ_RES = 1000 #in m, grid of the "raster" EEZ method
 SPLIT_LON = 13.4 #degree of longitude that splits the region Hovedstaden -> 13.4 approximately retrieved by google earth
 
 ###########################################
 # PATHS
 ###########################################
-GADM_PATH = "../Data/raw/gadm/gadm_410-levels-ADM_1-DNK.gpkg"
+GADM_PATH = "../Data/raw/gadm/gadm_410-levels-ADM_{level}-DNK.gpkg"
 EEZ_PATH = "../Data/raw/marineregions/eez_v11.gpkg"
 
 OUT_DIR = "../Data/processed"
 
 REPPOINTS_CSV_etr = f"{OUT_DIR}/region_centroids_etr.csv"
 REPPOINTS_CSV_wsg = f"{OUT_DIR}/region_centroids_wsg.csv"
-REGIONS_GEOJSON = f"{OUT_DIR}/dk_regions_etr.geojson"
-EEZ_BY_REGION_GEOJSON = f"{OUT_DIR}/dk_eez_by_region_etr.geojson"
+LINKS_CSV = f"{OUT_DIR}/region_links.csv"
 
 ###########################################
 # Load Data
 ###########################################
-regions = gpd.read_file(GADM_PATH)
+regions = gpd.read_file(GADM_PATH.format(level=1 if SPATIAL_MODE == "manual" else ADMIN_LEVEL))
 eez = gpd.read_file(EEZ_PATH)
 
 eez_dk = eez.loc[eez["ISO_TER1"] == "DNK"].copy()
 eez_dk = eez_dk.to_crs(regions.crs)
 
 ###########################################
-# Split Hovedstaden by a fixed longitude
+# Split Hovedstaden by a fixed longitude (manual) or build the buses from GADM zones
 ###########################################
 
-#load geometry of hovedstaden
-regions_wgs = regions.to_crs(epsg=4326) #epsg4326 to use longitude to split
-filter_hov = regions_wgs["NAME_1"] == "Hovedstaden"
-hov_geom = regions_wgs.loc[filter_hov, "geometry"].iloc[0] #.iloc[0] to get one geometry not a series with one geometry
+if SPATIAL_MODE == "manual":
 
-#create splitting line
-minx, miny, maxx, maxy = regions_wgs.total_bounds
-meridian = LineString([(SPLIT_LON, miny - 1.0), (SPLIT_LON, maxy + 1.0)]) #create dividing line; +/-1 degree buffer to avoid enumeration mistakes
+    #load geometry of hovedstaden
+    regions_wgs = regions.to_crs(epsg=4326) #epsg4326 to use longitude to split
+    filter_hov = regions_wgs["NAME_1"] == "Hovedstaden"
+    hov_geom = regions_wgs.loc[filter_hov, "geometry"].iloc[0] #.iloc[0] to get one geometry not a series with one geometry
 
-#split
-hov_split = split(hov_geom, meridian) #creates collection of geometries
+    #create splitting line
+    minx, miny, maxx, maxy = regions_wgs.total_bounds
+    meridian = LineString([(SPLIT_LON, miny - 1.0), (SPLIT_LON, maxy + 1.0)]) #create dividing line; +/-1 degree buffer to avoid enumeration mistakes
 
-#save split geometry as new regions
-hov_regions = list(hov_split.geoms) #list of geometries in unknown order
-western_geoms = []
-eastern_geoms = []
-for g in hov_regions: #sort geometries from collection based on representative point to eastern or western of the splitting line
-    x = g.representative_point().x
-    if x < SPLIT_LON:
-        western_geoms.append(g)
-    else:
-        eastern_geoms.append(g)
+    #split
+    hov_split = split(hov_geom, meridian) #creates collection of geometries
+
+    #save split geometry as new regions
+    hov_regions = list(hov_split.geoms) #list of geometries in unknown order
+    western_geoms = []
+    eastern_geoms = []
+    for g in hov_regions: #sort geometries from collection based on representative point to eastern or western of the splitting line
+        x = g.representative_point().x
+        if x < SPLIT_LON:
+            western_geoms.append(g)
+        else:
+            eastern_geoms.append(g)
 
-hov_west = shapely.union_all(western_geoms)   # combine geometries of one side of the splitting line to one region
-hov_east = shapely.union_all(eastern_geoms)
+    hov_west = shapely.union_all(western_geoms)   # combine geometries of one side of the splitting line to one region
+    hov_east = shapely.union_all(eastern_geoms)
 
-regions_others = regions_wgs.loc[~filter_hov].copy() #regions without hovedstaden
-hov_row = regions_wgs.loc[filter_hov].iloc[0].copy()
+    regions_others = regions_wgs.loc[~filter_hov].copy() #regions without hovedstaden
+    hov_row = regions_wgs.loc[filter_hov].iloc[0].copy()
 
-west_row = hov_row.copy() #create row in right structure to include into regions gdf
-west_row["NAME_1"] = "Hovedstaden_West"
-west_row["geometry"] = hov_west
+    west_row = hov_row.copy() #create row in right structure to include into regions gdf
+    west_row["NAME_1"] = "Hovedstaden_West"
+    west_row["geometry"] = hov_west
 
-east_row = hov_row.copy() #create row in right structure to include into regions gdf
-east_row["NAME_1"] = "Hovedstaden_East"
-east_row["geometry"] = hov_east
+    east_row = hov_row.copy() #create row in right structure to include into regions gdf
+    east_row["NAME_1"] = "Hovedstaden_East"
+    east_row["geometry"] = hov_east
+
+    regions_wgs2 = pd.concat( #combine regions into one gdf
+        [regions_others, gpd.GeoDataFrame([west_row, east_row], crs=regions_wgs.crs)],
+        ignore_index=True
+    )
+
+elif SPATIAL_MODE in ("admin", "cluster"):
+    zones = regions.to_crs(epsg=3035)
+    zones = zones.dissolve(by=f"NAME_{ADMIN_LEVEL}").reset_index() #zones with the same name become one bus
+    if SPATIAL_MODE == "admin":
+        labels = range(len(zones))
+    else:
+        labels = cluster_zones(zones, N_BUSES, method=CLUSTER_METHOD)
+    regions_wgs2 = dissolve_clusters(zones, labels, f"NAME_{ADMIN_LEVEL}").to_crs(epsg=4326)
+    print(f"{len(regions_wgs2)} buses from GADM level {ADMIN_LEVEL} ({len(zones)} zones)")
+
+else:
+    raise ValueError(f"Unknown SPATIAL_MODE '{SPATIAL_MODE}'")
 
-regions_wgs2 = pd.concat( #combine regions into one gdf
-    [regions_others, gpd.GeoDataFrame([west_row, east_row], crs=regions_wgs.crs)],
-    ignore_index=True
-)
 regions_etr2 = regions_wgs2.to_crs(epsg=3035)
-regions_etr2.to_file(REGIONS_GEOJSON, driver="GeoJSON")
+write_layer(regions_etr2, "regions") #GeoParquet in EPSG:3035 and 4326, see geometry_store.py
 
 ###########################################
 # Calculate representative points
@@ -100,44 +125,25 @@ rep_points_df_wsg = pd.DataFrame({
 rep_points_df_wsg.to_csv(REPPOINTS_CSV_wsg, index=False)
 
 ###########################################
-# Split EEZ by region into Voronoi-cells based on representative points and join with correct region
+# Links between the regions (adjacency, length and type)
 ###########################################
-rep_points_etr = rep_points.to_crs(epsg=3035) #projection with true distances needed as Voronoi is based on distances
-rep_points_gdf = gpd.GeoDataFrame( #to join the Voronoi-cells with correct region
-    regions_etr2[["NAME_1"]].copy(),
-    geometry=rep_points_etr,
-    crs=regions_etr2.crs
-)
 
-vor_polys = rep_points_etr.voronoi_polygons() #create Voronoi-cells
-vor_gdf = gpd.GeoDataFrame(geometry=vor_polys) #to join the Voronoi-cells with correct region
-vor_with_name = gpd.sjoin( #join Voronoi-cells with region
-    vor_gdf,
-    rep_points_gdf[["NAME_1", "geometry"]],
-    how="left",
-    predicate="contains"
-)
-vor_with_name = vor_with_name[["NAME_1", "geometry"]]
+rep_points_by_region = gpd.GeoSeries(rep_points.values, index=regions_wgs2["NAME_1"].values, crs=rep_points.crs)
+if SPATIAL_MODE == "manual":
+    links = manual_links(rep_points_by_region)
+else:
+    links = derive_links(regions_etr2, rep_points_by_region) #land borders -> overhead, sea crossings -> submarine
+write_links(links, LINKS_CSV)
 
 ###########################################
-# Clip EEZ and cut out land mass
+# Split EEZ by region: Voronoi cells of the representative points ("vector") or nearest region on a grid ("raster")
 ###########################################
 
-eez_etr = eez_dk.to_crs(epsg=3035) #projection with true distances needed as Voronoi is based on distances
-clipper_geom = eez_etr.geometry.union_all().envelope.buffer(1000) #set boundaries of Voronoi cells including buffer
-clipper = gpd.GeoDataFrame(geometry=[clipper_geom], crs=eez_etr.crs)
-
-vor_clipped = gpd.overlay(vor_with_name, clipper, how="intersection")
-eez_split = gpd.overlay(eez_etr,  vor_clipped,   how="intersection")
-
-eez_by_region_etr = eez_split.dissolve(by="NAME_1").reset_index()
+eez_by_region_etr = eez_by_region(eez_dk, regions_etr2, rep_points, method=EEZ_METHOD, res=EEZ_RES)
 
 ###########################################
 # Save EEZ divided into regions
 ###########################################
 
-eez_by_region_etr.to_crs(epsg=3035)[["NAME_1", "geometry"]].to_file(
-    EEZ_BY_REGION_GEOJSON,
-    driver="GeoJSON"
-)
+write_layer(eez_by_region_etr[["NAME_1", "geometry"]], "eez_by_region")
 
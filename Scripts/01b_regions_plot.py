@@ -2,13 +2,13 @@ import geopandas as gpd
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from geometry_store import read_layer
+
 ###########################################
 # PATHS
 ###########################################
 
-REPPOINTS_CSV = "../Data/processed/region_centroids.csv"
-REGIONS_GEOJSON = "../Data/processed/dk_regions.geojson"
-EEZ_BY_REGION_GEOJSON = "../Data/processed/dk_eez_by_region.geojson"
+REPPOINTS_CSV = "../Data/processed/region_centroids_etr.csv"
 EEZ_PATH = "../Data/raw/marineregions/eez_v11.gpkg"
 
 PLOT_PATH = "../plots_and_figures/regions_and_eez_by_region_split.png"
@@ -17,17 +17,17 @@ PLOT_PATH = "../plots_and_figures/regions_and_eez_by_region_split.png"
 # Load Data
 ###########################################
 
-regions_etr2 = gpd.read_file(REGIONS_GEOJSON)
+regions_etr2 = read_layer("regions", 3035, simplified=True, columns=["NAME_1"]) #simplified variant is enough for the plot
 eez = gpd.read_file(EEZ_PATH)
-eez_by_region_etr = gpd.read_file(EEZ_BY_REGION_GEOJSON)
+eez_by_region_etr = read_layer("eez_by_region", 3035, simplified=True, columns=["NAME_1"])
 rep_points_df = pd.read_csv(REPPOINTS_CSV, index_col=[0])
 
 rep_points_gdf = gpd.GeoDataFrame(
     rep_points_df,
-    geometry=gpd.points_from_xy(rep_points_df["lon"], rep_points_df["lat"]),
+    geometry=gpd.points_from_xy(rep_points_df["x"], rep_points_df["y"]),
     crs="EPSG:3035"
 )
-rep_points_gdf = rep_points_gdf.drop(columns=["lon", "lat"])
+rep_points_gdf = rep_points_gdf.drop(columns=["x", "y"])
 
 ###########################################
 # Plot regions and split EEZ
@@ -48,8 +48,8 @@ COLORS = {
     "Hovedstaden_West": "#B07AA1",
     "Hovedstaden_East": "#9C755F",
 }
-regions_plot["color"] = regions_plot["NAME_1"].map(COLORS)
-eez_by_region_plot["color"] = eez_by_region_plot["NAME_1"].map(COLORS)
+regions_plot["color"] = regions_plot["NAME_1"].map(COLORS).fillna("#BAB0AC") #regions of the admin/cluster modes of 01a
+eez_by_region_plot["color"] = eez_by_region_plot["NAME_1"].map(COLORS).fillna("#BAB0AC")
 
 STYLE = {
     # color intensity
@@ -1,71 +1,14 @@
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import numpy as np
-from rasterio.features import shapes
-from shapely.geometry import shape
-from atlite.gis import ExclusionContainer, shape_availability
-from rasterio.plot import show
+from eligibility import TECHNOLOGIES, run_technology
 
 ###########################################
-# PATHS
+# Exclusions for PV are defined in eligibility.TECHNOLOGIES["pv"],
+# the source rasters/vectors are shared with the other technologies
+# (02a_eligibility_all.py computes all of them in parallel)
 ###########################################
 
-DK_PATH = "../Data/processed/dk_regions_etr.geojson"
-LC_PATH = "../Data/raw/copernicus/PROBAV_LC100_global_v3.0.1_2019-nrt_Discrete-Classification-map_EPSG-4326-DK.tif"
-PA_PATH = "../Data/raw/wdpa/WDPA_Oct2022_Public_shp-DNK.tif"
-
-output_path = "../plots_and_figures/eligible_pv_areas_DK.png"
-output_shape_path = "../Data/processed/eligibility/eligible_pv_areas_DK.gpkg"
-
-###########################################
-# Load data and define exluder
-###########################################
-
-excluder = ExclusionContainer(crs=3035, res=100)
-DK = gpd.read_file(DK_PATH)
-DK_shape = DK.to_crs(excluder.crs).geometry
-
-
-codes_to_exclude = [111, 113, 112, 114, 115, 116, 121, 123, 122, 125, 126, 70, 80, 200]
-excluder.add_raster(LC_PATH, codes=codes_to_exclude, crs=3035, buffer=0, nodata=48)
-excluder.add_raster(PA_PATH)
-
 ###########################################
-# Calculate available area and save es shape
+# Calculate available area, save as raster and plot
 ###########################################
 
-band, transform = shape_availability(DK_shape, excluder)
-
-geoms = []
-for geom, value in shapes(band.astype(np.uint8), transform=transform):
-    if value == 1:
-        geoms.append(shape(geom))
-
-available_areas = gpd.GeoDataFrame(
-    geometry=geoms,
-    crs=excluder.crs
-)
-
-available_areas.to_file(
-    output_shape_path,
-    layer="eligible_pv_areas",
-    driver="GPKG"
-)
-
-###########################################
-# Plot
-###########################################
-
-fig, ax = plt.subplots(figsize=(7, 14))
-DK_shape.plot(ax=ax, color="none")
-show(band, transform=transform, cmap="Greens", ax=ax)
-ax.set_title("Eligible PV Energy Areas in Denmark")
-ax.set_xlabel("Easting (m) – EPSG:3035")
-ax.set_ylabel("Northing (m) – EPSG:3035")
-
-plt.savefig(
-    output_path,
-    dpi=600,
-    bbox_inches="tight",
-    pad_inches=0.05
-)
\ No newline at end of file
+run_technology("pv")
+print("Wrote:", TECHNOLOGIES["pv"]["raster"], TECHNOLOGIES["pv"]["plot"])
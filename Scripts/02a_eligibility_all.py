@@ -0,0 +1,18 @@
+from eligibility import run_all
+
+###########################################
+# INPUT
+###########################################
+
+technologies = ["pv", "wind_on", "wind_off"] #see eligibility.TECHNOLOGIES
+n_workers = None #None = one process per technology (or per CPU in tiled mode)
+res = 100 #in m
+tile_size = None #None = whole area in memory; e.g. 2048 pixels for tiled mode at 25-50 m
+
+###########################################
+# Calculate available areas of all technologies, save as raster and plot
+###########################################
+
+if __name__ == "__main__":
+    for name, path in run_all(technologies, max_workers=n_workers, res=res, tile_size=tile_size).items():
+        print("Wrote:", name, path)
@@ -1,13 +1,16 @@
 import atlite
-import geopandas as gpd
 import pandas as pd
 import xarray as xr
-from atlite.gis import ExclusionContainer
+
+from availability_cache import cached_availability
+from eligibility_raster import availability_matrix_from_raster
+from geometry_store import layer_bounds, layer_path, read_layer
+from timeseries_store import write_cf
 
 ###########################################
 # INPUT
 ###########################################
-year = 2018
+weather_years = [2013, 2018] #one cutout and one CF time series per weather year
 buffer = 0.25
 capa_density = 3 #density of power in MW per square kilometer
 
@@ -21,88 +24,72 @@ orientation = "latitude_optimal"
 # PATHS
 ###########################################
 
-REGIONS_PATH = "../Data/processed/dk_regions_etr.geojson"
-EEZ_PATH = "../Data/processed/dk_eez_by_region_etr.geojson"
-AVAIL_PV_PATH = "../Data/processed/eligibility/eligible_pv_areas_DK.gpkg"
-AVAIL_ON_PATH = "../Data/processed/eligibility/eligible_wind_on_areas_DK.gpkg"
-AVAIL_OFF_PATH = "../Data/processed/eligibility/eligible_wind_off_areas_DK.gpkg"
+AVAIL_PV_PATH = "../Data/processed/eligibility/eligible_pv_areas_DK.tif"
+AVAIL_ON_PATH = "../Data/processed/eligibility/eligible_wind_on_areas_DK.tif"
+AVAIL_OFF_PATH = "../Data/processed/eligibility/eligible_wind_off_areas_DK.tif"
 
-MAX_OUT = f"../Data/processed/dk_re_max_potentials_by_region_{year}.csv"
-CF_OUT = f"../Data/processed/dk_re_cf_timeseries_{year}.csv"
+MAX_OUT = "../Data/processed/dk_re_max_potentials_by_region.csv" #independent of the weather year
+CUTOUT_PATH = "era5-{year}-DK.nc"
 
 ###########################################
 # Loading and preprocessing of data
 ###########################################
 
-regions = gpd.read_file(REGIONS_PATH).to_crs(4326)
-eez_regions = gpd.read_file(EEZ_PATH).to_crs(4326)
-
-avail_pv = gpd.read_file(AVAIL_PV_PATH).to_crs(4326)
-avail_on = gpd.read_file(AVAIL_ON_PATH).to_crs(4326)
-avail_off = gpd.read_file(AVAIL_OFF_PATH).to_crs(4326)
-
 ###########################################
 # Cutout erstellen
 ###########################################
 
-#set boundaries for cutout
-minx1, miny1, maxx1, maxy1 = regions.total_bounds
-minx2, miny2, maxx2, maxy2 = eez_regions.total_bounds
+#set boundaries for cutout (stored bounds of the EPSG:4326 layers, no geometry is read)
+minx1, miny1, maxx1, maxy1 = layer_bounds("regions", 4326)
+minx2, miny2, maxx2, maxy2 = layer_bounds("eez_by_region", 4326)
 
 minx, miny = min(minx1, minx2), min(miny1, miny2)
 maxx, maxy = max(maxx1, maxx2), max(maxy1, maxy2)
 
-#set timeseries
-time = slice(f"{year}-01-01", f"{year}-12-31") #f"{year+1}-01-01
 
-#cutout whole area
-cutout = atlite.Cutout(
-    path=f"era5-{year}-DK.nc",
-    module="era5",
-    x=slice(minx - buffer, maxx + buffer),
-    y=slice(miny - buffer, maxy + buffer),
-    time=time,
-)
-cutout.prepare(features=["wind", "influx", "temperature"])
+def get_cutout(year):
+    """Cutout of the whole area for one weather year. An existing cutout file is reused,
+    prepare() only downloads features that are still missing."""
+    cutout = atlite.Cutout(
+        path=CUTOUT_PATH.format(year=year),
+        module="era5",
+        x=slice(minx - buffer, maxx + buffer),
+        y=slice(miny - buffer, maxy + buffer),
+        time=slice(f"{year}-01-01", f"{year}-12-31"),
+    )
+    cutout.prepare(features=["wind", "influx", "temperature"])
+    return cutout
+
+
+cutout = get_cutout(weather_years[0])
 
 ###########################################
 # Availibility matrices
+# (the cutout grid is the same for every weather year, so they are computed once)
 ###########################################
 
-dummy_excluder = ExclusionContainer(crs=3035, res=100)
-
-#PV
-inter_pv = gpd.overlay(
-    regions[[REGION_COL, "geometry"]].reset_index(drop=True),
-    avail_pv[["geometry"]],
-    how="intersection",
-    keep_geom_type=True,
-)
-inter_pv = inter_pv.dissolve(by=REGION_COL)
-shapes_pv = inter_pv.geometry
-A_pv = cutout.availabilitymatrix(shapes_pv, excluder=dummy_excluder)
-
-#Onshore wind
-inter_on = gpd.overlay(
-    regions[[REGION_COL, "geometry"]].reset_index(drop=True),
-    avail_on[["geometry"]],
-    how="intersection",
-    keep_geom_type=True,
-)
-inter_on = inter_on.dissolve(by=REGION_COL)
-shapes_on = inter_on.geometry
-A_on = cutout.availabilitymatrix(shapes_on, excluder=dummy_excluder)
-
-#Offshore wind
-inter_off = gpd.overlay(
-    eez_regions[[REGION_COL, "geometry"]].reset_index(drop=True),
-    avail_off[["geometry"]],
-    how="intersection",
-    keep_geom_type=True,
-)
-inter_off = inter_off.dissolve(by=REGION_COL)
-shapes_off = inter_off.geometry
-A_off = cutout.availabilitymatrix(shapes_off, excluder=dummy_excluder)
+def availability(name, layer, avail_path):
+    """Aggregate the eligibility raster per region onto the cutout grid (no polygons involved).
+    Cached on disk, recomputed only if the regions, eligibility raster or cutout grid change."""
+
+    def compute():
+        shapes = read_layer(layer, 3035, columns=[REGION_COL]).dissolve(by=REGION_COL).geometry #CRS of the rasters
+        return availability_matrix_from_raster(avail_path, shapes, cutout)
+
+    return cached_availability(
+        name,
+        [layer_path(layer, 3035), avail_path],
+        cutout,
+        compute,
+        region_col=REGION_COL,
+        method="raster",
+        window_pad="cutout_cell", #matrices from the older fixed 300 pixel pad are recomputed
+    )
+
+
+A_pv = availability("pv", "regions", AVAIL_PV_PATH) #PV
+A_on = availability("wind_on", "regions", AVAIL_ON_PATH) #Onshore wind
+A_off = availability("wind_off", "eez_by_region", AVAIL_OFF_PATH) #Offshore wind
 
 ###########################################
 # Calculate maximum capacities per technology and region
@@ -120,16 +107,8 @@ cap_on_total = capacity_on.sum("spatial")  # MW # MW pre region
 capacity_off = A_off.stack(spatial=["y", "x"]) * area * capa_density
 cap_off_total = capacity_off.sum("spatial")  # MW # MW pre region
 
-gen_pv = cutout.pv(matrix=capacity_pv, panel=panel, orientation=orientation,  index=inter_pv.index)
-gen_on = cutout.wind(matrix=capacity_on, turbine=turbine_on,  index=inter_on.index)
-gen_off = cutout.wind(matrix=capacity_off, turbine=turbine_off,  index=inter_off.index)
-
-cf_pv = gen_pv / cap_pv_total
-cf_on = gen_on / cap_on_total
-cf_off = gen_off / cap_off_total
-
 ###########################################
-# Save calculations in csv files
+# Save maximum capacities
 ###########################################
 
 #max capacities per region
@@ -145,25 +124,32 @@ df_pot["solar_potential_MW"] = s_pv
 df_pot = df_pot.reset_index()
 
 df_pot.to_csv(MAX_OUT, index=False)
-print("Wrote:", f"region_potentials_{year}.csv")
-
-#capacity factor timeseries
-df_cf_on = cf_on.to_pandas()
-df_cf_off = cf_off.to_pandas()
-df_cf_pv = cf_pv.to_pandas()
-
-df_ts_on = df_cf_on.stack(dropna=False).reset_index()
-df_ts_on.columns = ["timestamp", "region", "cf_onshore"]
+print("Wrote:", MAX_OUT)
 
-df_ts_off = df_cf_off.stack(dropna=False).reset_index()
-df_ts_off.columns = ["timestamp", "region", "cf_offshore"]
-
-df_ts_pv = df_cf_pv.stack(dropna=False).reset_index()
-df_ts_pv.columns = ["timestamp", "region", "cf_pv"]
-
-df_ts = df_ts_pv.merge(df_ts_on, on=["timestamp", "region"], how="outer")
-df_ts = df_ts.merge(df_ts_off, on=["timestamp", "region"], how="outer")
-df_ts = df_ts.sort_values(["timestamp", "region"]).reset_index(drop=True)
+###########################################
+# Capacity factor time series per weather year
+###########################################
 
-df_ts.to_csv(CF_OUT, index=False)
-print("Wrote:", f"capacity_factor_timeseries_{year}.csv")
\ No newline at end of file
+for year in weather_years:
+    if year != weather_years[0]:
+        cutout = get_cutout(year)
+
+    gen_pv = cutout.pv(matrix=capacity_pv, panel=panel, orientation=orientation,  index=A_pv.get_index(REGION_COL))
+    gen_on = cutout.wind(matrix=capacity_on, turbine=turbine_on,  index=A_on.get_index(REGION_COL))
+    gen_off = cutout.wind(matrix=capacity_off, turbine=turbine_off,  index=A_off.get_index(REGION_COL))
+
+    cf_pv = gen_pv / cap_pv_total
+    cf_on = gen_on / cap_on_total
+    cf_off = gen_off / cap_off_total
+
+    df_cf = pd.concat(
+        {
+            "onwind": cf_on.to_pandas(),
+            "offwind": cf_off.to_pandas(),
+            "solar": cf_pv.to_pandas(),
+        },
+        axis=1,
+        names=["technology", "region"],
+    )
+
+    print("Wrote:", write_cf(df_cf, year))
\ No newline at end of file
@@ -2,12 +2,13 @@ import pandas as pd
 import geopandas as gpd
 from shapely.geometry import Point
 
+from geometry_store import read_layer
+
 ###########################################
 # PATHS
 ###########################################
 
 PP_PATH = "../Data/raw/powerplants/global_power_plant_database.csv"
-REGIONS_Path = "../Data/processed/dk_regions_etr.geojson"
 
 OUT_PATH = "../Data/processed/dk_powerplants_with_region.csv"
 
@@ -26,8 +27,7 @@ gdf_plants = gpd.GeoDataFrame(
 )
 gdf_plants_etr = gdf_plants.to_crs(3035) #as regions are saved in EBSG3035
 
-gdf_regions = gpd.read_file(REGIONS_Path)
-gdf_regions = gdf_regions[["NAME_1", "geometry"]]
+gdf_regions = read_layer("regions", 3035, columns=["NAME_1"])
 
 ###########################################
 # Join data of powerplants with the region they are located in
@@ -1,10 +1,15 @@
+import geopandas as gpd
 import pandas as pd
 
+from geometry_store import read_layer
+from timeseries_store import write_load
+
 ###########################################
 # PATHS
 ###########################################
 
 LD_PATH = "../Data/raw/load/load.csv"
+GADM_PATH = "../Data/raw/gadm/gadm_410-levels-ADM_1-DNK.gpkg"
 OUT_PATH = "../Data/processed/load_regions.csv"
 
 ###########################################
@@ -28,6 +33,24 @@ population_total = {
     "Hovedstaden_East": 39715,
 }
 
+###########################################
+# Regions of other spatial modes of 01a_regions_define.py: population of the GADM level 1
+# regions spread over the new regions by area share
+###########################################
+
+regions = read_layer("regions", 3035, columns=["NAME_1"])
+if set(regions["NAME_1"]) != set(population_total):
+    population_gadm = {
+        "Hovedstaden": population_total["Hovedstaden_West"] + population_total["Hovedstaden_East"],
+        **{r: p for r, p in population_total.items() if not r.startswith("Hovedstaden")},
+    }
+    gadm = gpd.read_file(GADM_PATH).to_crs(regions.crs)[["NAME_1", "geometry"]].rename(columns={"NAME_1": "gadm"})
+    gadm["density"] = gadm["gadm"].map(population_gadm) / gadm.area #inhabitants per m²
+
+    overlap = gpd.overlay(regions[["NAME_1", "geometry"]], gadm, how="intersection")
+    overlap["population"] = overlap["density"] * overlap.area
+    population_total = overlap.groupby("NAME_1")["population"].sum().reindex(regions["NAME_1"], fill_value=0).to_dict()
+
 total_population = sum(population_total.values())
 
 ###########################################
@@ -43,6 +66,7 @@ for region, share in shares.items():
     load_dk[region] = load_dk["DK"] * share
 
 load_dk.to_csv(OUT_PATH)
+write_load(load_dk) #columnar copy read by the model and plots
 
 
 
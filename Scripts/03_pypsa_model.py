@@ -1,6 +1,13 @@
-import pypsa
+from pathlib import Path
+
 import pandas as pd
-import geopandas as gpd
+import pypsa
+
+import instrumentation
+from instrumentation import span
+from network_build import make_scenario, scenario_name, load_inputs, build_network, create_model, solve_network
+from result_summary import write_summary
+from time_aggregation import aggregation_error
 
 ###########################################
 # INPUT
@@ -22,6 +29,7 @@ max_power_links = pd.DataFrame(
     },
     index=[0]
 )
+max_power_links_default = 2000 #in MW, links not listed above (topologies derived by 01a_regions_define.py)
 
 cost_projection_year = 2030 #choose from years 2020, 2025, 2030, 2035, 2040, 2045, 2050
 cost_reduction_factor = pd.DataFrame(
@@ -56,261 +64,86 @@ RE_potential_reduction_factor = pd.DataFrame( #reducec amximum potential for one
 boolean_nuclear_plants = 0 #yes=1; no=0
 nuclear_capex = 2500    #capex of nuclear plants in €/kW
 
-weather_year = 2018 #choose from
+weather_year = 2018 #choose from the years computed by 02d_capacity factor.py
 
-###########################################
-# Name sceario
-###########################################
+solver = None #None = first available of gurobi, highs, cbc, glpk
 
-scenario = (
-    f"ZE{boolean_zero_emission}"
-    f"_CY{cost_projection_year}"
-    f"_WY{weather_year}"
-    f"_NUC{boolean_nuclear_plants}"
-    f"_NRcapex{int(nuclear_capex)}"
-    f"_CRF_s{int(cost_reduction_factor.at[0,'solar'])}"
-    f"_CRF_on{int(cost_reduction_factor.at[0,'onwind'])}"
-    f"_CRF_off{int(cost_reduction_factor.at[0,'offwind'])}"
-    f"_PRF_s{int(RE_potential_reduction_factor.at[0,'solar'])}"
-    f"_PRF_on{int(RE_potential_reduction_factor.at[0,'onwind'])}"
-    f"_PRF_off{int(RE_potential_reduction_factor.at[0,'offwind'])}"
-    f"_L{int(max_power_links.iloc[0].mean())}"
-)
-###########################################
-# PATHS
-###########################################
+time_aggregation = None #None = all 8760 hours; {"method": "resample", "hours": 3}
+                        #or {"method": "typical_periods", "n_periods": 12, "period_hours": 24}
 
-PP_PATH = "../Data/processed/dk_powerplants_with_region.csv"
-COSTS_PATH = f"../Data/processed/costs_{cost_projection_year}.csv"
-C_PATH ="../Data/processed/region_centroids_wsg.csv"
-LOAD_PATH = "../Data/processed/load_regions.csv"
-RE_PATH = "../Data/processed/dk_re_cf_timeseries_2013.csv"
-RE_P_PATH ="../Data/processed/dk_re_max_potentials_by_region_2013.csv"
+storage = "discrete" #"discrete": storage units with e_to_p_ratio_battery/_hydrogen of network_build.py
+                     #"continuous": charger/discharger links + store per region (free E/P ratio)
 
 ###########################################
-# Loading and preprocessing of data
+# Name sceario
 ###########################################
 
-########################    BUSES_CARRIERS     ########################
-
-loads = pd.read_csv(LOAD_PATH, parse_dates=["time"])
-loads = loads.set_index("time")
-
-conv_generators = pd.read_csv(PP_PATH)
-cap_by_region_fuel = (
-    conv_generators.groupby(["NAME_1", "primary_fuel"], as_index=True)["capacity_mw"]
-      .sum()
-      .to_frame(name="capacity_mw")
-)
-conventionals = conv_generators["primary_fuel"].unique().tolist()
-
-re_generators = pd.read_csv(RE_PATH, parse_dates=["timestamp"])
-re_generators = re_generators.set_index(["timestamp", "region"]).sort_index()
-re_cap_by_region = pd.DataFrame(
+scenario_input = make_scenario(
     {
-        "onwind": re_generators["cf_onshore"],
-        "offwind": re_generators["cf_offshore"],
-        "solar": re_generators["cf_pv"],
-    },
-    index=re_generators.index
+        "boolean_conventionals_extendable": boolean_conventionals_extendable,
+        "boolean_zero_emission": boolean_zero_emission,
+        "max_power_links": max_power_links.iloc[0].to_dict(),
+        "max_power_links_default": max_power_links_default,
+        "cost_projection_year": cost_projection_year,
+        "cost_reduction_factor": cost_reduction_factor.iloc[0].to_dict(),
+        "RE_potential_reduction_factor": RE_potential_reduction_factor.iloc[0].to_dict(),
+        "boolean_nuclear_plants": boolean_nuclear_plants,
+        "nuclear_capex": nuclear_capex,
+        "weather_year": weather_year,
+        "time_aggregation": time_aggregation,
+        "storage": storage,
+    }
 )
+scenario = scenario_name(scenario_input)
+RESULT_PATH = f"../results/n_extendable_{scenario}.nc"
 
-renewables = list(re_cap_by_region)
-
-re_cap_by_region = re_cap_by_region.unstack("region")
-re_cap_by_region.index.name = "time"
-re_cap_by_region = re_cap_by_region.reindex(loads.index)
-
-re_potential = pd.read_csv(RE_P_PATH)
-re_potential = re_potential.set_index("region")
-re_potential.columns = renewables
-
-carriers = sorted(set(conventionals + renewables + ["transmission", "AC", "battery storage", "hydrogen storage underground"]))
-
-centroids = pd.read_csv(C_PATH)
-regions = centroids.region
-costs = pd.read_csv(COSTS_PATH, index_col=[0])
+profiler = instrumentation.start(scenario) #timings and memory of every phase, written next to the result
 
-########################    LINKS     ########################
-neighbors = [
-    ("Nordjylland", "Midtjylland"),
-    ("Nordjylland", "Hovedstaden_West"),
-    ("Nordjylland", "Sjælland"),
-    ("Midtjylland", "Syddanmark"),
-    ("Midtjylland", "Sjælland"),
-    ("Syddanmark", "Sjælland"),
-    ("Sjælland", "Hovedstaden_West"),
-    ("Sjælland", "Hovedstaden_East"),
-    ("Hovedstaden_West", "Hovedstaden_East"),
-]
-
-links_type = pd.DataFrame(
-    {
-        "Nordjylland_Midtjylland": "HVAC overhead",
-        "Nordjylland_Hovedstaden_West": "HVDC submarine",
-        "Nordjylland_Sjælland": "HVDC submarine",
-        "Midtjylland_Syddanmark": "HVAC overhead",
-        "Midtjylland_Sjælland": "HVDC submarine",
-        "Syddanmark_Sjælland": "HVAC overhead",
-        "Sjælland_Hovedstaden_West": "HVAC overhead",
-        "Sjælland_Hovedstaden_East": "HVDC submarine",
-        "Hovedstaden_West_Hovedstaden_East": "HVDC submarine",
-    },
-    index=[0]
-)
-gcent = gpd.GeoDataFrame(
-    centroids,
-    geometry=gpd.points_from_xy(centroids["lon"], centroids["lat"]),
-    crs="EPSG:4326",
-)
-gcent_m = gcent.to_crs("EPSG:3035").set_index("region")
-len_factor = 1.5
+###########################################
+# Loading and preprocessing of data
+###########################################
 
-########################    BATTERIES     ########################
-e_to_p_ratio_battery = [2, 4, 6]
-e_to_p_ratio_hydrogen = [168, 336, 672]
+with span("load_inputs"):
+    inputs = load_inputs(cost_projection_years=[cost_projection_year], weather_years=[weather_year])
 
 ##################################################################
 #######################    PYPSA_MODEL     #######################
 ##################################################################
 
-n = pypsa.Network()
-n.set_snapshots(loads.index)
-
-n.add(
-    "Carrier",
-    carriers,
-    color=[
-        "green",
-        "tomato",
-        "dimgrey",
-        "black",
-        "rosybrown",
-        "pink",
-        "violet",
-        "crimson",
-        "crimson",
-        "yellow",
-        "blue"
-    ],
-    co2_emissions=[
-        costs.at[c, "CO2 intensity"] if c in costs.index else 0 for c in carriers
-    ],
-)
+with span("build_network"):
+    n = build_network(inputs, scenario_input)
+
+with span("create_model"):
+    create_model(n)
+profiler.meta["model"] = {"variables": int(n.model.nvars), "constraints": int(n.model.ncons)}
+
+solver_log = Path(RESULT_PATH).with_suffix(".solver.log")
+with span("solve"):
+    status, condition = solve_network(n, solver_name=solver, log_fn=solver_log)
+profiler.meta["solver"] = {
+    **n.meta["solver"],
+    "status": status,
+    "condition": condition,
+    **instrumentation.parse_solver_log(solver_log, n.meta["solver"]["solver_name"]),
+}
+
+with span("export_to_netcdf"):
+    n.export_to_netcdf(RESULT_PATH)
+if status == "ok":
+    with span("write_summary"): #compact KPIs for dashboards/comparisons, see result_summary.py
+        write_summary(n, RESULT_PATH, status=status, condition=condition)
 
-for _,row in centroids.iterrows():
-    n.add(
-        "Bus",
-        name=row["region"],
-        x=row["lon"],
-        y=row["lat"],
-        carrier="AC"
-    )
-
-for c in conventionals:
-    for r in regions:
-        if (r, c) not in cap_by_region_fuel.index:
-            continue  # skip non-existing generators
-        n.add(
-            "Generator",
-            f"{r}_{c}",
-            bus=r,
-            carrier=c,
-            p_nom_min =cap_by_region_fuel.at[(r, c), "capacity_mw"],
-            capital_cost=costs.at[c, "capital_cost"] * (1-cost_reduction_factor[c].loc[0]),
-            marginal_cost=costs.at[c, "marginal_cost"],
-            efficiency=costs.at[c, "efficiency"],
-            p_nom_extendable=True,
-        )
-
-for re in renewables:
-    for r in regions:
-        n.add(
-            "Generator",
-            f"{r}_{re}",
-            bus=r,
-            carrier=re,
-            p_nom_max=re_potential.loc[r, re],
-            p_max_pu=re_cap_by_region[(re, r)],
-            capital_cost=costs.at[re, "capital_cost"] * (1-cost_reduction_factor[re].loc[0]),
-            marginal_cost=costs.at[re, "marginal_cost"],
-            efficiency=costs.at[re, "efficiency"],
-            p_nom_extendable=True,
-        )
-
-for region in loads.columns:
-    if region == "DK":
-        continue  #skip sum over all regions
-
-    n.add(
-        "Load",
-        name=f"load_{region}",
-        bus=region,
-        p_set=loads[region],
-    )
+###########################################
+# Error of the time aggregation against the full resolution run (if that exists)
+###########################################
 
-for r0, r1 in neighbors:
-    p0 = gcent_m.loc[r0, "geometry"]
-    p1 = gcent_m.loc[r1, "geometry"]
-    length_km = p0.distance(p1) * len_factor / 1000.0
-    if links_type[f"{r0}_{r1}"].iloc[0] == "HVAC overhead":
-        capital_cost = costs.at["HVAC overhead", "capital_cost"] * length_km * (1-cost_reduction_factor["HVAC overhead"].loc[0])
+if time_aggregation:
+    full_path = Path(f"../results/n_extendable_{scenario_name({**scenario_input, 'time_aggregation': None})}.nc")
+    if full_path.exists():
+        error = aggregation_error(n, pypsa.Network(full_path))
+        error.to_csv(f"../results/aggregation_error_{scenario}.csv")
+        print(error)
     else:
-        capital_cost = costs.at["HVDC submarine", "capital_cost"] * length_km * (1-cost_reduction_factor["HVDC submarine"].loc[0])
-
-    n.add(
-        "Link",
-        f"{r0}_{r1}",
-        bus0=r0,
-        bus1=r1,
-        carrier="transmission",
-        p_nom_max=max_power_links[f"{r0}_{r1}"].iloc[0],
-        efficiency=1.0,
-        capital_cost=capital_cost,
-        p_nom_extendable=True,
-    )
-
-for e in e_to_p_ratio_battery:
-    for r in regions:
-        n.add(
-            "StorageUnit",
-            f"Battery_{r}_{e}",
-            bus=r,
-            carrier="battery storage",
-            max_hours=e,
-            capital_cost=costs.at["battery inverter", "capital_cost"] * (1-cost_reduction_factor["battery inverter"].loc[0])
-                         + e * costs.at["battery storage", "capital_cost"] * (1-cost_reduction_factor["battery storage"].loc[0]),
-            efficiency_store=costs.at["battery inverter", "efficiency"],
-            efficiency_dispatch=costs.at["battery inverter", "efficiency"],
-            p_nom_extendable=True,
-            cyclic_state_of_charge=True,
-        )
-
-for e in e_to_p_ratio_hydrogen:
-    for r in regions:
-        n.add(
-            "StorageUnit",
-            f"HydrogenStorage_{r}_{e}",
-            bus=r,
-            carrier="hydrogen storage underground",
-            max_hours=e,
-            capital_cost=costs.at["electrolysis", "capital_cost"] * (1-cost_reduction_factor["electrolysis"].loc[0])
-                        + costs.at["fuel cell", "capital_cost"] * (1-cost_reduction_factor["fuel cell"].loc[0])
-                        + e * costs.at["hydrogen storage underground", "capital_cost"] * (1-cost_reduction_factor["hydrogen storage underground"].loc[0]),
-            efficiency_store=costs.at["electrolysis", "efficiency"],
-            efficiency_dispatch=costs.at["fuel cell", "efficiency"],
-            p_nom_extendable=True,
-            cyclic_state_of_charge=True,
-        )
-
-if boolean_zero_emission == 1:
-    n.add(
-        "GlobalConstraint",
-        "emission_limit",
-        carrier_attribute="co2_emissions",
-        sense="<=",
-        constant=0,
-    )
+        print(f"No full resolution result at {full_path}, skipping the aggregation error.")
 
-n.optimize(assign_all_duals=True, log_to_console=False, solver_name='gurobi')
-n.export_to_netcdf(f"../results/n_extendable_{scenario}.nc")
\ No newline at end of file
+profiler.write(instrumentation.profile_path(RESULT_PATH))
@@ -0,0 +1,61 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from network_build import RESULTS_DIR, make_scenario, scenario_grid, load_inputs, init_worker, run_scenario
+from network_warmstart import warmstart_chains, run_chain
+
+###########################################
+# INPUT
+###########################################
+
+# Scenarios are given as overrides of network_build.DEFAULT_SCENARIO.
+# Either as a grid (all combinations are solved) ...
+SCENARIO_GRID = {
+    "boolean_zero_emission": [0, 1],
+    "cost_reduction_factor.solar": [0, 20, 40],
+    "cost_reduction_factor.onwind": [0, 20],
+}
+# weather years: e.g. "weather_year": [2013, 2014, ..., 2022] for a robustness study
+# ... or as an explicit list, e.g. [{"boolean_nuclear_plants": 1, "nuclear_capex": 6000}, ...]
+SCENARIO_LIST = []
+
+SOLVER = None #None = first available of gurobi, highs, cbc, glpk
+THREADS_PER_SOLVE = 4 #solver threads per scenario
+N_WORKERS = max(1, (os.cpu_count() or 1) // THREADS_PER_SOLVE) #scenarios solved at the same time
+
+# warm start: scenarios that only differ in costs, potentials, link limits, nuclear capex or the
+# CO2 limit share one model per worker, which is patched and re-solved from the previous basis
+# (long chains are split into segments so that all N_WORKERS are busy)
+WARMSTART = True
+
+SUMMARY_PATH = f"{RESULTS_DIR}/sweep_summary.csv"
+
+###########################################
+# Run sweep
+###########################################
+
+if __name__ == "__main__":
+    scenarios = SCENARIO_LIST + scenario_grid(SCENARIO_GRID)
+    cost_years = sorted({make_scenario(o)["cost_projection_year"] for o in scenarios})
+    weather_years = sorted({make_scenario(o)["weather_year"] for o in scenarios})
+
+    Path(RESULTS_DIR).mkdir(parents=True, exist_ok=True)
+    inputs = load_inputs(cost_projection_years=cost_years, weather_years=weather_years) #read once, handed to every worker
+
+    results = []
+    with ProcessPoolExecutor(max_workers=N_WORKERS, initializer=init_worker, initargs=(inputs,)) as pool:
+        if WARMSTART:
+            futures = [pool.submit(run_chain, chain, THREADS_PER_SOLVE, SOLVER) for chain in warmstart_chains(scenarios, N_WORKERS)]
+        else:
+            futures = [pool.submit(run_scenario, o, THREADS_PER_SOLVE, SOLVER) for o in scenarios]
+        for future in as_completed(futures):
+            chain_results = future.result() if WARMSTART else [future.result()]
+            for result in chain_results:
+                print(f"{result['scenario']}: {result['status']} ({result['condition']})")
+            results.extend(chain_results)
+
+    pd.DataFrame(results).sort_values("scenario").to_csv(SUMMARY_PATH, index=False)
+    print("Wrote:", SUMMARY_PATH)
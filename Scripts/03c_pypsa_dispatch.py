@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+import pypsa
+
+from network_build import RESULTS_DIR, load_inputs, init_worker
+from network_dispatch import HORIZON, STEP, capacities, run_dispatch
+
+###########################################
+# INPUT
+###########################################
+
+# capacities from a solved capacity expansion run of 03_pypsa_model.py
+RESULT_PATH = "../results/n_extendable_ZE0_CY2030_WY2018_NUC0_NRcapex2500_CRF_s0_CRF_on0_CRF_off0_PRF_s0_PRF_on0_PRF_off0_L2000.nc"
+
+WEATHER_YEARS = [2018] #operation with these capacities in each weather year, e.g. list(range(2013, 2023))
+HORIZON_HOURS = HORIZON #one week per window ...
+STEP_HOURS = STEP #... of which one day is kept before the window moves on
+
+SOLVER = None #None = first available of gurobi, highs, cbc, glpk
+THREADS_PER_SOLVE = 1 #windows are small, one thread each
+N_WORKERS = min(len(WEATHER_YEARS), os.cpu_count() or 1) #weather years dispatched at the same time
+
+SUMMARY_PATH = f"{RESULTS_DIR}/dispatch_summary_{Path(RESULT_PATH).stem}.csv"
+
+###########################################
+# Rolling horizon dispatch, one worker per weather year
+###########################################
+
+if __name__ == "__main__":
+    solved = pypsa.Network(RESULT_PATH)
+    s = solved.meta["scenario"] #written by network_build.build_network
+    caps = capacities(solved)
+    mu = solved.global_constraints["mu"]
+    co2_price = -mu.get("emission_limit", 0.0) #€/t, replaces the annual CO2 limit in the windows
+    del solved
+
+    inputs = load_inputs(cost_projection_years=[s["cost_projection_year"]], weather_years=WEATHER_YEARS)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=N_WORKERS, initializer=init_worker, initargs=(inputs,)) as pool:
+        futures = [
+            pool.submit(run_dispatch, RESULT_PATH, s, caps, co2_price, year, HORIZON_HOURS, STEP_HOURS, SOLVER, THREADS_PER_SOLVE)
+            for year in WEATHER_YEARS
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            print(f"{result['scenario']}: {result['status']} after {result['windows']} windows")
+            results.append(result)
+
+    pd.DataFrame(results).sort_values("weather_year").to_csv(SUMMARY_PATH, index=False)
+    print("Wrote:", SUMMARY_PATH)
@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from network_build import RESULTS_DIR, make_scenario, scenario_name, load_inputs
+from network_decomposition import GAP, MAX_ITERATIONS, PERIOD, solve_benders
+
+###########################################
+# INPUT
+###########################################
+
+# scenario as overrides of network_build.DEFAULT_SCENARIO (see 03_pypsa_model.py)
+SCENARIO = {}
+
+PERIOD_FREQ = PERIOD #one subproblem per month
+REL_GAP = GAP #stop once (upper - lower bound) / upper bound is below this
+ITERATIONS = MAX_ITERATIONS
+N_WORKERS = min(12, os.cpu_count() or 1) #subproblems are spread over this many processes
+THREADS_PER_SOLVE = 1
+SOLVER = None #None = first available of gurobi, highs, cbc, glpk
+
+###########################################
+# Capacity expansion by Benders decomposition over the sub-periods
+###########################################
+
+if __name__ == "__main__":
+    s = make_scenario(SCENARIO)
+    s["time_aggregation"] = None
+    name = scenario_name(s)
+    inputs = load_inputs(cost_projection_years=[s["cost_projection_year"]], weather_years=[s["weather_year"]])
+
+    capacities, history = solve_benders(
+        inputs, s, period=PERIOD_FREQ, gap=REL_GAP, max_iterations=ITERATIONS,
+        n_workers=N_WORKERS, solver_name=SOLVER, threads=THREADS_PER_SOLVE,
+    )
+
+    Path(RESULTS_DIR).mkdir(parents=True, exist_ok=True)
+    capacities.rename("capacity").to_csv(f"{RESULTS_DIR}/benders_capacities_{name}.csv")
+    history.to_csv(f"{RESULTS_DIR}/benders_history_{name}.csv")
+    print(history.tail(1))
+
+    #compare with the monolithic run of 03_pypsa_model.py if it exists
+    summary = Path(f"{RESULTS_DIR}/summary/n_extendable_{name}/summary.json")
+    if summary.exists():
+        objective = pd.read_json(summary, typ="series")["objective"]
+        upper = history["upper_bound"].iloc[-1]
+        print(f"Monolithic objective {objective:.6g}, decomposition {upper:.6g} ({100 * (upper / objective - 1):+.3f} %)")
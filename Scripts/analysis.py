@@ -0,0 +1,420 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pypsa
+
+import analytics
+from instrumentation import profiled, span
+from plotting import line_figure, render
+from result_reader import ResultReader, scan_kpis
+
+###########################################
+# PATHS
+###########################################
+
+RESULTS_DIR = "../results"
+NETWORK_PATTERN = "n_*.nc"
+COMPARISON_PATH = f"{RESULTS_DIR}/scenario_comparison.csv"
+KPI_PATH = f"{RESULTS_DIR}/scenario_kpis.csv"
+PRICE_QUANTILES_PATH = f"{RESULTS_DIR}/scenario_price_quantiles.csv"
+
+###########################################
+# INPUT
+###########################################
+
+#Example weeks: lowest and highest renewable share, chosen per network (see analytics.re_windows);
+#window and step in hours, so they are weeks at any time resolution
+WEEK_HOURS = analytics.WEEK
+WEEK_STEP = analytics.DAY
+
+###########################################
+# Statistics (computed once per network and cached next to its outputs)
+###########################################
+
+STATISTICS = {
+    "system_cost": lambda n: n.statistics.system_cost(groupby="carrier"),
+    "capex": lambda n: n.statistics.capex(groupby="carrier"),
+    "opex": lambda n: n.statistics.opex(groupby="carrier"),
+    "optimal_capacity": lambda n: n.statistics.optimal_capacity(groupby="carrier"),
+    "installed_capacity": lambda n: n.statistics.installed_capacity(groupby="carrier"),
+    "optimal_capacity_bus": lambda n: n.statistics.optimal_capacity(groupby=["bus", "carrier"]),
+    "installed_capacity_bus": lambda n: n.statistics.installed_capacity(groupby=["bus", "carrier"]),
+    "energy_balance": lambda n: n.statistics.energy_balance(),
+    "curtailment": lambda n: n.statistics.curtailment(groupby="carrier"),
+    "prices_bus_carrier": lambda n: n.statistics.prices(groupby="bus_carrier", round=2),
+    "avg_prices": lambda n: analytics.weighted_mean(electricity_prices(n), hours(n)),
+    "co2_shadow_price": lambda n: n.global_constraints["mu"],
+    "demand": lambda n: float(n.snapshot_weightings.generators @ n.loads_t.p_set.sum(axis=1)),
+    "objective": lambda n: n.objective,
+    "scenario": lambda n: dict(n.meta.get("scenario", {})),
+    "price_quantiles": lambda n: analytics.quantiles(electricity_prices(n), weights=hours(n)),
+    "link_utilization": lambda n: analytics.histograms(transmission_utilization(n), weights=hours(n)),
+    "example_weeks": lambda n: example_weeks(n),
+}
+
+
+def hours(n):
+    """Hours each snapshot stands for in the year (objective weighting, >1 for aggregated runs)."""
+    return n.snapshot_weightings.objective.to_numpy()
+
+
+def electricity_prices(n):
+    """Marginal prices of the AC buses (without the store buses of continuous storage)."""
+    return n.buses_t.marginal_price[n.buses.index[n.buses.carrier == "AC"]]
+
+
+def transmission_utilization(n):
+    """Utilization of the transmission links (not the storage chargers/dischargers) in %."""
+    links = n.links.index[n.links.carrier == "transmission"]
+    return analytics.utilization(n.links_t.p0[links], n.links.p_nom_opt[links])
+
+
+def example_weeks(n):
+    """Lowest/highest RE weeks and the curtailment per carrier within them (MWh)."""
+    windows = analytics.re_windows(n, WEEK_HOURS, WEEK_STEP)
+    curtailment = analytics.window_sums(analytics.curtailment_series(n), windows, n.snapshot_weightings.generators)
+    return {"windows": windows, "curtailment": curtailment}
+
+
+def output_dir(path):
+    """Outputs of n_<scenario>.nc go to the folder n_<scenario>/ next to it."""
+    path = Path(path)
+    return path.parent / path.stem
+
+
+def compute_statistics(n):
+    stats = {}
+    for name, statistic in STATISTICS.items():
+        with span(name):
+            stats[name] = statistic(n)
+    return stats
+
+
+def _code_hash(func, h, seen):
+    """Add the bytecode of `func` and of the functions of this module it calls to `h`."""
+    code = func.__code__
+    h.update(code.co_code)
+    h.update(repr((code.co_consts, code.co_names)).encode())
+    for name in code.co_names:
+        dep = globals().get(name)
+        if callable(dep) and getattr(dep, "__module__", None) == __name__ and name not in seen:
+            seen.add(name)
+            _code_hash(dep, h, seen)
+
+
+def statistics_key(statistics=STATISTICS):
+    """Hash of the statistic definitions: editing one of them invalidates the cache."""
+    h = hashlib.sha1()
+    for name, statistic in statistics.items():
+        h.update(name.encode())
+        _code_hash(statistic, h, set())
+    return h.hexdigest()
+
+
+def cached_statistics(path, load):
+    """Statistics of the network file `path` from the cache, or computed from `load()`.
+    The cache is valid as long as size and modification time of the file and the
+    statistic definitions are unchanged."""
+    path = Path(path)
+    cache = output_dir(path) / f"statistics_{path.stem}.pkl"
+    stat = path.stat()
+    key = (stat.st_size, stat.st_mtime_ns, statistics_key())
+    if cache.exists():
+        cached = pd.read_pickle(cache)
+        if cached["key"] == key:
+            return cached["stats"]
+    stats = compute_statistics(load())
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    pd.to_pickle({"key": key, "stats": stats}, cache)
+    return stats
+
+
+###########################################
+# Tables of one network
+###########################################
+
+def derived_tables(stats):
+    """Tables of 04b_Analysis.py, all built from the cached statistics."""
+    tsc = pd.concat(
+        {
+            "capex in Million €": stats["capex"].div(1e6).round(2),
+            "opex in Million €": stats["opex"].div(1e6).round(2),
+            "total in Million €": stats["system_cost"].div(1e6).round(2),
+        },
+        axis=1,
+    )
+
+    opt_cap = stats["optimal_capacity"].div(1e3).round(2) # GW
+    inst_cap = stats["installed_capacity"].div(1e3).round(2) # GW
+    cap = pd.concat(
+        {
+            "installed capacity in GW": inst_cap,
+            "optimal capacity in GW": opt_cap,
+            "added capacity in GW": opt_cap - inst_cap,
+        },
+        axis=1,
+    )
+
+    opt_cap_bus = stats["optimal_capacity_bus"].div(1e3).round(2) # GW
+    inst_cap_bus = stats["installed_capacity_bus"].div(1e3).round(2) # GW
+    cap_bus = pd.concat(
+        {
+            "installed capacity in GW": inst_cap_bus,
+            "optimal capacity in GW": opt_cap_bus,
+            "added capacity in GW": opt_cap_bus - inst_cap_bus,
+        },
+        axis=1,
+    )
+
+    gen_p_by_carrier = stats["energy_balance"].sort_values().div(1e6).round(2)  # TWh
+    total_gen = gen_p_by_carrier.sum(axis=1) if isinstance(gen_p_by_carrier, pd.DataFrame) else gen_p_by_carrier
+    energy_balance = pd.concat(
+        {
+            "production in TWh": gen_p_by_carrier,
+            "share in %": (gen_p_by_carrier / total_gen) * 100,
+        },
+        axis=1,
+    )
+
+    LCOE = stats["objective"] / stats["demand"] # €/MWh
+
+    curt = stats["curtailment"].div(1e6)  # TWh
+    gen_by_carrier_energy = gen_p_by_carrier.sum()
+    curtailment = pd.concat(
+        {
+            "energy potential not used in GWh": curt,
+            "share in %": 100 * curt.squeeze() / gen_by_carrier_energy,
+        },
+        axis=1,
+    )
+
+    return {
+        "costs_total": pd.DataFrame({"total_system_cost_billion_EUR": [stats["objective"] / 1e9]}),
+        "capex_by_carrier": tsc,
+        "installed_capacity_by_carrier": cap,
+        "optimal_capacity_by_bus_carrier": cap_bus,
+        "energy_balance": energy_balance,
+        "LCOE": pd.DataFrame({"LCOE_EUR_per_MWh": [LCOE]}),
+        "co2_shadow_price": stats["co2_shadow_price"],
+        "avg_prices_by_bus": stats["avg_prices"].to_frame("avg_price_EUR_per_MWh"),
+        "avg_prices_by_bus_carrier": stats["prices_bus_carrier"],
+        "curtailment_by_carrier": curtailment,
+        "price_quantiles_by_bus": stats["price_quantiles"],
+        "link_utilization_histogram": stats["link_utilization"],
+        "week_analysis_curtailment_by_carrier": week_curtailment(stats, gen_by_carrier_energy),
+        "week_analysis_windows": pd.DataFrame(stats["example_weeks"]["windows"], index=["start", "end"]).T,
+    }
+
+
+def week_curtailment(stats, gen_by_carrier_energy):
+    weeks = stats["example_weeks"]
+    columns = {}
+    for key, (start, end) in weeks["windows"].items():
+        curt = weeks["curtailment"].loc[key].div(1e6)  # TWh
+        columns[f"{key} energy potential not used in GWh"] = curt
+        columns[f"{key} share in %"] = 100 * curt / gen_by_carrier_energy
+    return pd.DataFrame(columns)
+
+
+def write_tables(tables, outdir, tag):
+    for name, table in tables.items():
+        table.to_csv(outdir / f"{name}_{tag}.csv", index=name not in ("costs_total", "LCOE"))
+
+
+###########################################
+# Figures of one network
+###########################################
+
+def timesteps(df):
+    """Time axis of a plot: typical-period runs have (period, timestep) snapshots, plot over the timesteps."""
+    return df.droplevel("period") if isinstance(df.index, pd.MultiIndex) else df
+
+
+def daily_soc(soc):
+    """Daily mean, or the mean per representative period for typical-period runs."""
+    if isinstance(soc.index, pd.MultiIndex):
+        return soc.groupby(level="period").mean().round(2), "Representative period"
+    return soc.resample("D").mean().round(2), "Time"
+
+
+def figures(n, stats, outdir, tag):
+    """(function, path, kwargs) of every figure of one network, see plotting.render."""
+    mp = electricity_prices(n)  # Zeit × Bus
+    soc = pd.concat([n.storage_units_t.state_of_charge, n.stores_t.e], axis=1).div(1e3).round(2)  # GWh, storage units and stores
+    soc_daily, soc_axis = daily_soc(soc)
+    windows = stats["example_weeks"]["windows"]
+    util = transmission_utilization(n)
+    #window bounds are (period, timestep) for typical-period runs
+    first_day = {key: start[-1] if isinstance(start, tuple) else start for key, (start, _) in windows.items()}
+
+    #both weeks on a common axis: hours since the start of the window
+    durations = n.snapshot_weightings.stores
+
+    def weeks(df, label):
+        def since_start(part):
+            elapsed = durations.reindex(part.index).cumsum()
+            return part.set_axis(elapsed - elapsed.iloc[0])
+        return pd.concat(
+            [since_start(df.loc[start:end]).add_prefix(f"{key} re: {label}") for key, (start, end) in windows.items()],
+            axis=1,
+        )
+
+    price_unit = "Electricity Price [€/MWh]"
+    legend = {"fontsize": 8, "ncol": 2}
+    return [
+        (line_figure, outdir / f"prices_{tag}.png", {"df": timesteps(mp), "ylabel": price_unit}),
+        (line_figure, outdir / f"pdc_all_buses_{tag}.png", {
+            "df": analytics.duration_curves(mp, hours(n)), #weighted share of the year
+            "ylabel": price_unit,
+            "xlabel": "Percentage of time [%]",
+            "title": "Price Duration Curves (all buses)",
+            "legend": {"title": "Bus", **legend},
+        }),
+        (line_figure, outdir / f"soc_daily_{tag}.png", {
+            "df": soc_daily,
+            "ylabel": "State of charge [GWh]",
+            "xlabel": soc_axis,
+            "title": "Daily average state of charge",
+            "dpi": 600,
+        }),
+        (line_figure, outdir / f"week_analysis_pc_{tag}.png", {
+            "df": weeks(mp, ""),
+            "ylabel": price_unit,
+            "xlabel": f"Hour of week (low RE from {first_day['low']:%Y-%m-%d}, high RE from {first_day['high']:%Y-%m-%d})",
+            "legend": legend,
+            "dpi": 600,
+        }),
+        (line_figure, outdir / f"week_analysis_link_utilization_{tag}.png", {
+            "df": weeks(util, "link utilization in % "),
+            "ylabel": "Link utilization [%]",
+            "xlabel": "Hour of week",
+            "title": "Link utilization: low RE vs high RE",
+            "legend": legend,
+        }),
+    ]
+
+
+###########################################
+# One network -> tables, figures and one row of the comparison table
+###########################################
+
+def kpi_row(stats, tables, tag):
+    """Headline numbers of one scenario: costs, capacities, LCOE, CO2 price and curtailment."""
+    def by_carrier(series, prefix):
+        series = series.groupby(level=-1).sum() if isinstance(series.index, pd.MultiIndex) else series
+        return {f"{prefix}|{carrier}": value for carrier, value in series.items()}
+
+    scenario = {
+        k: v for k, v in pd.json_normalize(stats["scenario"], sep=".").iloc[0].items()
+    } if stats["scenario"] else {}
+    co2 = stats["co2_shadow_price"]
+    return {
+        "scenario": tag,
+        **scenario,
+        "total_system_cost_billion_EUR": stats["objective"] / 1e9,
+        "capex_million_EUR": stats["capex"].sum() / 1e6,
+        "opex_million_EUR": stats["opex"].sum() / 1e6,
+        "LCOE_EUR_per_MWh": tables["LCOE"].iloc[0, 0],
+        "co2_price_EUR_per_t": -co2["emission_limit"] if "emission_limit" in co2.index else np.nan,
+        "avg_price_EUR_per_MWh": stats["avg_prices"].mean(),
+        **by_carrier(stats["optimal_capacity"].div(1e3), "capacity_GW"),
+        **by_carrier(stats["curtailment"].div(1e6), "curtailment_TWh"),
+    }
+
+
+def analyze_network(path, plots=True, plot_workers=None):
+    """Tables (and figures) of one result network, returns its row of the comparison table.
+
+    The network is only loaded if the statistics are not cached yet or figures are requested.
+    """
+    path = Path(path)
+    tag = path.stem
+    outdir = output_dir(path)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    with profiled(f"analysis {tag}") as profiler:
+        network = None
+
+        def load():
+            nonlocal network
+            if network is None:
+                with span("load_network"):
+                    network = pypsa.Network(path)
+            return network
+
+        with span("statistics"):
+            stats = cached_statistics(path, load)
+        with span("tables"):
+            tables = derived_tables(stats)
+            write_tables(tables, outdir, tag)
+        if plots:
+            with span("figures"):
+                render(figures(load(), stats, outdir, tag), max_workers=plot_workers) #unchanged figures are skipped
+        profiler.write(outdir / f"profile_analysis_{tag}.json")
+
+    return kpi_row(stats, tables, tag)
+
+
+###########################################
+# Batch over all result networks
+###########################################
+
+def discover_networks(results_dir=RESULTS_DIR, pattern=NETWORK_PATTERN):
+    return sorted(Path(results_dir).glob(pattern))
+
+
+def _analyze_in_worker(path, plots):
+    return {**analyze_network(path, plots=plots, plot_workers=1), "status": "ok", "error": ""} #one network per process already
+
+
+def run_batch(paths=None, max_workers=None, plots=False, out_path=COMPARISON_PATH):
+    """Analyze every network (default: all result networks) in a process pool and write
+    one comparison table with a row per scenario."""
+    paths = discover_networks() if paths is None else [Path(p) for p in paths]
+    if not paths:
+        raise FileNotFoundError(f"No result networks matching {NETWORK_PATTERN} in {RESULTS_DIR}")
+
+    matplotlib.use("Agg") #workers render without a display
+    rows = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {path: pool.submit(_analyze_in_worker, path, plots) for path in paths}
+        for path, future in futures.items():
+            try:
+                rows.append(future.result())
+            except Exception as e: #one broken network must not abort the batch
+                print(f"{path.name}: analysis failed: {e!r}")
+                rows.append({"scenario": path.stem, "status": "failed", "error": repr(e)})
+
+    comparison = pd.DataFrame(rows).set_index("scenario").sort_index()
+    comparison.to_csv(out_path)
+    failed = (comparison["status"] == "failed").sum()
+    print(f"{len(comparison)} scenarios ({failed} failed) -> {out_path}")
+    return comparison
+
+
+def run_kpi_scan(paths=None, max_workers=None, out_path=KPI_PATH):
+    """Headline KPIs of all result networks via the lazy reader (no network is loaded)."""
+    paths = discover_networks() if paths is None else [Path(p) for p in paths]
+    kpis = scan_kpis(paths, max_workers=max_workers)
+    kpis.to_csv(out_path)
+    print(f"{len(kpis)} scenarios -> {out_path}")
+    return kpis
+
+
+def scenario_price_quantiles(paths=None, out_path=PRICE_QUANTILES_PATH):
+    """Price quantiles of every bus in every scenario, weighted by the snapshot weightings.
+    Only the marginal prices and weightings are read from the result files."""
+    paths = discover_networks() if paths is None else [Path(p) for p in paths]
+    tables = {}
+    for path in paths:
+        with ResultReader(path) as r:
+            ac = r.static("buses", "carrier") == "AC"
+            prices = r.series("buses", "marginal_price").loc[:, lambda df: df.columns.isin(ac.index[ac])]
+            tables[path.stem] = analytics.quantiles(prices, weights=r.weightings("objective").to_numpy()).T
+    table = pd.concat(tables, names=["scenario"])
+    table.to_csv(out_path)
+    return table
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+from timeseries_store import TECHNOLOGIES
+
+###########################################
+# Time-series statistics on (snapshots x columns) frames
+#
+# Every function works on the whole 2-D array at once (time on axis 0), so all buses,
+# links or carriers are handled in one NumPy call. Several scenarios are handled the
+# same way: combine() puts them side by side with a (scenario, column) MultiIndex.
+###########################################
+
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+UTILIZATION_BINS = np.linspace(0, 100, 21) # % of capacity
+WEEK = 168 # hours per window
+DAY = 24 # hours between window starts
+
+
+def combine(frames):
+    """{scenario: frame} -> one frame with (scenario, column) columns, aligned on the snapshots."""
+    return pd.concat(frames, axis=1, names=["scenario"])
+
+
+def duration_curves(df, weights=None):
+    """Columns sorted descending; index = percentage of time.
+    With snapshot `weights` (hours) the curves are read off at equal shares of the weighted time."""
+    if weights is not None:
+        share = np.linspace(0, 100, len(df))
+        values = weighted_quantiles(df.to_numpy(), weights, 1 - share / 100)
+        return pd.DataFrame(values, index=share, columns=df.columns).rename_axis("time_share_%")
+    values = -np.sort(-df.to_numpy(), axis=0)
+    return pd.DataFrame(values, index=np.linspace(0, 100, len(df)), columns=df.columns).rename_axis("time_share_%")
+
+
+def quantiles(df, q=QUANTILES, weights=None):
+    """Quantiles of every column, weighted by the snapshot `weights` if given."""
+    values = np.nanquantile(df.to_numpy(), q, axis=0) if weights is None else weighted_quantiles(df.to_numpy(), weights, q)
+    return pd.DataFrame(values, index=pd.Index(q, name="quantile"), columns=df.columns)
+
+
+def weighted_mean(df, weights):
+    """Mean of every column weighted by the snapshot `weights` (NaN are left out)."""
+    values = df.to_numpy(dtype=float)
+    w = np.where(np.isnan(values), 0.0, np.asarray(weights, dtype=float)[:, None])
+    return pd.Series(np.nansum(values * w, axis=0) / w.sum(axis=0), index=df.columns)
+
+
+def weighted_quantiles(values, weights, q=QUANTILES):
+    """Quantiles of every column of `values` (time on axis 0) with snapshot `weights` (NaN are left out)."""
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    columns = []
+    for v in values.T:
+        ok = ~np.isnan(v)
+        if not ok.any():
+            columns.append(np.full(np.size(q), np.nan))
+            continue
+        order = np.argsort(v[ok])
+        w = weights[ok][order]
+        cum = (np.cumsum(w) - 0.5 * w) / w.sum() #weight midpoints of the sorted values
+        columns.append(np.interp(q, cum, v[ok][order]))
+    return np.stack(columns, axis=-1)
+
+
+def utilization(flow, capacity):
+    """|flow| in % of capacity (columns without capacity are NaN)."""
+    cap = capacity.reindex(flow.columns).to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 * np.abs(flow.to_numpy()) / np.where(cap > 0, cap, np.nan)
+    return pd.DataFrame(values, index=flow.index, columns=flow.columns)
+
+
+def histograms(df, bins=UTILIZATION_BINS, weights=None):
+    """Number of snapshots (hours with snapshot `weights`) per bin and column, all columns in one bincount."""
+    values = df.to_numpy()
+    n_bins = len(bins) - 1
+    idx = np.clip(np.digitize(values, bins) - 1, 0, n_bins - 1) #values at the upper edge go to the last bin
+    idx = idx + n_bins * np.arange(values.shape[1])
+    valid = ~np.isnan(values)
+    w = None if weights is None else np.broadcast_to(np.asarray(weights, dtype=float)[:, None], values.shape)[valid]
+    counts = np.bincount(idx[valid], weights=w, minlength=n_bins * values.shape[1])
+    labels = pd.IntervalIndex.from_breaks(bins, closed="left", name="bin")
+    return pd.DataFrame(counts.reshape(values.shape[1], n_bins).T, index=labels, columns=df.columns)
+
+
+###########################################
+# Windows
+###########################################
+
+def _cumsum(values):
+    return np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+
+
+def window_bounds(index, duration, window=WEEK, step=DAY):
+    """Start and end positions (end exclusive) of the windows of `window` hours, one every
+    `step` hours. `duration`: hours per snapshot (n.snapshot_weightings.stores).
+
+    With (period, timestep) snapshots of typical-period runs every window stays inside one
+    representative period (and is cut to its length), it never joins unrelated periods.
+    """
+    duration = np.asarray(duration, dtype=float)
+    if isinstance(index, pd.MultiIndex):
+        periods = index.get_level_values("period")
+        borders = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1], True])
+    else:
+        borders = np.array([0, len(index)])
+    starts, ends = [], []
+    for a, b in zip(borders[:-1], borders[1:]):
+        hours = duration[a:b].mean()
+        size = int(min(b - a, max(1, round(window / hours))))
+        first = np.arange(a, b - size + 1, max(1, round(step / hours)))
+        starts.append(first)
+        ends.append(first + size)
+    return np.concatenate(starts), np.concatenate(ends)
+
+
+def window_means(series, window=WEEK, step=DAY, duration=None):
+    """Duration-weighted mean of every window (see window_bounds), index = window start.
+    Without `duration` every snapshot counts as one hour."""
+    values = np.asarray(series, dtype=float)
+    duration = np.ones(len(values)) if duration is None else np.asarray(duration, dtype=float)
+    starts, ends = window_bounds(series.index, duration, window, step)
+    cs, cd = _cumsum(values * duration), _cumsum(duration)
+    return pd.Series((cs[ends] - cs[starts]) / (cd[ends] - cd[starts]), index=series.index[starts])
+
+
+def select_windows(series, window=WEEK, step=DAY, duration=None):
+    """{"low": (start, end), "high": (start, end)}: windows with the lowest and highest mean of `series`."""
+    duration = np.ones(len(series)) if duration is None else np.asarray(duration, dtype=float)
+    starts, ends = window_bounds(series.index, duration, window, step)
+    means = window_means(series, window, step, duration).to_numpy()
+    return {key: (series.index[starts[i]], series.index[ends[i] - 1]) for key, i in [("low", means.argmin()), ("high", means.argmax())]}
+
+
+def window_sums(df, windows, weightings=None):
+    """Weighted sum of every column over each window, one cumulative sum for all of them."""
+    values = df.to_numpy(dtype=float)
+    if weightings is not None:
+        values = values * weightings.reindex(df.index).to_numpy()[:, None]
+    cs = _cumsum(values)
+    rows = {}
+    for key, (start, end) in windows.items():
+        i, j = df.index.get_loc(start), df.index.get_loc(end) + 1
+        rows[key] = cs[j] - cs[i]
+    return pd.DataFrame(rows, index=df.columns).T
+
+
+###########################################
+# Series of a solved network
+###########################################
+
+def available_re(n, carriers=TECHNOLOGIES):
+    """Available renewable generation (p_max_pu x p_nom_opt), snapshots x generators."""
+    gens = n.generators.index[n.generators.carrier.isin(carriers)]
+    p_max_pu = n.get_switchable_as_dense("Generator", "p_max_pu")[gens]
+    return p_max_pu * n.generators.p_nom_opt[gens]
+
+
+def re_share(n, carriers=TECHNOLOGIES):
+    """Available renewable generation relative to the load, per snapshot."""
+    return available_re(n, carriers).sum(axis=1) / n.loads_t.p_set.sum(axis=1)
+
+
+def curtailment_series(n, carriers=TECHNOLOGIES):
+    """Curtailed power per carrier, snapshots x carriers."""
+    available = available_re(n, carriers)
+    curtailed = (available - n.generators_t.p[available.columns]).clip(lower=0)
+    return curtailed.T.groupby(n.generators.carrier[available.columns]).sum().T
+
+
+def re_windows(n, window=WEEK, step=DAY):
+    """Weeks with the lowest and highest renewable share (window and step in hours)."""
+    share = re_share(n)
+    return select_windows(share, window, step, n.snapshot_weightings.stores.reindex(share.index))
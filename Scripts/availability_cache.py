@@ -0,0 +1,70 @@
+import hashlib
+import json
+from pathlib import Path
+
+import atlite
+import numpy as np
+import xarray as xr
+
+###########################################
+# PATHS
+###########################################
+
+CACHE_DIR = "../Data/processed/cache/availability"
+
+
+###########################################
+# Content hashes
+###########################################
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def grid_hash(cutout):
+    """Hash of the cutout grid (coordinates and CRS), independent of the weather year."""
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(cutout.data.x.values).tobytes())
+    h.update(np.ascontiguousarray(cutout.data.y.values).tobytes())
+    h.update(str(cutout.crs).encode())
+    return h.hexdigest()
+
+
+def availability_key(input_paths, cutout, **settings):
+    """Key from the content of the input geometry files, the cutout grid and the excluder settings."""
+    key = {
+        "inputs": {str(p): file_hash(p) for p in input_paths},
+        "grid": grid_hash(cutout),
+        "settings": settings,
+        "atlite": atlite.__version__,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+###########################################
+# Cache
+###########################################
+
+def cached_availability(name, input_paths, cutout, compute, cache_dir=CACHE_DIR, **settings):
+    """Availability matrix `name` from the on-disk cache, or computed with `compute()` and stored.
+
+    Any change of an input file, the cutout grid or the settings gives a new key,
+    so stale matrices are never reused. Older files of the same name are removed.
+    """
+    key = availability_key(input_paths, cutout, **settings)[:16]
+    path = Path(cache_dir) / f"A_{name}_{key}.nc"
+    if path.exists():
+        print(f"Availability matrix {name}: cached ({path.name})")
+        return xr.load_dataarray(path)
+
+    A = compute()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for old in path.parent.glob(f"A_{name}_*.nc"):
+        old.unlink()
+    A.to_netcdf(path)
+    print(f"Availability matrix {name}: computed and cached ({path.name})")
+    return A
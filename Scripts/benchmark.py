@@ -0,0 +1,306 @@
+import argparse
+import itertools
+import json
+import os
+import runpy
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+import solvers
+from instrumentation import Profiler, parse_solver_log, peak_rss_mb, span
+from network_build import COSTS_PATH, make_scenario, build_network, create_model
+from network_topology import len_factor
+from timeseries_store import TECHNOLOGIES
+
+###########################################
+# PATHS
+###########################################
+
+BENCH_DIR = "../results/benchmark"
+BASELINE_PATH = f"{BENCH_DIR}/baseline.json"
+ANALYSIS_SCRIPT = "04b_Analysis.py"
+
+###########################################
+# INPUT
+###########################################
+
+BUSES = [6, 24] #N
+SNAPSHOTS = [168, 730] #T, spread evenly over the year (weight 8760/T hours each)
+STORAGE = [0, 1, 3] #S, max_hours variants per storage carrier (discrete storage units), 0 = continuous store + links
+SOLVER = "highs" #open-source, runs offline
+THREADS = 1 #one thread keeps the timings comparable between machines and runs
+TOLERANCE = 0.25 #time/memory more than 25 % above the baseline counts as regression
+
+CONVENTIONALS = ["coal", "gas", "oil", "biomass"]
+BENCHMARK_SCENARIO = {} #DEFAULT_SCENARIO of network_build.py
+
+# bounding box of Denmark, the synthetic buses are put on a grid inside it
+LON = (8.1, 12.6)
+LAT = (54.7, 57.6)
+
+###########################################
+# Synthetic inputs with the schema of network_build.load_inputs
+###########################################
+
+
+def synthetic_inputs(n_buses, n_snapshots, n_storage, seed=0, cost_year=2030):
+    """Inputs for build_network with N buses, T snapshots and S storage variants.
+
+    Loads and capacity factors are smooth seasonal/daily profiles with noise, the buses
+    sit on a grid over Denmark with links between grid neighbours. Costs are the processed
+    cost table of the repository, so no download or input pipeline run is needed.
+    """
+    rng = np.random.default_rng(seed)
+    regions = pd.Index([f"bus{i:03d}" for i in range(n_buses)])
+    hours = 8760 / n_snapshots
+    snapshots = pd.date_range("2013-01-01", periods=n_snapshots, freq=pd.Timedelta(hours=hours))
+
+    hour_of_year = 2 * np.pi * (snapshots.dayofyear.to_numpy() * 24 + snapshots.hour.to_numpy()) / 8760
+    hour_of_day = snapshots.hour.to_numpy()[:, None]
+    winter = np.cos(hour_of_year)[:, None] #1 in January, -1 in July
+
+    def smooth_noise(scale):
+        noise = pd.DataFrame(rng.normal(0, scale, (n_snapshots, n_buses)))
+        return noise.ewm(alpha=0.2).mean().to_numpy()
+
+    # loads: peak in winter and during the day
+    base = rng.uniform(200, 800, n_buses)
+    daily = 0.1 * np.sin(np.pi * (hour_of_day - 6) / 12)
+    loads = pd.DataFrame(base * (1 + 0.15 * winter + daily + smooth_noise(0.05)), index=snapshots, columns=regions)
+    loads.insert(0, "DK", loads.sum(axis=1))
+
+    # capacity factors
+    daylight = np.clip(np.sin(np.pi * (hour_of_day - 6) / 12), 0, None)
+    solar = np.clip(daylight * (0.55 - 0.3 * winter) + smooth_noise(0.05), 0, 1)
+    onwind = np.clip(0.3 + 0.1 * winter + smooth_noise(0.3), 0, 1)
+    offwind = np.clip(1.25 * onwind + 0.05, 0, 1)
+    cf = {"onwind": onwind, "offwind": offwind, "solar": solar}
+    re_cf = pd.concat(
+        {tech: pd.DataFrame(cf[tech], index=snapshots, columns=regions) for tech in TECHNOLOGIES},
+        axis=1, names=["technology", "region"],
+    )
+
+    peak = loads[regions].max().to_numpy()
+    re_potential = pd.DataFrame({"onwind": 4 * peak, "offwind": 4 * peak, "solar": 6 * peak}, index=regions)
+    re_potential.index.name = "region"
+
+    cap_by_region_fuel = pd.DataFrame(
+        {"capacity_mw": rng.uniform(0, 400, n_buses * len(CONVENTIONALS))},
+        index=pd.MultiIndex.from_product([regions, CONVENTIONALS], names=["NAME_1", "primary_fuel"]),
+    )
+
+    # buses on a grid, links to the right and upper neighbour
+    cols = int(np.ceil(np.sqrt(n_buses)))
+    rows = int(np.ceil(n_buses / cols))
+    row, col = np.divmod(np.arange(n_buses), cols)
+    centroids = pd.DataFrame({
+        "region": regions,
+        "lon": LON[0] + (col + 0.5) * (LON[1] - LON[0]) / cols,
+        "lat": LAT[0] + (row + 0.5) * (LAT[1] - LAT[0]) / rows,
+    })
+    pairs = [(i, i + 1) for i in range(n_buses) if col[i] + 1 < cols and i + 1 < n_buses]
+    pairs += [(i, i + cols) for i in range(n_buses) if i + cols < n_buses]
+    i, j = np.array(pairs).reshape(-1, 2).T
+    lat_mid = np.radians((centroids["lat"].to_numpy()[i] + centroids["lat"].to_numpy()[j]) / 2)
+    dx = (centroids["lon"].to_numpy()[j] - centroids["lon"].to_numpy()[i]) * 111.32 * np.cos(lat_mid)
+    dy = (centroids["lat"].to_numpy()[j] - centroids["lat"].to_numpy()[i]) * 110.57
+    links = pd.DataFrame({
+        "bus0": regions[i],
+        "bus1": regions[j],
+        "type": np.where(rng.random(len(i)) < 0.3, "HVDC submarine", "HVAC overhead"),
+        "length_km": np.hypot(dx, dy) * len_factor,
+    })
+    links.index = links["bus0"] + "_" + links["bus1"]
+
+    weightings = pd.DataFrame({"objective": hours, "generators": hours, "stores": hours}, index=snapshots)
+
+    return {
+        "loads": loads,
+        "cap_by_region_fuel": cap_by_region_fuel,
+        "conventionals": CONVENTIONALS,
+        "renewables": list(TECHNOLOGIES),
+        "re_cf": {2018: re_cf},
+        "re_potential": re_potential,
+        "centroids": centroids,
+        "links": links,
+        "costs": {cost_year: pd.read_csv(COSTS_PATH.format(year=cost_year), index_col=[0])},
+        "snapshot_weightings": weightings,
+        "e_to_p_ratio_battery": [2 * (k + 1) for k in range(n_storage)],
+        "e_to_p_ratio_hydrogen": [168 * 2**k for k in range(n_storage)],
+    }
+
+
+###########################################
+# One benchmark case (run in its own process, so the peak RSS belongs to this case)
+###########################################
+
+def solver_runtime(model):
+    """Time reported by the solver itself (None if the interface does not expose it)."""
+    solver_model = getattr(model, "solver_model", None)
+    for attr in ("getRunTime", "Runtime"): #HiGHS, Gurobi
+        value = getattr(solver_model, attr, None)
+        if value is not None:
+            return value() if callable(value) else value
+    return None
+
+
+def run_case(n_buses, n_snapshots, n_storage, solver_name=SOLVER, threads=THREADS, analysis=True):
+    """Run one case with the spans of instrumentation.py. The spans of network_build
+    (one per component class) and of 04b_Analysis.py (one per block) nest into the phases."""
+    name = case_name(n_buses, n_snapshots, n_storage)
+    profiler = Profiler(name)
+    instrumentation.activate(profiler)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with span("inputs"):
+            inputs = synthetic_inputs(n_buses, n_snapshots, n_storage)
+            s = make_scenario({**BENCHMARK_SCENARIO, "storage": "discrete" if n_storage else "continuous"})
+        with span("build"):
+            n = build_network(inputs, s)
+        with span("create_model"):
+            create_model(n)
+        n_variables, n_constraints = n.model.nvars, n.model.ncons
+        log_fn = Path(tmp) / "solver.log"
+        with span("solve"):
+            status, condition = solvers.solve(n, solver_name=solver_name, threads=threads, log_fn=log_fn)
+        solver_log = parse_solver_log(log_fn, solver_name)
+        path = Path(tmp) / f"n_bench_{name}.nc"
+        with span("export"):
+            n.export_to_netcdf(path)
+        if analysis and status == "ok":
+            with span("analysis"):
+                argv = sys.argv
+                sys.argv = [ANALYSIS_SCRIPT, str(path)]
+                try:
+                    runpy.run_path(ANALYSIS_SCRIPT, run_name="__main__")
+                finally:
+                    sys.argv = argv
+    instrumentation.activate(None)
+
+    phases = {k: {"seconds": p["seconds"], "peak_rss_mb": p["peak_rss_mb"]} for k, p in profiler.phases().items()}
+    return {
+        "case": name,
+        "buses": n_buses,
+        "snapshots": n_snapshots,
+        "storage": n_storage,
+        "solver": solver_name,
+        "status": status,
+        "condition": condition,
+        "objective": n.objective if status == "ok" else None,
+        "variables": int(n_variables),
+        "constraints": int(n_constraints),
+        "solver_seconds": solver_log.get("solver_seconds", solver_runtime(n.model)),
+        "solver_log": solver_log,
+        "total_seconds": sum(p["seconds"] for p in phases.values()),
+        "peak_rss_mb": peak_rss_mb(),
+        "phases": phases,
+        "spans": profiler.to_dict()["spans"],
+    }
+
+
+def case_name(n_buses, n_snapshots, n_storage):
+    return f"N{n_buses}_T{n_snapshots}_S{n_storage}"
+
+
+def run_benchmark(buses=BUSES, snapshots=SNAPSHOTS, storage=STORAGE, solver_name=SOLVER, threads=THREADS, analysis=True):
+    """Run every (N, T, S) case one after another, each in a fresh process."""
+    os.environ.setdefault("MPLBACKEND", "Agg") #04b_Analysis.py plots without a display
+    results = []
+    for n_buses, n_snapshots, n_storage in itertools.product(buses, snapshots, storage):
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(run_case, n_buses, n_snapshots, n_storage, solver_name, threads, analysis).result()
+        peak = "n/a" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f}"
+        print(
+            f"{result['case']}: {result['total_seconds']:.1f} s, {peak} MB, "
+            f"{result['variables']} variables, {result['constraints']} constraints, {result['condition']}"
+        )
+        results.append(result)
+    return results
+
+
+###########################################
+# Results and baseline
+###########################################
+
+def metrics(result):
+    """Flat {metric: value} of one case for the comparison."""
+    flat = {
+        "total_seconds": result["total_seconds"],
+        "peak_rss_mb": result["peak_rss_mb"],
+        "variables": result["variables"],
+        "constraints": result["constraints"],
+    }
+    flat.update({f"{name}_seconds": p["seconds"] for name, p in result["phases"].items()})
+    return flat
+
+
+def write_results(results, out_dir=BENCH_DIR):
+    """JSON with everything plus a flat CSV (one row per case)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    meta = {"created": stamp, "python": sys.version.split()[0], "platform": sys.platform, "cpus": os.cpu_count()}
+    path = out_dir / f"benchmark_{stamp}.json"
+    path.write_text(json.dumps({"meta": meta, "results": results}, indent=1))
+    pd.DataFrame([{"case": r["case"], **metrics(r)} for r in results]).to_csv(path.with_suffix(".csv"), index=False)
+    return path
+
+
+def compare(results, baseline_path=BASELINE_PATH, tolerance=TOLERANCE):
+    """Ratio of every metric to the baseline. Times and memory regress above 1 + tolerance,
+    variable/constraint counts regress on any change (the model itself changed)."""
+    baseline = {r["case"]: metrics(r) for r in json.loads(Path(baseline_path).read_text())["results"]}
+    rows = []
+    for result in results:
+        if result["case"] not in baseline:
+            continue
+        for metric, value in metrics(result).items():
+            base = baseline[result["case"]].get(metric)
+            if base is None or value is None: #e.g. no peak memory on Windows
+                continue
+            ratio = value / base if base else float("nan")
+            exact = metric in ("variables", "constraints")
+            rows.append({
+                "case": result["case"],
+                "metric": metric,
+                "baseline": base,
+                "current": value,
+                "ratio": ratio,
+                "regression": value != base if exact else ratio > 1 + tolerance,
+            })
+    return pd.DataFrame(rows, columns=["case", "metric", "baseline", "current", "ratio", "regression"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time build, solve, export and analysis on synthetic inputs.")
+    parser.add_argument("--buses", type=int, nargs="+", default=BUSES)
+    parser.add_argument("--snapshots", type=int, nargs="+", default=SNAPSHOTS)
+    parser.add_argument("--storage", type=int, nargs="+", default=STORAGE)
+    parser.add_argument("--solver", default=SOLVER)
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--no-analysis", action="store_true", help="skip 04b_Analysis.py")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.buses, args.snapshots, args.storage, args.solver, args.threads, not args.no_analysis)
+    path = write_results(results)
+    print(f"Results: {path}")
+
+    if args.update_baseline:
+        Path(BASELINE_PATH).write_text(path.read_text())
+        print(f"Baseline updated: {BASELINE_PATH}")
+    elif Path(BASELINE_PATH).exists():
+        comparison = compare(results, tolerance=args.tolerance)
+        comparison.to_csv(path.with_name(path.stem + "_comparison.csv"), index=False)
+        regressions = comparison[comparison["regression"]]
+        print(regressions.to_string(index=False) if not regressions.empty else "No regressions against the baseline")
+        sys.exit(1 if not regressions.empty else 0)
@@ -0,0 +1,87 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+from rasterio.features import rasterize, shapes
+from rasterio.transform import from_origin
+from scipy.ndimage import distance_transform_edt
+from shapely.geometry import shape
+
+###########################################
+# Split the EEZ between the regions
+#
+# "vector": Voronoi cells of the representative points (sea goes to the closest point)
+# "raster": every sea pixel goes to the closest land pixel, i.e. the closest region
+# Both intersect the cells with the EEZ cut into tiles. An STRtree keeps only the
+# (cell, tile) pairs whose boxes touch and shapely intersects them in one vectorized call,
+# instead of overlaying every cell with the complete EEZ polygon.
+###########################################
+
+TILE_SIZE = 25_000 #in m, side of the EEZ tiles
+
+
+def subdivide(geom, tile_size=TILE_SIZE):
+    """`geom` cut along a regular grid into parts with few vertices each."""
+    minx, miny, maxx, maxy = geom.bounds
+    xs = np.arange(minx, maxx, tile_size)
+    ys = np.arange(miny, maxy, tile_size)
+    x0, y0 = (a.ravel() for a in np.meshgrid(xs, ys))
+    parts = shapely.intersection(geom, shapely.box(x0, y0, x0 + tile_size, y0 + tile_size))
+    return parts[~shapely.is_empty(parts)]
+
+
+def clip_cells(cells, names, area, tile_size=TILE_SIZE):
+    """Parts of `area` inside the cells, dissolved by name (GeoDataFrame NAME_1, geometry)."""
+    parts = subdivide(area, tile_size)
+    cell_i, part_i = shapely.STRtree(parts).query(cells, predicate="intersects")
+    pieces = shapely.intersection(cells[cell_i], parts[part_i])
+    keep = shapely.area(pieces) > 0
+    clipped = gpd.GeoDataFrame({"NAME_1": np.asarray(names)[cell_i[keep]]}, geometry=pieces[keep])
+    return clipped.dissolve(by="NAME_1").reset_index()
+
+
+def voronoi_cells(points, extent):
+    """Voronoi cell of each point (same order as `points`), reaching at least to `extent`."""
+    cells = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(points), extend_to=extent))
+    point_i, cell_i = shapely.STRtree(cells).query(points, predicate="within")
+    order = np.empty(len(points), dtype=int)
+    order[point_i] = cell_i
+    return cells[order]
+
+
+def nearest_region_cells(regions, area, res):
+    """Sea pixels of `area` assigned to the closest region, polygonized. Returns (cells, region position)."""
+    minx, miny, maxx, maxy = area.bounds
+    transform = from_origin(minx, maxy, res, res)
+    out_shape = (int(np.ceil((maxy - miny) / res)), int(np.ceil((maxx - minx) / res)))
+
+    labels = rasterize(
+        ((geom, i + 1) for i, geom in enumerate(regions)), out_shape=out_shape, transform=transform, fill=0, dtype="int32"
+    )
+    sea = rasterize([area], out_shape=out_shape, transform=transform, fill=0, dtype="uint8", all_touched=True).astype(bool)
+
+    _, (rows, cols) = distance_transform_edt(labels == 0, return_indices=True) #index of the closest land pixel
+    nearest = np.where(sea, labels[rows, cols], 0).astype("int32")
+
+    polygons = [(shape(geom), int(v) - 1) for geom, v in shapes(nearest, mask=nearest > 0, transform=transform)]
+    cells, region_i = zip(*polygons)
+    return np.asarray(cells), np.asarray(region_i)
+
+
+def eez_by_region(eez, regions, points, method="vector", res=1000, tile_size=TILE_SIZE):
+    """EEZ split between the regions, columns NAME_1 and geometry, CRS of `regions` (projected, m).
+
+    regions: GeoDataFrame with NAME_1, points: representative points in the same order.
+    """
+    area = eez.to_crs(regions.crs).geometry.union_all()
+    names = regions["NAME_1"].to_numpy()
+
+    if method == "vector":
+        extent = shapely.box(*area.bounds).buffer(1000) #cells must cover the whole EEZ
+        cells = voronoi_cells(np.asarray(points), extent)
+    elif method == "raster":
+        cells, region_i = nearest_region_cells(np.asarray(regions.geometry), area, res)
+        names = names[region_i]
+    else:
+        raise ValueError(f"Unknown EEZ partition method '{method}'")
+
+    return gpd.GeoDataFrame(clip_cells(cells, names, area, tile_size), crs=regions.crs)
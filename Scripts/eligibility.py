@@ -0,0 +1,426 @@
+import functools
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import geopandas as gpd
+import matplotlib.pyplot as plt
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.enums import Resampling
+from rasterio.features import rasterize
+from rasterio.plot import show
+from rasterio.transform import array_bounds, from_origin
+from rasterio.warp import reproject
+from rasterio.windows import Window, from_bounds
+from scipy.ndimage import distance_transform_edt
+from shapely.geometry import box
+
+from availability_cache import file_hash
+from eligibility_raster import GTIFF_PROFILE, OVERVIEW_FACTORS, write_availability_raster
+from geometry_store import layer_path
+from plotting import downsample_band, figure_key, is_current, mark_current
+
+###########################################
+# INPUT
+###########################################
+
+CRS = 3035
+RES = 100 #in m, 25-50 m is possible with the tiled mode (run_all(..., tile_size=2048))
+PLOT_FIGSIZE = (7, 14)
+PLOT_DPI = 300 #the band is reduced to the pixels of the figure at this dpi before plotting
+
+###########################################
+# PATHS
+###########################################
+
+REGIONS_PATH = layer_path("regions", 3035)
+EEZ_PATH = layer_path("eez_by_region", 3035)
+GADM_PATH = "../Data/raw/gadm/gadm_410-levels-ADM_1-DNK.gpkg"
+LC_PATH = "../Data/raw/copernicus/PROBAV_LC100_global_v3.0.1_2019-nrt_Discrete-Classification-map_EPSG-4326-DK.tif"
+PA_PATH = "../Data/raw/wdpa/WDPA_Oct2022_Public_shp-DNK.tif"
+EV_PATH = "../Data/raw/gebco/GEBCO_2014_2D-DK.nc"
+AP_PATH = "../Data/raw/ne_10m_airports.gpkg"
+R_PATH = "../Data/raw/ne_10m_roads.gpkg"
+
+CACHE_DIR = "../Data/processed/cache/eligibility"
+OUT_DIR = "../Data/processed/eligibility"
+PLOT_DIR = "../plots_and_figures"
+
+###########################################
+# Exclusion sources (each is reprojected/rasterized onto the common grid once)
+###########################################
+
+SOURCES = {
+    # crs is only used if the file has none; nodata fills the grid outside the raster
+    "landcover": {"type": "raster", "path": LC_PATH, "crs": 3035, "nodata": 48},
+    "wdpa": {"type": "raster", "path": PA_PATH, "nodata": 255}, #atlite's default: outside the raster is excluded
+    "gebco": {"type": "raster", "path": EV_PATH, "crs": 4326, "nodata": 0},
+    "airports": {"type": "vector", "path": AP_PATH},
+    "major_roads": {"type": "vector", "path": R_PATH, "query": "scalerank >= 1 and scalerank <= 4"}, #filter for main roads
+    "dk_land": {"type": "vector", "path": GADM_PATH},
+}
+
+###########################################
+# Exclusion rules per technology
+#
+# A rule excludes the pixels of a source that match
+#   codes: list of raster values | below / above: threshold | nothing: every non-zero pixel
+# plus everything within `buffer` m of them.
+###########################################
+
+TECHNOLOGIES = {
+    "pv": {
+        "area": REGIONS_PATH,
+        "raster": f"{OUT_DIR}/eligible_pv_areas_DK.tif",
+        "plot": f"{PLOT_DIR}/eligible_pv_areas_DK.png",
+        "title": "Eligible PV Energy Areas in Denmark",
+        "rules": [
+            {"source": "landcover", "codes": [111, 113, 112, 114, 115, 116, 121, 123, 122, 125, 126, 70, 80, 200]},
+            {"source": "wdpa"},
+        ],
+    },
+    "wind_on": {
+        "area": REGIONS_PATH,
+        "raster": f"{OUT_DIR}/eligible_wind_on_areas_DK.tif",
+        "plot": f"{PLOT_DIR}/eligible_onshore_wind_areas_DK.png",
+        "title": "Eligible onshore Wind Energy Areas in Denmark",
+        "rules": [
+            {"source": "airports", "buffer": 10000},
+            {"source": "major_roads", "buffer": 300},
+            {"source": "landcover", "codes": [90, 80, 200], "buffer": 800},
+            {"source": "landcover", "codes": [50], "buffer": 1000},
+            {"source": "wdpa"},
+            #excluder for elevation not needed as highest point in Denmark is about 170m
+        ],
+    },
+    "wind_off": {
+        "area": EEZ_PATH,
+        "raster": f"{OUT_DIR}/eligible_wind_off_areas_DK.tif",
+        "plot": f"{PLOT_DIR}/eligible_offshore_wind_areas_DK.png",
+        "title": "Eligible offshore Wind Energy Areas in Denmark",
+        "rules": [
+            {"source": "wdpa"},
+            {"source": "dk_land", "buffer": 10000},
+            {"source": "gebco", "below": -50}, #water depth of more than 50 m
+        ],
+    },
+}
+
+
+###########################################
+# Common grid
+###########################################
+
+def max_buffer():
+    return max(r.get("buffer", 0) for t in TECHNOLOGIES.values() for r in t["rules"])
+
+
+def target_grid(res=RES):
+    """Grid in EPSG:3035 covering all technology areas, padded by the largest buffer so that
+    exclusions just outside an area still reach into it."""
+    bounds = np.array([read_vector(t["area"]).total_bounds for t in TECHNOLOGIES.values()])
+    pad = max_buffer() + res
+    minx = math.floor((bounds[:, 0].min() - pad) / res) * res
+    miny = math.floor((bounds[:, 1].min() - pad) / res) * res
+    maxx = math.ceil((bounds[:, 2].max() + pad) / res) * res
+    maxy = math.ceil((bounds[:, 3].max() + pad) / res) * res
+    shape = (int((maxy - miny) / res), int((maxx - minx) / res))
+    return from_origin(minx, maxy, res, res), shape
+
+
+###########################################
+# Sources on the common grid (disk cache + in-memory cache per process)
+###########################################
+
+_loaded = {}
+
+
+@functools.lru_cache(maxsize=None)
+def source_cache_path(name, transform, shape):
+    spec = SOURCES[name]
+    key = {
+        "file": file_hash(spec["path"]),
+        "spec": {k: v for k, v in spec.items() if k != "path"},
+        "grid": [list(transform)[:6], list(shape), CRS],
+    }
+    key = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+    return Path(CACHE_DIR) / f"{name}_{int(transform.a)}m_{key}.tif"
+
+
+@functools.lru_cache(maxsize=None)
+def read_vector(path, query=None):
+    """Geometries of a vector file in the grid CRS (read once per process)."""
+    gdf = gpd.read_parquet(path) if Path(path).suffix == ".parquet" else gpd.read_file(path)
+    if query:
+        gdf = gdf.query(query)
+    geoms = gdf.to_crs(CRS).geometry
+    return geoms[~(geoms.isna() | geoms.is_empty)].reset_index(drop=True)
+
+
+def burn(geoms, transform, shape, all_touched=False):
+    """Rasterize the geometries that intersect the grid window given by transform/shape."""
+    window_box = box(*array_bounds(shape[0], shape[1], transform))
+    geoms = geoms.iloc[geoms.sindex.query(window_box, predicate="intersects")]
+    if geoms.empty:
+        return np.zeros(shape, dtype="uint8")
+    return rasterize(
+        ((geom, 1) for geom in geoms),
+        out_shape=shape,
+        transform=transform,
+        fill=0,
+        all_touched=all_touched,
+        dtype="uint8",
+    )
+
+
+def _source_dtype(name):
+    spec = SOURCES[name]
+    if spec["type"] == "raster":
+        with rasterio.open(spec["path"]) as src:
+            return src.dtypes[0]
+    return "uint8"
+
+
+def _project_source(name, transform, shape):
+    spec = SOURCES[name]
+    if spec["type"] == "raster":
+        with rasterio.open(spec["path"]) as src:
+            dst = np.full(shape, spec.get("nodata", 255), dtype=src.dtypes[0])
+            reproject(
+                rasterio.band(src, 1),
+                dst,
+                src_crs=src.crs or f"EPSG:{spec['crs']}",
+                dst_transform=transform,
+                dst_crs=CRS,
+                dst_nodata=spec.get("nodata", 255),
+                resampling=Resampling.nearest,
+            )
+        return dst
+    return burn(read_vector(spec["path"], spec.get("query")), transform, shape, all_touched=True)
+
+
+def grid_tiles(window, tile_size):
+    """Windows of at most tile_size x tile_size pixels covering `window`."""
+    row_end = int(window.row_off + window.height)
+    col_end = int(window.col_off + window.width)
+    for row in range(int(window.row_off), row_end, tile_size):
+        for col in range(int(window.col_off), col_end, tile_size):
+            yield Window(col, row, min(tile_size, col_end - col), min(tile_size, row_end - row))
+
+
+def prepare_source(name, transform, shape, tile_size=None):
+    """Reproject/rasterize source `name` onto the grid unless an up-to-date cache file exists.
+
+    With `tile_size` the cache file is written tile by tile, so memory does not grow with the grid.
+    """
+    path = source_cache_path(name, transform, shape)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for old in path.parent.glob(f"{name}_{int(transform.a)}m_*.tif"):
+            old.unlink()
+        profile = {**GTIFF_PROFILE, "dtype": _source_dtype(name), "predictor": 1, "BIGTIFF": "IF_SAFER"}
+        full = Window(0, 0, shape[1], shape[0])
+        tmp = path.with_suffix(f".{os.getpid()}.part") #unique per process, the three eligibility scripts may run at once
+        with rasterio.open(tmp, "w", height=shape[0], width=shape[1], transform=transform, crs=CRS, **profile) as dst:
+            for window in (grid_tiles(full, tile_size) if tile_size else [full]):
+                data = _project_source(
+                    name, rasterio.windows.transform(window, transform), (int(window.height), int(window.width))
+                )
+                dst.write(data, 1, window=window)
+        tmp.replace(path) #another process may have written it meanwhile (rename fails on Windows then)
+    return path
+
+
+def read_source(name, transform, shape, window, keep=True):
+    """Source `name` inside `window` of the grid, read from the cache.
+    With `keep` the array stays in memory for later calls in this process."""
+    key = (name, window.flatten())
+    if key in _loaded:
+        return _loaded[key]
+    with rasterio.open(prepare_source(name, transform, shape)) as src:
+        data = src.read(1, window=window, boundless=True, fill_value=SOURCES[name].get("nodata", 255))
+    if keep:
+        _loaded[key] = data
+    return data
+
+
+###########################################
+# Masks
+###########################################
+
+def buffer_mask(mask, buffer, res=RES):
+    """Grow `mask` by `buffer` m."""
+    if not buffer or not mask.any():
+        return mask
+    return distance_transform_edt(~mask) * res <= buffer
+
+
+def rule_mask(rule, data, res=RES):
+    if "codes" in rule:
+        mask = np.isin(data, rule["codes"])
+    elif "below" in rule:
+        mask = data < rule["below"]
+    elif "above" in rule:
+        mask = data > rule["above"]
+    else:
+        mask = data != 0
+    return buffer_mask(mask, rule.get("buffer", 0), res)
+
+
+def area_window(name, transform):
+    """Grid window covering the area of technology `name`."""
+    area = read_vector(TECHNOLOGIES[name]["area"])
+    return from_bounds(*area.total_bounds, transform=transform).round_offsets().round_lengths()
+
+
+def compute_window(name, transform, shape, inner, keep_sources=True):
+    """Availability band (1 = eligible) of technology `name` inside grid window `inner`.
+
+    The exclusions are evaluated on `inner` grown by the largest buffer of the technology,
+    so that tiles computed independently fit together without seams.
+    """
+    tech = TECHNOLOGIES[name]
+    res = transform.a
+    pad = int(math.ceil(max((r.get("buffer", 0) for r in tech["rules"]), default=0) / res)) + 1
+    outer = Window(inner.col_off - pad, inner.row_off - pad, inner.width + 2 * pad, inner.height + 2 * pad)
+
+    excluded = np.zeros((int(outer.height), int(outer.width)), dtype=bool)
+    for rule in tech["rules"]:
+        excluded |= rule_mask(rule, read_source(rule["source"], transform, shape, outer, keep_sources), res)
+    excluded = excluded[pad:-pad, pad:-pad]
+
+    inner_transform = rasterio.windows.transform(inner, transform)
+    in_area = burn(read_vector(tech["area"]), inner_transform, excluded.shape).astype(bool)
+    return (in_area & ~excluded).astype(np.uint8), inner_transform
+
+
+def compute_technology(name, transform=None, shape=None):
+    """Availability band and its transform for technology `name`, cropped to the bounds of its area."""
+    if transform is None:
+        transform, shape = target_grid()
+    return compute_window(name, transform, shape, area_window(name, transform))
+
+
+###########################################
+# Output
+###########################################
+
+def plot_pixels():
+    return int(max(PLOT_FIGSIZE) * PLOT_DPI)
+
+
+def plot_technology(name, band, transform):
+    """Map of the availability band, skipped if band, area and title are unchanged."""
+    tech = TECHNOLOGIES[name]
+    band, transform = downsample_band(band, transform, plot_pixels())
+    key = figure_key(plot_technology, {
+        "band": np.ascontiguousarray(band),
+        "transform": tuple(transform),
+        "area": file_hash(tech["area"]),
+        "title": tech["title"],
+        "dpi": PLOT_DPI,
+    })
+    if is_current(tech["plot"], key):
+        return
+
+    area = read_vector(tech["area"])
+    fig, ax = plt.subplots(figsize=PLOT_FIGSIZE)
+    area.plot(ax=ax, color="none")
+    show(band, transform=transform, cmap="Greens", ax=ax)
+    ax.set_title(tech["title"])
+    ax.set_xlabel("Easting (m) – EPSG:3035")
+    ax.set_ylabel("Northing (m) – EPSG:3035")
+
+    plt.savefig(
+        tech["plot"],
+        dpi=PLOT_DPI,
+        bbox_inches="tight",
+        pad_inches=0.05
+    )
+    plt.close(fig)
+    mark_current(tech["plot"], key)
+
+
+def plot_technology_raster(name, max_pixels=None):
+    """Plot the saved raster from a decimated read (served from the overviews of the GeoTIFF),
+    so the full band never has to be in memory."""
+    max_pixels = max_pixels or plot_pixels()
+    with rasterio.open(TECHNOLOGIES[name]["raster"]) as src:
+        factor = max(1, math.ceil(max(src.height, src.width) / max_pixels))
+        band = src.read(
+            1,
+            out_shape=(math.ceil(src.height / factor), math.ceil(src.width / factor)),
+            resampling=Resampling.average,
+        )
+        transform = src.transform * Affine.scale(src.width / band.shape[1], src.height / band.shape[0])
+    plot_technology(name, band, transform)
+
+
+def run_technology(name, transform=None, shape=None, plot=True):
+    """Compute, save as raster and plot the eligible area of one technology."""
+    band, band_transform = compute_technology(name, transform, shape)
+    Path(TECHNOLOGIES[name]["raster"]).parent.mkdir(parents=True, exist_ok=True)
+    write_availability_raster(band, band_transform, CRS, TECHNOLOGIES[name]["raster"])
+    if plot:
+        plot_technology(name, band, band_transform)
+    return TECHNOLOGIES[name]["raster"]
+
+
+def run_technology_tiled(name, res=RES, tile_size=2048, max_workers=None, plot=True):
+    """Tiled version of run_technology for fine resolutions.
+
+    The area is split into tiles of tile_size x tile_size pixels, each tile is computed in a
+    worker process on the tile grown by the largest buffer, and written into its window of
+    the output GeoTIFF. Peak memory depends on the tile size, not on the size of the area.
+    """
+    transform, shape = target_grid(res)
+    for source in sorted({r["source"] for r in TECHNOLOGIES[name]["rules"]}):
+        prepare_source(source, transform, shape, tile_size)
+
+    inner = area_window(name, transform)
+    path = TECHNOLOGIES[name]["raster"]
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    profile = {**GTIFF_PROFILE, "BIGTIFF": "IF_SAFER"}
+    with rasterio.open(
+        path, "w", height=int(inner.height), width=int(inner.width),
+        transform=rasterio.windows.transform(inner, transform), crs=CRS, **profile
+    ) as dst, ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(compute_window, name, transform, shape, tile, False): tile
+            for tile in grid_tiles(inner, tile_size)
+        }
+        for future in as_completed(futures):
+            tile = futures[future]
+            band, _ = future.result()
+            dst.write(band, 1, window=Window(
+                tile.col_off - inner.col_off, tile.row_off - inner.row_off, tile.width, tile.height
+            ))
+        dst.build_overviews(OVERVIEW_FACTORS, Resampling.average)
+
+    if plot:
+        plot_technology_raster(name)
+    return path
+
+
+def run_all(names=None, max_workers=None, plot=True, res=RES, tile_size=None):
+    """All technologies. Sources are projected once up front, the workers read the cache.
+
+    Without `tile_size` the technologies run in parallel, one process each. With `tile_size`
+    they run one after another and the tiles of each technology run in parallel.
+    """
+    names = list(TECHNOLOGIES) if names is None else names
+    if tile_size:
+        return {name: run_technology_tiled(name, res, tile_size, max_workers, plot) for name in names}
+
+    transform, shape = target_grid(res)
+    for source in sorted({r["source"] for t in names for r in TECHNOLOGIES[t]["rules"]}):
+        prepare_source(source, transform, shape)
+
+    with ProcessPoolExecutor(max_workers=max_workers or len(names)) as pool:
+        futures = {name: pool.submit(run_technology, name, transform, shape, plot) for name in names}
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+import rasterio
+import xarray as xr
+from rasterio.enums import Resampling
+from rasterio.features import rasterize
+from rasterio.transform import array_bounds
+from rasterio.warp import reproject, transform_bounds
+from rasterio.windows import Window, from_bounds
+
+###########################################
+# Availability rasters (1 = eligible, 0 = excluded)
+###########################################
+
+GTIFF_PROFILE = {
+    "driver": "GTiff",
+    "dtype": "uint8",
+    "count": 1,
+    "tiled": True,
+    "blockxsize": 512,
+    "blockysize": 512,
+    "compress": "deflate",
+    "predictor": 2,
+}
+OVERVIEW_FACTORS = [2, 4, 8, 16, 32]
+
+
+def write_availability_raster(band, transform, crs, path):
+    """Write the availability band as a tiled, compressed GeoTIFF with internal overviews."""
+    with rasterio.open(
+        path, "w", height=band.shape[0], width=band.shape[1], transform=transform, crs=crs, **GTIFF_PROFILE
+    ) as dst:
+        dst.write(band.astype(np.uint8), 1)
+        dst.build_overviews(OVERVIEW_FACTORS, Resampling.average)
+    return path
+
+
+###########################################
+# Availability matrix directly from the raster
+###########################################
+
+def cutout_cell_size(cutout, crs):
+    """Width and height of a cutout cell in the units of `crs` (m for EPSG:3035)."""
+    ny, nx = len(cutout.data.y), len(cutout.data.x)
+    left, bottom, right, top = transform_bounds(cutout.crs, crs, *array_bounds(ny, nx, cutout.transform_r))
+    return (right - left) / nx, (top - bottom) / ny
+
+
+def availability_matrix_from_raster(raster_path, shapes, cutout, pad=None):
+    """Share of each cutout cell that is eligible and inside each shape, like cutout.availabilitymatrix.
+
+    shapes: GeoSeries indexed by region. For every region only its bounding window of the
+    raster is read and the region is burnt into that window, so memory is bounded by the
+    largest region, not the raster. The window is extended by `pad` m on each side
+    (default: one cutout cell) so every touched cutout cell is covered completely.
+    """
+    dst_shape = (len(cutout.data.y), len(cutout.data.x))
+
+    availability = []
+    with rasterio.open(raster_path) as src:
+        crs = src.crs
+        shapes = shapes.to_crs(crs)
+        if pad is None:
+            pad = max(cutout_cell_size(cutout, crs))
+        pad_x, pad_y = math.ceil(pad / src.res[0]), math.ceil(pad / src.res[1])
+
+        for geom in shapes.geometry:
+            window = from_bounds(*geom.bounds, transform=src.transform).round_offsets().round_lengths()
+            window = Window(window.col_off - pad_x, window.row_off - pad_y, window.width + 2 * pad_x, window.height + 2 * pad_y)
+            window_transform = rasterio.windows.transform(window, src.transform)
+            shape = (int(window.height), int(window.width))
+
+            band = src.read(1, window=window, boundless=True, fill_value=0)
+            inside = rasterize([(geom, 1)], out_shape=shape, transform=window_transform, fill=0, dtype="uint8")
+            masked = ((band == 1) & (inside == 1)).astype(np.float32)
+
+            dst = np.zeros(dst_shape, dtype=np.float32)
+            reproject(
+                masked,
+                dst,
+                src_transform=window_transform,
+                src_crs=crs,
+                dst_transform=cutout.transform_r,
+                dst_crs=cutout.crs,
+                resampling=Resampling.average,
+            )
+            availability.append(dst[::-1]) #transform_r is north up, the cutout y coordinates ascend
+
+    return xr.DataArray(
+        np.stack(availability),
+        coords=[shapes.index, ("y", cutout.data.y.data), ("x", cutout.data.x.data)],
+    )
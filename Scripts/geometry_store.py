@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+###########################################
+# PATHS
+###########################################
+
+# one GeoParquet file per layer, CRS and detail: geometry/<layer>_<epsg>[_simplified].parquet
+GEOMETRY_STORE = "../Data/processed/geometry"
+
+CRS_LIST = [3035, 4326]
+SIMPLIFY_TOLERANCE = 250 #in m, simplified variant for plots
+BOUNDS = ["minx", "miny", "maxx", "maxy"]
+
+###########################################
+# Layout
+#
+# Layers written by 01a_regions_define.py: "regions" and "eez_by_region" (column NAME_1).
+# Every layer is stored ready-projected in EPSG:3035 (areas, distances, rasters) and
+# EPSG:4326 (atlite, PyPSA bus coordinates), each in full detail and simplified for plotting.
+# The bounds of every geometry are stored as plain columns, so extents can be read
+# without decoding any geometry.
+###########################################
+
+
+def layer_path(layer, crs=3035, simplified=False, store=GEOMETRY_STORE):
+    return Path(store) / f"{layer}_{crs}{'_simplified' if simplified else ''}.parquet"
+
+
+def write_layer(gdf, layer, tolerance=SIMPLIFY_TOLERANCE, store=GEOMETRY_STORE):
+    """Write `gdf` (projected CRS in m) in every CRS of CRS_LIST, full and simplified."""
+    gdf = gdf.to_crs(CRS_LIST[0])
+    variants = {False: gdf, True: gdf.assign(geometry=gdf.simplify(tolerance, preserve_topology=True))}
+    paths = []
+    for simplified, variant in variants.items():
+        for crs in CRS_LIST:
+            out = variant.to_crs(crs)
+            out[BOUNDS] = out.bounds.to_numpy()
+            path = layer_path(layer, crs, simplified, store)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            out.to_parquet(path, compression="zstd")
+            paths.append(path)
+    return paths
+
+
+def read_layer(layer, crs=3035, simplified=False, columns=None, store=GEOMETRY_STORE):
+    """GeoDataFrame of `layer` already in `crs`. Only `columns` (plus geometry) are read if given."""
+    path = layer_path(layer, crs, simplified, store)
+    if not path.exists():
+        raise FileNotFoundError(f"No layer '{layer}' in EPSG:{crs} at {path}, run 01a_regions_define.py")
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, "geometry"]))
+    return gpd.read_parquet(path, columns=columns)
+
+
+def layer_bounds(layer, crs=3035, store=GEOMETRY_STORE):
+    """Total bounds (minx, miny, maxx, maxy) of `layer` from the bounds columns only."""
+    b = pd.read_parquet(layer_path(layer, crs, store=store), columns=BOUNDS)
+    return b["minx"].min(), b["miny"].min(), b["maxx"].max(), b["maxy"].max()
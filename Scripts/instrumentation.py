@@ -0,0 +1,196 @@
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None #Windows: no peak memory
+
+###########################################
+# Timing and memory spans
+#
+#   profiler = start("03_pypsa_model")
+#   with span("load_inputs"):
+#       ...
+#   profiler.write("../results/n_extendable_<scenario>.profile.json")
+#
+# span() can be used anywhere (e.g. inside network_build.add_components). Without an
+# active profiler it does nothing, so library code can be instrumented at no cost.
+# Spans nest: a span opened inside another one is recorded with the path "outer/inner".
+###########################################
+
+_active = None
+
+
+def rss_mb():
+    """Current resident set size (None where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (None where the resource module is not available)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024 #bytes on macOS, KiB on Linux
+
+
+class Profiler:
+    """Collects spans (name, start, duration, memory) and extra metadata of one run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.meta = {}
+        self._stack = []
+
+    @contextmanager
+    def span(self, name, **attrs):
+        path = "/".join([*self._stack, name])
+        self._stack.append(name)
+        start, rss_start = time.perf_counter(), rss_mb()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            rss_end = rss_mb()
+            self.spans.append({
+                "name": name,
+                "path": path,
+                "depth": len(self._stack),
+                "start": start - self.t0,
+                "seconds": time.perf_counter() - start,
+                "rss_mb": rss_end,
+                "rss_delta_mb": rss_end - rss_start if rss_end is not None and rss_start is not None else None,
+                "peak_rss_mb": peak_rss_mb(),
+                **attrs,
+            })
+
+    def phases(self):
+        """{name: span} of the top level spans."""
+        return {s["name"]: s for s in self.spans if s["depth"] == 0}
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "total_seconds": time.perf_counter() - self.t0,
+            "peak_rss_mb": peak_rss_mb(),
+            "meta": self.meta,
+            "spans": sorted(self.spans, key=lambda s: s["start"]),
+        }
+
+    def write(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=1, default=str))
+        return path
+
+
+def start(name):
+    """Active profiler; a new one named `name` is activated if there is none
+    (so a script run inside the benchmark adds its spans to the benchmark's profiler)."""
+    global _active
+    if _active is None:
+        _active = Profiler(name)
+    return _active
+
+
+def activate(profiler):
+    """Make `profiler` the active one (None deactivates). Returns the previous one."""
+    global _active
+    previous, _active = _active, profiler
+    return previous
+
+
+@contextmanager
+def profiled(name):
+    """Profiler for the block: the active one if there is one, else a new one that is
+    deactivated again at the end (e.g. one per network in a batch worker)."""
+    global _active
+    if _active is not None:
+        yield _active
+        return
+    _active = Profiler(name)
+    try:
+        yield _active
+    finally:
+        _active = None
+
+
+@contextmanager
+def span(name, **attrs):
+    if _active is None:
+        yield
+    else:
+        with _active.span(name, **attrs):
+            yield
+
+
+def profile_path(result_path):
+    """JSON next to the result file: n_<scenario>.nc -> n_<scenario>.profile.json"""
+    return Path(result_path).with_suffix(".profile.json")
+
+
+###########################################
+# Solver statistics from the solver log
+###########################################
+
+SOLVER_LOG_PATTERNS = {
+    "highs": {
+        "status": r"Model\s+status\s*:\s*(.+)",
+        "objective": r"Objective value\s*:\s*([-+\d.eE]+)",
+        "solver_seconds": r"HiGHS run time\s*:\s*([\d.]+)",
+        "simplex_iterations": r"Simplex\s+iterations\s*:\s*(\d+)",
+        "ipm_iterations": r"IPM\s+iterations\s*:\s*(\d+)",
+        "crossover_iterations": r"Crossover\s+iterations\s*:\s*(\d+)",
+        "presolved_rows": r"Presolving model\s*\n\s*(\d+) rows",
+    },
+    "gurobi": {
+        "status": r"^(Optimal objective|Model is infeasible|Infeasible or unbounded model|Time limit reached)",
+        "objective": r"Optimal objective\s+([-+\d.eE]+)",
+        "solver_seconds": r"(?:Solved|Stopped) in \d+ iterations and ([\d.]+) seconds",
+        "simplex_iterations": r"(?:Solved|Stopped) in (\d+) iterations",
+        "ipm_iterations": r"Barrier solved model in (\d+) iterations",
+        "threads": r"using up to (\d+) threads",
+    },
+    "cbc": {
+        "status": r"Result - (.+)",
+        "objective": r"Objective value:\s*([-+\d.eE]+)",
+        "solver_seconds": r"Total time \(CPU seconds\):\s*([\d.]+)",
+        "simplex_iterations": r"Iterations:\s*(\d+)",
+    },
+    "glpk": {
+        "status": r"^(OPTIMAL.*|PROBLEM HAS NO .*)$",
+        "solver_seconds": r"Time used:\s*([\d.]+) secs",
+        "memory_used": r"Memory used:\s*([\d.]+ \w+)",
+    },
+}
+
+
+def parse_solver_log(log_fn, solver_name):
+    """Solver statistics found in the log file (last occurrence of each pattern)."""
+    path = Path(log_fn)
+    if not path.exists():
+        return {}
+    text = path.read_text(errors="replace")
+    stats = {}
+    for key, pattern in SOLVER_LOG_PATTERNS.get(solver_name, {}).items():
+        matches = re.findall(pattern, text, re.MULTILINE)
+        if matches:
+            value = matches[-1].strip()
+            try:
+                value = float(value) if "." in value or "e" in value.lower() else int(value)
+            except ValueError:
+                pass
+            stats[key] = value
+    return stats
@@ -0,0 +1,527 @@
+import copy
+import itertools
+from pathlib import Path
+
+import pandas as pd
+import geopandas as gpd
+import pypsa
+from pypsa.common import annuity
+
+import solvers
+from instrumentation import span
+from network_topology import LINKS_PATH, manual_links, read_links
+from result_summary import write_summary
+from time_aggregation import aggregate_inputs, aggregation_tag
+from timeseries_store import TECHNOLOGIES, read_cf, read_load
+
+###########################################
+# PATHS
+###########################################
+
+PP_PATH = "../Data/processed/dk_powerplants_with_region.csv"
+COSTS_PATH = "../Data/processed/costs_{year}.csv"
+C_PATH = "../Data/processed/region_centroids_wsg.csv"
+C_ETR_PATH = "../Data/processed/region_centroids_etr.csv"
+RE_P_PATH = "../Data/processed/dk_re_max_potentials_by_region.csv"
+RESULTS_DIR = "../results"
+
+###########################################
+# Default scenario (same values as the INPUT section of 03_pypsa_model.py)
+###########################################
+
+DEFAULT_SCENARIO = {
+    "boolean_conventionals_extendable": 1, #yes=1; no=0
+    "boolean_zero_emission": 1, #yes=1; no=0
+    "max_power_links": { #in MW per link
+        "Nordjylland_Midtjylland": 2000,
+        "Nordjylland_Hovedstaden_West": 2000,
+        "Nordjylland_Sjælland": 2000,
+        "Midtjylland_Syddanmark": 2000,
+        "Midtjylland_Sjælland": 2000,
+        "Syddanmark_Sjælland": 2000,
+        "Sjælland_Hovedstaden_West": 2000,
+        "Sjælland_Hovedstaden_East": 2000,
+        "Hovedstaden_West_Hovedstaden_East": 2000,
+    },
+    "max_power_links_default": 2000, #in MW, links not listed in max_power_links (topologies derived in 01a)
+    "cost_projection_year": 2030, #choose from years 2020, 2025, 2030, 2035, 2040, 2045, 2050
+    "cost_reduction_factor": { #in %
+        "coal": 0,
+        "oil": 0,
+        "gas": 0,
+        "biomass": 0,
+        "solar": 0,
+        "onwind": 0,
+        "offwind": 0,
+        "battery inverter": 0,
+        "battery storage": 0,
+        "electrolysis": 0,
+        "hydrogen storage underground": 0,
+        "fuel cell": 0,
+        "HVAC overhead": 0,
+        "HVDC submarine": 0,
+    },
+    "RE_potential_reduction_factor": { #in %, reduces maximum potential for one technology in all regions
+        "solar": 0,
+        "onwind": 0,
+        "offwind": 0,
+    },
+    "boolean_nuclear_plants": 0, #yes=1; no=0
+    "nuclear_capex": 2500, #capex of nuclear plants in €/kW
+    "co2_limit": 0, #in t CO2 per year, constant of the emission limit if boolean_zero_emission == 1
+    "weather_year": 2018,
+    "time_aggregation": None, #None = all hourly snapshots, see time_aggregation.py for the options
+    "storage": "discrete", #"discrete": storage units with the fixed E/P ratios below
+                           #"continuous": charger/discharger links + store per region, the optimizer picks the E/P ratio
+}
+
+###########################################
+# Storage and plotting
+###########################################
+
+e_to_p_ratio_battery = [2, 4, 6] #not used with "storage": "continuous"
+e_to_p_ratio_hydrogen = [168, 336, 672]
+E_TO_P_RATIOS = {"e_to_p_ratio_battery": e_to_p_ratio_battery, "e_to_p_ratio_hydrogen": e_to_p_ratio_hydrogen}
+
+#carrier, name prefix, E/P ratios (discrete), cost of the energy part, charger, discharger, link carriers (continuous)
+STORAGE_TECHS = [
+    ("battery storage", "Battery", "e_to_p_ratio_battery", "battery storage", "battery inverter", "battery inverter", ("battery charger", "battery discharger")),
+    ("hydrogen storage underground", "HydrogenStorage", "e_to_p_ratio_hydrogen", "hydrogen storage underground", "electrolysis", "fuel cell", ("electrolysis", "fuel cell")),
+]
+
+carrier_colors = {
+    "AC": "green",
+    "battery storage": "tomato",
+    "biomass": "dimgrey",
+    "coal": "black",
+    "gas": "rosybrown",
+    "hydrogen storage underground": "pink",
+    "nuclear": "orange",
+    "offwind": "violet",
+    "oil": "crimson",
+    "onwind": "crimson",
+    "solar": "yellow",
+    "transmission": "blue",
+}
+
+
+###########################################
+# Scenarios
+###########################################
+
+def make_scenario(overrides=None):
+    """Return a full scenario dict: DEFAULT_SCENARIO updated with `overrides`.
+
+    Nested entries can be given as dicts or with dotted keys,
+    e.g. {"cost_reduction_factor.solar": 20}.
+    """
+    s = copy.deepcopy(DEFAULT_SCENARIO)
+    for key, value in (overrides or {}).items():
+        if "." in key:
+            group, item = key.split(".", 1)
+            s[group][item] = value
+        elif isinstance(value, dict):
+            s[key].update(value)
+        else:
+            s[key] = value
+    return s
+
+
+def scenario_grid(grid):
+    """Cartesian product of {key: [values]} as a list of scenario override dicts."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+def scenario_name(s):
+    return (
+        f"ZE{s['boolean_zero_emission']}"
+        f"_CY{s['cost_projection_year']}"
+        f"_WY{s['weather_year']}"
+        f"_NUC{s['boolean_nuclear_plants']}"
+        f"_NRcapex{int(s['nuclear_capex'])}"
+        f"_CRF_s{int(s['cost_reduction_factor']['solar'])}"
+        f"_CRF_on{int(s['cost_reduction_factor']['onwind'])}"
+        f"_CRF_off{int(s['cost_reduction_factor']['offwind'])}"
+        f"_PRF_s{int(s['RE_potential_reduction_factor']['solar'])}"
+        f"_PRF_on{int(s['RE_potential_reduction_factor']['onwind'])}"
+        f"_PRF_off{int(s['RE_potential_reduction_factor']['offwind'])}"
+        f"_L{int(pd.Series(s['max_power_links']).mean())}"
+        + (f"_CO2{int(s['co2_limit'])}" if s["co2_limit"] else "")
+        + aggregation_tag(s["time_aggregation"])
+        + ("_STC" if s["storage"] == "continuous" else "") #no tag for the default discrete storage units
+    )
+
+
+###########################################
+# Loading and preprocessing of data
+###########################################
+
+def load_inputs(cost_projection_years=(2030,), weather_years=(2018,)):
+    """Read all inputs once. The result is shared by every scenario that is built from it.
+
+    Capacity factors of every weather year are put on the load snapshots (hour of year).
+    """
+    loads = read_load()
+
+    conv_generators = pd.read_csv(PP_PATH)
+    cap_by_region_fuel = (
+        conv_generators.groupby(["NAME_1", "primary_fuel"], as_index=True)["capacity_mw"]
+          .sum()
+          .to_frame(name="capacity_mw")
+    )
+    conventionals = conv_generators["primary_fuel"].unique().tolist()
+
+    renewables = list(TECHNOLOGIES)
+    re_cf = {year: read_cf(year, technologies=renewables, snapshots=loads.index) for year in weather_years}
+
+    re_potential = pd.read_csv(RE_P_PATH)
+    re_potential = re_potential.set_index("region")
+    re_potential.columns = renewables
+
+    centroids = pd.read_csv(C_PATH)
+    if Path(LINKS_PATH).exists():
+        links = read_links() #written by 01a_regions_define.py
+    else:
+        points = pd.read_csv(C_ETR_PATH, index_col="region") #EPSG:3035, no reprojection needed
+        points = gpd.GeoSeries(gpd.points_from_xy(points["x"], points["y"]), index=points.index, crs=3035)
+        links = manual_links(points) #regions of an older 01a run: hand-made 6 bus topology
+
+    costs = {
+        year: pd.read_csv(COSTS_PATH.format(year=year), index_col=[0])
+        for year in cost_projection_years
+    }
+
+    return {
+        "loads": loads,
+        "cap_by_region_fuel": cap_by_region_fuel,
+        "conventionals": conventionals,
+        "renewables": renewables,
+        "re_cf": re_cf,
+        "re_potential": re_potential,
+        "centroids": centroids,
+        "links": links,
+        "costs": costs,
+    }
+
+
+##################################################################
+#######################    PYPSA_MODEL     #######################
+##################################################################
+
+def add_components(n, class_name, static, **dynamic):
+    """Add all rows of `static` (index = component names) in one bulk call.
+
+    `dynamic` takes wide time-series frames (snapshots x component names), e.g. p_max_pu.
+    """
+    if static.empty:
+        return
+    with span(f"add {class_name}", rows=len(static)):
+        n.add(class_name, static.index, **static.to_dict("series"), **dynamic)
+
+
+def build_network(inputs, s):
+    """Build the capacity expansion network for scenario `s` from preloaded `inputs`.
+
+    Every component class is assembled as one DataFrame (plus one wide frame per
+    time-varying attribute) and added with a single n.add call.
+    """
+    inputs = {**inputs, "re_cf": inputs["re_cf"][s["weather_year"]]}
+    if s["time_aggregation"]:
+        with span("aggregate_inputs"):
+            inputs = aggregate_inputs(inputs, s["time_aggregation"])
+
+    loads = inputs["loads"]
+    cap_by_region_fuel = inputs["cap_by_region_fuel"]
+    conventionals = inputs["conventionals"]
+    renewables = inputs["renewables"]
+    re_cf = inputs["re_cf"]
+    re_potential = inputs["re_potential"]
+    centroids = inputs["centroids"]
+    regions = pd.Index(centroids.region)
+    costs = inputs["costs"][s["cost_projection_year"]]
+
+    crf = pd.Series(s["cost_reduction_factor"], dtype=float).div(100)
+    prf = pd.Series(s["RE_potential_reduction_factor"], dtype=float).div(100)
+    conventionals_extendable = s["boolean_conventionals_extendable"] == 1
+
+    def reduced_capital_cost(techs):
+        techs = pd.Index(techs)
+        return costs.loc[techs, "capital_cost"].values * (1 - crf.reindex(techs, fill_value=0).values)
+
+    carriers = conventionals + renewables + ["transmission", "AC", "battery storage", "hydrogen storage underground"]
+    if s["storage"] == "continuous":
+        carriers += [c for tech in STORAGE_TECHS for c in tech[-1]]
+    if s["boolean_nuclear_plants"] == 1:
+        carriers += ["nuclear"]
+    carriers = sorted(set(carriers))
+
+    n = pypsa.Network()
+    n.meta["scenario"] = s #exported with the result, used for the cross-scenario tables
+    n.set_snapshots(loads.index)
+    if "snapshot_weightings" in inputs:
+        if isinstance(loads.index, pd.MultiIndex):
+            n.investment_periods = loads.index.unique("period") #representative periods, storage is cyclic per period
+        n.snapshot_weightings = inputs["snapshot_weightings"]
+
+    ########################    CARRIERS_BUSES     ########################
+
+    add_components(n, "Carrier", pd.DataFrame(
+        {
+            "color": [carrier_colors.get(c, "grey") for c in carriers],
+            "co2_emissions": costs["CO2 intensity"].reindex(carriers, fill_value=0).values,
+        },
+        index=carriers,
+    ))
+
+    add_components(n, "Bus", pd.DataFrame(
+        {
+            "x": centroids["lon"].values,
+            "y": centroids["lat"].values,
+            "carrier": "AC",
+        },
+        index=regions,
+    ))
+
+    ########################    GENERATORS     ########################
+
+    conv = cap_by_region_fuel.reset_index()
+    conv = conv[conv["NAME_1"].isin(regions)]  # skip generators outside the modelled regions
+    conv.index = conv["NAME_1"] + "_" + conv["primary_fuel"]
+    gens = [pd.DataFrame(
+        {
+            "bus": conv["NAME_1"],
+            "carrier": conv["primary_fuel"],
+            "p_nom": 0 if conventionals_extendable else conv["capacity_mw"],
+            "p_nom_min": conv["capacity_mw"],
+            "p_nom_max": float("inf"),
+            "capital_cost": reduced_capital_cost(conv["primary_fuel"]),
+            "marginal_cost": costs.loc[conv["primary_fuel"], "marginal_cost"].values,
+            "efficiency": costs.loc[conv["primary_fuel"], "efficiency"].values,
+            "p_nom_extendable": conventionals_extendable,
+        },
+        index=conv.index,
+    )]
+
+    if s["boolean_nuclear_plants"] == 1:
+        nuclear_capital_cost = (
+            (annuity(costs.at["nuclear", "discount rate"], costs.at["nuclear", "lifetime"])
+             + costs.at["nuclear", "FOM"] / 100)
+            * s["nuclear_capex"] * 1e3 #€/kW -> €/MW
+        )
+        gens.append(pd.DataFrame(
+            {
+                "bus": regions,
+                "carrier": "nuclear",
+                "p_nom_max": float("inf"),
+                "capital_cost": nuclear_capital_cost,
+                "marginal_cost": costs.at["nuclear", "marginal_cost"],
+                "efficiency": costs.at["nuclear", "efficiency"],
+                "p_nom_extendable": True,
+            },
+            index=regions + "_nuclear",
+        ))
+
+    # one row per (technology, region) with capacity factors and potential (inland regions
+    # of the admin/cluster modes have no offwind), in the same order as the columns of re_cf
+    re_idx = pd.MultiIndex.from_product([renewables, regions], names=["carrier", "bus"])
+    potential = re_potential.stack().reindex(list(zip(re_idx.get_level_values("bus"), re_idx.get_level_values("carrier"))))
+    re_idx = re_idx[re_idx.isin(re_cf.columns) & (potential.fillna(0).values > 0)]
+    re_carrier = re_idx.get_level_values("carrier")
+    re_bus = re_idx.get_level_values("bus")
+    re_names = re_bus + "_" + re_carrier
+    gens.append(pd.DataFrame(
+        {
+            "bus": re_bus,
+            "carrier": re_carrier,
+            "p_nom_max": re_potential.stack().reindex(list(zip(re_bus, re_carrier))).values
+                         * (1 - prf.reindex(re_carrier, fill_value=0).values),
+            "capital_cost": reduced_capital_cost(re_carrier),
+            "marginal_cost": costs.loc[re_carrier, "marginal_cost"].values,
+            "efficiency": costs.loc[re_carrier, "efficiency"].values,
+            "p_nom_extendable": True,
+        },
+        index=re_names,
+    ))
+    generators = pd.concat(gens).fillna({"p_nom": 0, "p_nom_min": 0})
+
+    p_max_pu = re_cf.reindex(columns=re_idx)
+    p_max_pu.columns = re_names
+    p_max_pu = p_max_pu.reindex(columns=generators.index, fill_value=1.0)
+
+    add_components(n, "Generator", generators, p_max_pu=p_max_pu)
+
+    ########################    LOADS     ########################
+
+    load_regions = loads.columns.drop("DK", errors="ignore")  #skip sum over all regions
+    p_set = loads[load_regions]
+    p_set.columns = "load_" + load_regions
+    add_components(n, "Load", pd.DataFrame({"bus": load_regions}, index=p_set.columns), p_set=p_set)
+
+    ########################    LINKS     ########################
+
+    links = inputs["links"][["bus0", "bus1"]].copy()
+    links["carrier"] = "transmission"
+    links["p_nom_max"] = pd.Series(s["max_power_links"], dtype=float).reindex(links.index).fillna(s["max_power_links_default"]).values
+    links["efficiency"] = 1.0
+    links["capital_cost"] = reduced_capital_cost(inputs["links"]["type"]) * inputs["links"]["length_km"].values
+    links["p_nom_extendable"] = True
+    add_components(n, "Link", links)
+
+    ########################    STORAGE     ########################
+
+    if s["storage"] == "continuous":
+        add_continuous_storage(n, regions, centroids, costs, reduced_capital_cost)
+    else:
+        storage = []
+        for carrier, prefix, ratios_key, store_cost, charge, discharge, _ in STORAGE_TECHS:
+            ratios = inputs.get(ratios_key, E_TO_P_RATIOS[ratios_key])
+            idx = pd.MultiIndex.from_product([ratios, regions], names=["max_hours", "bus"])
+            max_hours = idx.get_level_values("max_hours").to_numpy(dtype=float)
+            bus = idx.get_level_values("bus")
+            power_cost = reduced_capital_cost([charge]).item()
+            if discharge != charge:
+                power_cost += reduced_capital_cost([discharge]).item()
+            storage.append(pd.DataFrame(
+                {
+                    "bus": bus,
+                    "carrier": carrier,
+                    "max_hours": max_hours,
+                    "capital_cost": power_cost + max_hours * reduced_capital_cost([store_cost]).item(),
+                    "efficiency_store": costs.at[charge, "efficiency"],
+                    "efficiency_dispatch": costs.at[discharge, "efficiency"],
+                    "p_nom_extendable": True,
+                    "cyclic_state_of_charge": True,
+                    "cyclic_state_of_charge_per_period": True,
+                },
+                index=prefix + "_" + bus + "_" + idx.get_level_values("max_hours").astype(str),
+            ))
+        add_components(n, "StorageUnit", pd.concat(storage))
+
+    if s["boolean_zero_emission"] == 1:
+        n.add(
+            "GlobalConstraint",
+            "emission_limit",
+            carrier_attribute="co2_emissions",
+            sense="<=",
+            constant=s["co2_limit"],
+        )
+
+    return n
+
+
+def add_continuous_storage(n, regions, centroids, costs, reduced_capital_cost):
+    """Per region and storage carrier: a store bus with one Store (energy) and a charger and a
+    discharger Link (power), all extendable, so that the E/P ratio is a free decision.
+
+    One battery inverter serves both directions: its full cost is on the charger and the
+    discharger is tied to it by add_storage_constraints, so a battery costs the same as the
+    discrete storage unit.
+    """
+    for carrier, prefix, _, store_cost, charge, discharge, (charger, discharger) in STORAGE_TECHS:
+        store_bus = regions + " " + carrier
+        charge_cost = reduced_capital_cost([charge]).item()
+        discharge_cost = 0.0 if discharge == charge else reduced_capital_cost([discharge]).item()
+
+        add_components(n, "Bus", pd.DataFrame(
+            {"x": centroids["lon"].values, "y": centroids["lat"].values, "carrier": carrier},
+            index=store_bus,
+        ))
+        add_components(n, "Link", pd.DataFrame(
+            {
+                "bus0": list(regions) + list(store_bus),
+                "bus1": list(store_bus) + list(regions),
+                "carrier": [charger] * len(regions) + [discharger] * len(regions),
+                "efficiency": [costs.at[charge, "efficiency"]] * len(regions) + [costs.at[discharge, "efficiency"]] * len(regions),
+                "capital_cost": [charge_cost] * len(regions) + [discharge_cost] * len(regions),
+                "p_nom_extendable": True,
+            },
+            index=list(prefix + "_" + regions + "_charger") + list(prefix + "_" + regions + "_discharger"),
+        ))
+        add_components(n, "Store", pd.DataFrame(
+            {
+                "bus": store_bus,
+                "carrier": carrier,
+                "capital_cost": reduced_capital_cost([store_cost]).item(),
+                "e_nom_extendable": True,
+                "e_cyclic": True,
+                "e_cyclic_per_period": True,
+            },
+            index=prefix + "_" + regions,
+        ))
+
+
+def inverter_pairs(n):
+    """Extendable (charger, discharger) links of the storage techs that share one inverter."""
+    shared = [links[0] for _, _, _, _, charge, discharge, links in STORAGE_TECHS if charge == discharge]
+    ext = n.links[n.links.p_nom_extendable]
+    chargers = ext.index[ext.carrier.isin(shared)]
+    dischargers = chargers.str.replace(r"_charger$", "_discharger", regex=True)
+    keep = dischargers.isin(ext.index)
+    return chargers[keep], dischargers[keep]
+
+
+def add_storage_constraints(n):
+    """Charger and discharger of one inverter have the same AC rating:
+    p_nom(charger) = efficiency(discharger) * p_nom(discharger), as in PyPSA-Eur."""
+    chargers, dischargers = inverter_pairs(n)
+    if not len(chargers):
+        return
+    p_nom = n.model["Link-p_nom"]
+    lhs = p_nom.loc[chargers] - p_nom.loc[dischargers] * n.links.loc[dischargers, "efficiency"].values
+    n.model.add_constraints(lhs == 0, name="Link-charger_ratio")
+
+
+def create_model(n, **kwargs):
+    """Linopy model of `n` including the storage constraints."""
+    m = n.optimize.create_model(**kwargs)
+    add_storage_constraints(n)
+    return m
+
+
+def solve_network(n, threads=None, solver_name=None, log_fn=None):
+    """Solve with `solver_name` (None = best available solver, see solvers.py)."""
+    return solvers.solve(n, solver_name=solver_name, threads=threads, log_fn=log_fn)
+
+
+###########################################
+# Process pool workers (module level so they can be pickled)
+###########################################
+
+_worker_inputs = None
+
+
+def init_worker(inputs):
+    """Pool initializer: every worker receives the shared inputs exactly once."""
+    global _worker_inputs
+    _worker_inputs = inputs
+
+
+def get_worker_inputs():
+    return _worker_inputs
+
+
+def export_result(n, s, overrides, status, condition, results_dir=RESULTS_DIR):
+    """Export a solved network and return its row for the sweep summary."""
+    name = scenario_name(s)
+    path = f"{results_dir}/n_extendable_{name}.nc"
+    if status == "ok":
+        n.export_to_netcdf(path)
+        write_summary(n, path, root=f"{results_dir}/summary", status=status, condition=condition)
+    return {
+        "scenario": name,
+        **overrides,
+        "solver": n.meta.get("solver", {}).get("solver_name", ""),
+        "status": status,
+        "condition": condition,
+        "objective": n.objective if status == "ok" else float("nan"),
+        "path": path if status == "ok" else "",
+    }
+
+
+def run_scenario(overrides, threads=None, solver_name=None, results_dir=RESULTS_DIR):
+    s = make_scenario(overrides)
+    n = build_network(_worker_inputs, s)
+    create_model(n)
+    status, condition = solve_network(n, threads=threads, solver_name=solver_name)
+    return export_result(n, s, overrides, status, condition, results_dir)
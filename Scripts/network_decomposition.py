@@ -0,0 +1,323 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import linopy
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+import solvers
+from instrumentation import span
+from network_build import build_network, get_worker_inputs, init_worker, inverter_pairs
+from network_dispatch import CAPACITY_ATTRS, VOLL, add_load_shedding
+
+###########################################
+# Benders decomposition of the capacity expansion LP by sub-period
+#
+# master:      capacities x of all extendable components (with capital costs and the
+#              charger/discharger coupling of shared inverters), the share e_k of the annual
+#              CO2 limit used in each period, the storage level l_k of every storage at the
+#              end of each period (bounded by its energy capacity) and one variable theta_k
+#              per period that estimates its operating cost from below (cuts).
+# subproblem:  operation of one period (e.g. a month) with the capacities fixed to the
+#              master solution through named equality constraints "<Class>-<attr>-fix"
+#              (and the CO2 limit fixed to e_k). Storage starts at the level l_{k-1} (patched
+#              into the right-hand side of the energy balance of the first snapshot) and
+#              ends at l_k ("<Class>-<level>-fix" in the last snapshot). The duals are the
+#              slope of the operating cost in x, e_k and the levels, which gives the cut
+#                  theta_k >= cost_k(x*, e*, l*) + dual_x (x - x*) + dual_e (e_k - e*_k)
+#                             + dual_start (l_{k-1} - l*_{k-1}) + dual_end (l_k - l*_k)
+# Load shedding at VOLL keeps every subproblem feasible and a slack on the end level
+# (also at VOLL) lets it miss an unreachable target, so only optimality cuts are needed.
+#
+# The first period starts at the level the last one ends with, so the decomposition
+# converges to the monolithic model with a year-cyclic state of charge.
+#
+# Every subproblem is pinned to one worker process, which builds its model once and only
+# patches the right-hand sides in the following iterations.
+###########################################
+
+PERIOD = "M" #pandas period of the sub-problems: "M" months, "Q" quarters, "W" weeks
+GAP = 1e-3 #relative gap (upper - lower bound) / upper bound
+MAX_ITERATIONS = 100
+CO2_CONSTRAINT = "GlobalConstraint-emission_limit"
+
+STORAGE_LEVELS = {"StorageUnit": "state_of_charge", "Store": "e"} #level variable of each storage class
+
+_subproblems = {} #worker cache: period -> (network, model, energy balance right-hand sides)
+
+
+def extendable(n):
+    """Lower and upper bound and capital cost of every extendable capacity, index "<Class>|<name>"."""
+    frames = []
+    for c, attr in CAPACITY_ATTRS.items():
+        static = n.static(c)
+        ext = static[static[f"{attr}_extendable"]] if not static.empty else static
+        if ext.empty:
+            continue
+        frames.append(pd.DataFrame(
+            {
+                "lower": ext[f"{attr}_min"].values,
+                "upper": ext[f"{attr}_max"].values,
+                "capital_cost": ext["capital_cost"].values,
+            },
+            index=c + "|" + ext.index,
+        ))
+    return pd.concat(frames).rename_axis("capacity")
+
+
+def storage_capacities(n):
+    """Energy capacity of every storage as `factor` times its capacity (extendable) or
+    the fixed value `fixed`, index "<Class>|<name>" as in `extendable`."""
+    frames = []
+    for c in STORAGE_LEVELS:
+        static = n.static(c)
+        if static.empty:
+            continue
+        attr = CAPACITY_ATTRS[c]
+        factor = static["max_hours"].values if c == "StorageUnit" else np.ones(len(static))
+        frames.append(pd.DataFrame(
+            {
+                "factor": factor,
+                "extendable": static[f"{attr}_extendable"].values,
+                "fixed": factor * static[attr].values,
+            },
+            index=c + "|" + static.index,
+        ))
+    return pd.concat(frames).rename_axis("capacity") if frames else None
+
+
+def period_snapshots(snapshots, freq=PERIOD):
+    """{period label: snapshots} of consecutive sub-periods."""
+    labels = snapshots.to_period(freq)
+    return {str(p): snapshots[labels == p] for p in labels.unique()}
+
+
+###########################################
+# Master problem
+###########################################
+
+def build_master(ext, periods, co2_limit=None, inverters=None, storage=None):
+    """inverters: (chargers, dischargers, efficiency) of network_build.inverter_pairs,
+    storage: energy capacities of storage_capacities."""
+    m = linopy.Model()
+    index = ext.index
+    x = m.add_variables(lower=xr.DataArray(ext["lower"].values, coords=[index]),
+                        upper=xr.DataArray(ext["upper"].values, coords=[index]), name="capacity")
+    if inverters is not None and len(inverters[0]):
+        chargers, dischargers, efficiency = inverters
+        lhs = x.loc["Link|" + chargers] - x.loc["Link|" + dischargers] * efficiency
+        m.add_constraints(lhs == 0, name="Link-charger_ratio")
+    period_index = pd.Index(list(periods), name="period")
+    theta = m.add_variables(lower=0, coords=[period_index], name="theta") #marginal costs are >= 0
+    if co2_limit is not None:
+        e = m.add_variables(lower=0, coords=[period_index], name="emissions")
+        m.add_constraints(e.sum() <= co2_limit, name="emission_limit")
+    if storage is not None:
+        fixed = storage["fixed"].where(~storage["extendable"], np.inf).to_numpy(dtype=float)
+        upper = xr.DataArray(np.tile(fixed, (len(period_index), 1)), coords=[period_index, storage.index])
+        level = m.add_variables(lower=0, upper=upper, name="level") #at the end of each period
+        ext_i = storage.index[storage["extendable"].to_numpy(dtype=bool)]
+        if len(ext_i):
+            factor = xr.DataArray(storage.loc[ext_i, "factor"].values, coords=[ext_i])
+            m.add_constraints(level.sel(capacity=ext_i) - factor * x.sel(capacity=ext_i) <= 0, name="level_upper")
+    m.add_objective((xr.DataArray(ext["capital_cost"].values, coords=[index]) * x).sum() + theta.sum())
+    return m
+
+
+def add_cut(m, period, result, x_star, e_star, name, level_star=None, previous=None):
+    """Optimality cut of `period`, whose storage starts at the level of period `previous`."""
+    x, theta = m.variables["capacity"], m.variables["theta"]
+    dual_x = xr.DataArray(result["dual_x"].reindex(x_star.index).values, coords=[x_star.index])
+    lhs = theta.sel(period=period) - (dual_x * x).sum()
+    rhs = result["cost"] - float((dual_x.values * x_star.values).sum())
+    if "emissions" in m.variables:
+        lhs = lhs - result["dual_e"] * m.variables["emissions"].sel(period=period)
+        rhs -= result["dual_e"] * e_star[period]
+    if level_star is not None:
+        level = m.variables["level"]
+        for key, border in [("dual_start", previous), ("dual_end", period)]:
+            values = level_star.loc[border]
+            dual = xr.DataArray(result[key].reindex(values.index).fillna(0).values, coords=[values.index])
+            lhs = lhs - (dual * level.sel(period=border)).sum()
+            rhs -= float((dual.values * values.values).sum())
+    m.add_constraints(lhs >= rhs, name=name)
+
+
+###########################################
+# Subproblems (run in the worker that owns the period)
+###########################################
+
+def _fix_name(c, attr):
+    return f"{c}-{attr}-fix"
+
+
+def build_subproblem(s, snapshots, voll=VOLL):
+    """Operation of one period: capacities are variables fixed by "<Class>-<attr>-fix" constraints,
+    storage starts empty (patched in solve_subproblem) and ends at the level of "<Class>-<level>-fix"."""
+    n = build_network(get_worker_inputs(), {**s, "time_aggregation": None})
+    for c, attr in CAPACITY_ATTRS.items():
+        static = n.static(c)
+        if not static.empty:
+            static.loc[static[f"{attr}_extendable"], "capital_cost"] = 0.0 #capital costs are in the master
+    n.storage_units["cyclic_state_of_charge"] = False
+    n.storage_units["cyclic_state_of_charge_per_period"] = False
+    n.storage_units["state_of_charge_initial"] = 0.0
+    n.stores["e_cyclic"] = False
+    n.stores["e_cyclic_per_period"] = False
+    n.stores["e_initial"] = 0.0
+    add_load_shedding(n, voll)
+    m = n.optimize.create_model(snapshots=snapshots)
+    for c, attr in CAPACITY_ATTRS.items():
+        name = f"{c}-{attr}"
+        if name in m.variables:
+            var = m.variables[name]
+            m.add_constraints(var == xr.zeros_like(var.lower), name=_fix_name(c, attr))
+
+    balances, slack = {}, []
+    for c, level in STORAGE_LEVELS.items():
+        name = f"{c}-{level}"
+        if name not in m.variables:
+            continue
+        var = m.variables[name].sel(snapshot=snapshots[-1])
+        coords = [var.indexes[var.dims[0]]]
+        up = m.add_variables(lower=0, coords=coords, name=f"{name}-slack_up")
+        down = m.add_variables(lower=0, coords=coords, name=f"{name}-slack_down")
+        m.add_constraints(var + up - down == xr.zeros_like(var.lower), name=_fix_name(c, level))
+        slack.append(up.sum() + down.sum())
+        balances[c] = m.constraints[f"{c}-energy_balance"].rhs.copy() #with an initial level of 0
+    if slack:
+        m.add_objective(m.objective.expression + voll * sum(slack), overwrite=True)
+    return n, m, balances
+
+
+def solve_subproblem(period, s, snapshots, x_star, e_star, solver_name=None, threads=None,
+                     level_start=None, level_end=None):
+    """Operating cost of `period` at the capacities `x_star` and the storage levels
+    `level_start` and `level_end` (Series "<Class>|<name>"), and its duals."""
+    if period not in _subproblems:
+        with span("build_subproblem", period=period):
+            _subproblems[period] = build_subproblem(s, snapshots)
+    n, m, balances = _subproblems[period]
+    first = snapshots[0]
+
+    for c, attr in CAPACITY_ATTRS.items():
+        name = _fix_name(c, attr)
+        if name in m.constraints:
+            con = m.constraints[name]
+            dim = con.rhs.dims[0]
+            values = x_star.reindex(c + "|" + con.rhs.indexes[dim]).values
+            con.rhs = xr.DataArray(values, coords=con.rhs.coords)
+    if e_star is not None and CO2_CONSTRAINT in m.constraints:
+        m.constraints[CO2_CONSTRAINT].rhs = e_star
+    for c, base in balances.items():
+        con = m.constraints[_fix_name(c, STORAGE_LEVELS[c])]
+        dim = con.rhs.dims[0]
+        con.rhs = xr.DataArray(level_end.reindex(c + "|" + con.rhs.indexes[dim]).values, coords=con.rhs.coords)
+        #PyPSA puts minus the initial level on the right-hand side of the first snapshot
+        rhs = base.copy()
+        start = base.sel(snapshot=first)
+        rhs.loc[{"snapshot": first}] = start.values - level_start.reindex(c + "|" + start.indexes[start.dims[0]]).values
+        m.constraints[f"{c}-energy_balance"].rhs = rhs
+
+    solver_name = solvers.select_solver(solver_name)
+    status, condition = m.solve(solver_name=solver_name, **solvers.solver_options(solver_name, threads=threads, large=False))
+    if status != "ok":
+        raise RuntimeError(f"Subproblem {period}: {status} ({condition})")
+
+    duals = []
+    for c, attr in CAPACITY_ATTRS.items():
+        name = _fix_name(c, attr)
+        if name in m.constraints:
+            dual = m.constraints[name].dual.to_pandas()
+            duals.append(pd.Series(dual.values, index=c + "|" + dual.index))
+    dual_e = float(m.constraints[CO2_CONSTRAINT].dual) if e_star is not None and CO2_CONSTRAINT in m.constraints else 0.0
+
+    dual_start, dual_end = [], []
+    for c in balances:
+        dual = m.constraints[_fix_name(c, STORAGE_LEVELS[c])].dual.to_pandas()
+        dual_end.append(pd.Series(dual.values, index=c + "|" + dual.index))
+        dual = m.constraints[f"{c}-energy_balance"].dual.sel(snapshot=first).to_pandas()
+        dual_start.append(pd.Series(-dual.values, index=c + "|" + dual.index)) #the level enters with a minus
+    return {
+        "cost": float(m.objective.value),
+        "dual_x": pd.concat(duals),
+        "dual_e": dual_e,
+        "dual_start": pd.concat(dual_start) if dual_start else pd.Series(dtype=float),
+        "dual_end": pd.concat(dual_end) if dual_end else pd.Series(dtype=float),
+    }
+
+
+###########################################
+# Benders loop
+###########################################
+
+def solve_benders(inputs, s, period=PERIOD, gap=GAP, max_iterations=MAX_ITERATIONS,
+                  n_workers=None, solver_name=None, threads=1):
+    """Optimal capacities (Series "<Class>|<name>") and the convergence history."""
+    n = build_network(inputs, {**s, "time_aggregation": None})
+    ext = extendable(n)
+    periods = period_snapshots(n.snapshots, period)
+    co2_limit = n.global_constraints.at["emission_limit", "constant"] if "emission_limit" in n.global_constraints.index else None
+    capital_cost = ext["capital_cost"]
+    chargers, dischargers = inverter_pairs(n)
+    inverters = (chargers, dischargers, n.links.loc[dischargers, "efficiency"].values)
+    storage = storage_capacities(n)
+    del n
+
+    master = build_master(ext, periods, co2_limit, inverters, storage)
+    labels = list(periods)
+    previous = dict(zip(labels, labels[-1:] + labels[:-1])) #the first period starts where the last one ends
+    master_solver = solvers.select_solver(solver_name)
+
+    #one single-process executor per worker so that a period always goes to the same process
+    n_workers = min(n_workers or len(periods), len(periods))
+    workers = [ProcessPoolExecutor(max_workers=1, initializer=init_worker, initargs=(inputs,)) for _ in range(n_workers)]
+    owner = {p: workers[i % n_workers] for i, p in enumerate(periods)}
+
+    history = []
+    best, upper = None, np.inf
+    try:
+        for iteration in range(max_iterations):
+            with span("master", iteration=iteration):
+                master.solve(solver_name=master_solver, **solvers.solver_options(master_solver, large=False))
+            lower = float(master.objective.value)
+            x_star = master.variables["capacity"].solution.to_pandas()
+            e_star = master.variables["emissions"].solution.to_pandas() if co2_limit is not None else None
+            level_star = master.variables["level"].solution.to_pandas() if storage is not None else None
+
+            with span("subproblems", iteration=iteration):
+                futures = {
+                    p: owner[p].submit(
+                        solve_subproblem, p, s, sns, x_star, None if e_star is None else float(e_star[p]), solver_name, threads,
+                        None if level_star is None else level_star.loc[previous[p]],
+                        None if level_star is None else level_star.loc[p],
+                    )
+                    for p, sns in periods.items()
+                }
+                results = {p: f.result() for p, f in futures.items()}
+
+            candidate = float(capital_cost @ x_star) + sum(r["cost"] for r in results.values())
+            if candidate < upper:
+                best, upper = x_star, candidate
+            rel_gap = (upper - lower) / abs(upper) if upper else 0.0
+            history.append({"iteration": iteration, "lower_bound": lower, "upper_bound": upper, "gap": rel_gap})
+            print(f"Benders iteration {iteration}: lower {lower:.6g}, upper {upper:.6g}, gap {rel_gap:.2e}")
+            if rel_gap <= gap:
+                break
+
+            for p, result in results.items():
+                add_cut(master, p, result, x_star, e_star, name=f"cut_{iteration}_{p}",
+                        level_star=level_star, previous=previous[p])
+    finally:
+        for w in workers:
+            w.shutdown()
+
+    return best, pd.DataFrame(history).set_index("iteration")
+
+
+def capacities_by_component(x):
+    """Series "<Class>|<name>" -> {Class: Series} as used by network_dispatch.fix_capacities."""
+    parts = x.index.str.split("|", n=1)
+    classes = pd.Index([p[0] for p in parts])
+    names = pd.Index([p[1] for p in parts])
+    return {c: pd.Series(x.values[classes == c], index=names[classes == c]) for c in classes.unique()}
@@ -0,0 +1,136 @@
+from pathlib import Path
+
+import solvers
+from instrumentation import span
+from network_build import RESULTS_DIR, build_network, get_worker_inputs, scenario_name
+from result_summary import write_summary
+
+###########################################
+# Dispatch with fixed capacities in rolling windows
+#
+# The capacities of a solved expansion run are fixed (p_nom = p_nom_opt, not extendable)
+# and the operation is optimized window by window: each window covers `horizon` snapshots,
+# only the first `step` of them are kept before the window moves on, and the state of
+# charge at the end of the kept part is the initial state of charge of the next window.
+# Every window is a small LP, so a full year (or many weather years) needs only the memory
+# of one week.
+###########################################
+
+HORIZON = 168 #snapshots per window
+STEP = 24 #snapshots kept per window
+VOLL = 10_000 #€/MWh, load shedding keeps windows feasible if the fixed capacities fall short
+
+CAPACITY_ATTRS = {"Generator": "p_nom", "Link": "p_nom", "StorageUnit": "p_nom", "Store": "e_nom"}
+
+
+def capacities(solved):
+    """{component: optimal capacities} of a solved network (small enough to send to workers)."""
+    return {c: solved.static(c)[f"{attr}_opt"] for c, attr in CAPACITY_ATTRS.items() if not solved.static(c).empty}
+
+
+def fix_capacities(n, caps):
+    """Set the capacities of `n` to `caps` and make nothing extendable."""
+    for c, attr in CAPACITY_ATTRS.items():
+        static = n.static(c)
+        if static.empty:
+            continue
+        if c in caps:
+            missing = static.index.difference(caps[c].index)
+            if len(missing):
+                print(f"No capacity in the solved network for {len(missing)} {c}s, e.g. {missing[0]}: kept {attr}")
+            common = static.index.intersection(caps[c].index)
+            static.loc[common, attr] = caps[c][common]
+        static[f"{attr}_extendable"] = False
+
+
+def add_load_shedding(n, voll=VOLL):
+    """Generator at every AC bus that serves load at the value of lost load."""
+    if "load shedding" not in n.carriers.index:
+        n.add("Carrier", "load shedding", color="#000000")
+    buses = n.buses.index[n.buses.carrier == "AC"]
+    n.add("Generator", buses + "_load shedding", bus=buses, carrier="load shedding", p_nom=n.loads_t.p_set.max().max(), marginal_cost=voll)
+
+
+def price_emissions(n, co2_price):
+    """Replace the annual emission limit by its shadow price on the marginal costs.
+
+    A limit of zero holds in every window as well and is kept as a constraint.
+    """
+    if "emission_limit" not in n.global_constraints.index:
+        return
+    if n.global_constraints.at["emission_limit", "constant"] == 0:
+        return
+    emissions = n.generators.carrier.map(n.carriers.co2_emissions).fillna(0) / n.generators.efficiency
+    n.generators["marginal_cost"] += co2_price * emissions
+    n.remove("GlobalConstraint", "emission_limit")
+
+
+def dispatch_network(inputs, s, caps, co2_price=0.0, voll=VOLL):
+    """Network of scenario `s` with the capacities `caps` fixed and non-cyclic storage."""
+    n = build_network(inputs, {**s, "time_aggregation": None})
+    fix_capacities(n, caps)
+    n.storage_units["cyclic_state_of_charge"] = False
+    n.storage_units["cyclic_state_of_charge_per_period"] = False
+    n.stores["e_cyclic"] = False
+    price_emissions(n, co2_price)
+    if voll:
+        add_load_shedding(n, voll)
+    return n
+
+
+def rolling_windows(snapshots, horizon=HORIZON, step=STEP):
+    """Start positions and snapshots of the overlapping windows."""
+    return [(start, snapshots[start:start + horizon]) for start in range(0, len(snapshots), step)]
+
+
+def solve_rolling(n, horizon=HORIZON, step=STEP, solver_name=None, threads=None):
+    """Optimize the dispatch of `n` window by window. Returns the status of every window."""
+    snapshots = n.snapshots
+    statuses = []
+    for start, window in rolling_windows(snapshots, horizon, step):
+        if start:
+            previous = snapshots[start - 1] #last snapshot kept from the previous window
+            n.storage_units["state_of_charge_initial"] = n.storage_units_t.state_of_charge.loc[previous]
+            n.stores["e_initial"] = n.stores_t.e.loc[previous]
+        with span("window", start=int(start)):
+            status, condition = solvers.solve(n, solver_name=solver_name, threads=threads, snapshots=window, reuse_model=False)
+        statuses.append((start, status, condition))
+        if status != "ok":
+            print(f"Window starting at {window[0]}: {status} ({condition})")
+            break
+    return statuses
+
+
+def dispatch_path(result_path, weather_year, results_dir=RESULTS_DIR):
+    return Path(results_dir) / f"dispatch_{Path(result_path).stem}_WY{weather_year}.nc"
+
+
+def run_dispatch(result_path, s, caps, co2_price, weather_year, horizon=HORIZON, step=STEP,
+                 solver_name=None, threads=None, results_dir=RESULTS_DIR):
+    """Rolling dispatch of one weather year with the capacities of `result_path` (pool worker)."""
+    inputs = get_worker_inputs()
+    n = dispatch_network(inputs, {**s, "weather_year": weather_year}, caps, co2_price)
+    statuses = solve_rolling(n, horizon, step, solver_name, threads)
+    ok = statuses[-1][1] == "ok" #solve_rolling stops at the first window that fails
+
+    path = dispatch_path(result_path, weather_year, results_dir)
+    weightings = n.snapshot_weightings.generators
+    operating_cost = float(weightings @ (n.generators_t.p * n.generators.marginal_cost).sum(axis=1)) if ok else float("nan")
+    shed = float(weightings @ n.generators_t.p.filter(like="_load shedding").sum(axis=1)) if ok else float("nan")
+    if ok:
+        n.meta["dispatch"] = {"capacities_from": str(result_path), "horizon": horizon, "step": step}
+        n.export_to_netcdf(path)
+        #n.objective only holds the last window, the summary gets the cost of the whole year
+        #kept apart from the expansion runs, which have the same scenario parameters
+        write_summary(n, path, root=f"{results_dir}/summary_dispatch", mode="dispatch", status="ok", condition="optimal",
+                      objective=operating_cost)
+    return {
+        "capacities_from": Path(result_path).stem,
+        "scenario": scenario_name({**s, "weather_year": weather_year}),
+        "weather_year": weather_year,
+        "windows": len(statuses),
+        "status": "ok" if ok else statuses[-1][1],
+        "operating_cost": operating_cost,
+        "load_shedding_MWh": shed,
+        "path": str(path) if ok else "",
+    }
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.cluster.vq import kmeans2
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+###########################################
+# PATHS
+###########################################
+
+LINKS_PATH = "../Data/processed/region_links.csv"
+
+###########################################
+# INPUT
+###########################################
+
+len_factor = 1.5 #line length = distance of the representative points * len_factor
+LAND_TOLERANCE = 100 #in m, regions closer than this share a land border (GADM borders have small gaps)
+MAX_SEA_CROSSING = 60_000 #in m, regions without land border are connected if the sea between them is narrower
+SUBMARINE_SHARE = 0.5 #link is "HVDC submarine" if more of the line between the representative points is at sea
+
+# topology of the original 6 regions (GADM level 1, Hovedstaden split by longitude)
+MANUAL_LINKS = {
+    ("Nordjylland", "Midtjylland"): "HVAC overhead",
+    ("Nordjylland", "Hovedstaden_West"): "HVDC submarine",
+    ("Nordjylland", "Sjælland"): "HVDC submarine",
+    ("Midtjylland", "Syddanmark"): "HVAC overhead",
+    ("Midtjylland", "Sjælland"): "HVDC submarine",
+    ("Syddanmark", "Sjælland"): "HVAC overhead",
+    ("Sjælland", "Hovedstaden_West"): "HVAC overhead",
+    ("Sjælland", "Hovedstaden_East"): "HVDC submarine",
+    ("Hovedstaden_West", "Hovedstaden_East"): "HVDC submarine",
+}
+
+
+###########################################
+# Adjacency
+###########################################
+
+def zone_adjacency(zones, land_tolerance=LAND_TOLERANCE, max_sea_crossing=MAX_SEA_CROSSING):
+    """Neighbouring pairs (i, j), i < j, of the positional index of `zones` (projected CRS, m).
+
+    Pairs closer than `land_tolerance` share a land border. Pairs without a land border
+    are connected across the sea if the gap between them is narrower than
+    `max_sea_crossing` and the shortest line over it crosses no third zone. Zones that are
+    still not connected (e.g. Bornholm) are tied to the nearest zone of another component.
+    """
+    geoms = zones.geometry.reset_index(drop=True)
+    land = _query_pairs(geoms, land_tolerance)
+    sea = _query_pairs(geoms, max_sea_crossing) - land
+    pairs = land | (_over_sea(geoms, sorted(sea), land_tolerance) if sea else set())
+    return sorted(pairs | _connect_components(geoms, pairs))
+
+
+def _query_pairs(geoms, distance):
+    left, right = geoms.sindex.query(geoms, predicate="dwithin", distance=distance)
+    keep = left < right
+    return set(zip(left[keep].tolist(), right[keep].tolist()))
+
+
+def _over_sea(geoms, candidates, land_tolerance):
+    """Candidate pairs whose shortest connecting line does not run over a third zone."""
+    i, j = np.array(candidates, dtype=int).T
+    values = geoms.to_numpy()
+    gaps = shapely.shortest_line(values[i], values[j])
+    line, zone = geoms.sindex.query(gaps, predicate="intersects")
+    third = (zone != i[line]) & (zone != j[line])
+    line, zone = line[third], zone[third]
+    crossed = shapely.length(shapely.intersection(gaps[line], values[zone])) > land_tolerance
+    blocked = set(line[crossed].tolist())
+    return {pair for k, pair in enumerate(candidates) if k not in blocked}
+
+
+def _connect_components(geoms, pairs):
+    """Shortest extra pairs that join all components of the adjacency graph."""
+    extra = set()
+    while True:
+        i, j = np.array(sorted(pairs | extra), dtype=int).reshape(-1, 2).T
+        graph = coo_matrix((np.ones(len(i)), (i, j)), shape=(len(geoms), len(geoms)))
+        n_components, labels = connected_components(graph, directed=False)
+        if n_components == 1:
+            return extra
+        inside = np.flatnonzero(labels == labels[0])
+        outside = np.flatnonzero(labels != labels[0])
+        dist = np.array([geoms.iloc[outside].distance(geoms.iloc[k]).to_numpy() for k in inside]) #inside x outside
+        a, b = np.unravel_index(dist.argmin(), dist.shape)
+        extra.add(tuple(sorted((int(inside[a]), int(outside[b])))))
+
+
+###########################################
+# Links
+###########################################
+
+def link_table(pairs, types, points):
+    """Links bus0 -> bus1 named "<bus0>_<bus1>" with type and length.
+
+    points: representative points (projected CRS, m) indexed by region.
+    """
+    links = pd.DataFrame(pairs, columns=["bus0", "bus1"])
+    links.index = links["bus0"] + "_" + links["bus1"]
+    links["type"] = list(types)
+    links["length_km"] = [
+        points[r0].distance(points[r1]) * len_factor / 1000.0 for r0, r1 in pairs
+    ] #in km
+    return links
+
+
+def manual_links(points):
+    """Hand-made topology of the original 6 regions."""
+    return link_table(list(MANUAL_LINKS), MANUAL_LINKS.values(), points)
+
+
+def derive_links(regions, points, name_col="NAME_1"):
+    """Links between neighbouring regions (see zone_adjacency).
+
+    The type follows the straight line between the representative points:
+    "HVDC submarine" if more than SUBMARINE_SHARE of it is at sea, else "HVAC overhead".
+    """
+    names = regions[name_col].to_numpy()
+    pairs = [(names[i], names[j]) for i, j in zone_adjacency(regions)]
+
+    land = regions.geometry.union_all()
+    shapely.prepare(land)
+    lines = shapely.linestrings(
+        np.stack([[(points[r].x, points[r].y) for r in pair] for pair in pairs])
+    )
+    at_sea = 1 - shapely.length(shapely.intersection(lines, land)) / shapely.length(lines)
+    types = np.where(at_sea > SUBMARINE_SHARE, "HVDC submarine", "HVAC overhead")
+    return link_table(pairs, types, points)
+
+
+def write_links(links, path=LINKS_PATH):
+    links.to_csv(path, index_label="link")
+    return path
+
+
+def read_links(path=LINKS_PATH):
+    return pd.read_csv(path, index_col="link")
+
+
+###########################################
+# Spatial clustering
+###########################################
+
+def cluster_zones(zones, n_clusters, method="hierarchical"):
+    """Cluster label 0..n_clusters-1 for each zone (projected CRS, m).
+
+    "hierarchical": Ward clustering of the representative points where only
+        neighbouring clusters (zone_adjacency) are merged, so every cluster is contiguous
+        over land or a short sea crossing.
+    "kmeans": k-means of the representative points, clusters need not be contiguous.
+    """
+    if n_clusters >= len(zones):
+        return np.arange(len(zones))
+    points = zones.representative_point()
+    X = np.column_stack([points.x, points.y])
+
+    if method == "kmeans":
+        _, labels = kmeans2(X, n_clusters, minit="++", seed=0)
+        return np.unique(labels, return_inverse=True)[1] #k-means can leave clusters empty
+    if method != "hierarchical":
+        raise ValueError(f"Unknown clustering method '{method}'")
+
+    labels = np.arange(len(zones))
+    size = np.ones(len(zones))
+    centre = X.copy()
+    neighbours = {i: set() for i in range(len(zones))}
+    for i, j in zone_adjacency(zones):
+        neighbours[i].add(j)
+        neighbours[j].add(i)
+
+    def ward_cost(pair):
+        a, b = pair
+        return size[a] * size[b] / (size[a] + size[b]) * np.sum((centre[a] - centre[b]) ** 2)
+
+    for _ in range(len(zones) - n_clusters):
+        a, b = min(((i, j) for i in neighbours for j in neighbours[i] if i < j), key=ward_cost)
+        centre[a] = (size[a] * centre[a] + size[b] * centre[b]) / (size[a] + size[b])
+        size[a] += size[b]
+        labels[labels == b] = a
+        for k in neighbours.pop(b):
+            neighbours[k].discard(b)
+            if k != a:
+                neighbours[k].add(a)
+                neighbours[a].add(k)
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def dissolve_clusters(zones, labels, name_col):
+    """One region per cluster, named after its largest zone, with the column NAME_1."""
+    zones = zones.assign(cluster=labels, area=zones.area)
+    names = zones.sort_values("area", ascending=False).groupby("cluster")[name_col].first()
+    regions = zones[["cluster", "geometry"]].dissolve(by="cluster")
+    regions["NAME_1"] = names
+    return regions.reset_index(drop=True)[["NAME_1", "geometry"]]
@@ -0,0 +1,142 @@
+import json
+import math
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+from pypsa.optimization.optimize import define_objective
+
+import solvers
+from network_build import RESULTS_DIR, make_scenario, build_network, create_model, export_result, get_worker_inputs, scenario_name
+
+###########################################
+# Scenario entries that only change coefficients of an already built model
+###########################################
+
+# capital costs (objective), p_nom_max (capacity bounds) and the emission limit (constant)
+PATCHABLE_KEYS = [
+    "cost_reduction_factor",
+    "RE_potential_reduction_factor",
+    "max_power_links",
+    "max_power_links_default",
+    "nuclear_capex",
+    "co2_limit",
+]
+
+
+def structure_key(s):
+    """Everything that changes the model structure. Scenarios with equal keys can share one model."""
+    return json.dumps({k: v for k, v in s.items() if k not in PATCHABLE_KEYS}, sort_keys=True)
+
+
+def _numeric(value):
+    """Patchable value as a tuple of floats (dicts by sorted key, None first)."""
+    if isinstance(value, dict):
+        return tuple(x for k in sorted(value) for x in _numeric(value[k]))
+    return (-math.inf,) if value is None else (float(value),)
+
+
+def warmstart_chains(scenarios, n_workers=1):
+    """Group scenario overrides into chains of structurally identical models.
+
+    Within a chain the scenarios are sorted by their patchable values, so that
+    consecutive solves are neighbours in the sweep and the previous basis is a good start.
+    Chains are split into contiguous segments so that about `n_workers` of them run at
+    the same time (each segment starts cold).
+    """
+    chains = {}
+    for overrides in scenarios:
+        chains.setdefault(structure_key(make_scenario(overrides)), []).append(overrides)
+
+    def order(overrides):
+        s = make_scenario(overrides)
+        return tuple(_numeric(s[k]) for k in PATCHABLE_KEYS)
+
+    segments = []
+    for chain in chains.values():
+        chain = sorted(chain, key=order)
+        n_segments = min(len(chain), n_workers, max(1, round(n_workers * len(chain) / len(scenarios))))
+        bounds = [round(i * len(chain) / n_segments) for i in range(n_segments + 1)]
+        segments.extend(chain[a:b] for a, b in zip(bounds[:-1], bounds[1:]))
+    return segments
+
+
+def _set_rhs(m, name, values):
+    con = m.constraints[name]
+    dim = con.rhs.dims[0]
+    rhs = values.reindex(con.rhs.indexes[dim]).replace(np.inf, np.nan).fillna(con.rhs.to_pandas())
+    con.rhs = xr.DataArray(rhs.values, coords=con.rhs.coords)
+
+
+def _set_nominal_upper(m, c, attr, upper):
+    """Patch the p_nom_max bound, wherever this PyPSA version put it (constraint or variable bound)."""
+    name = f"{c}-ext-{attr}-upper"
+    if name in m.constraints:
+        _set_rhs(m, name, upper)
+    else:
+        var = m.variables[f"{c}-{attr}"]
+        dim = var.upper.dims[0]
+        var.upper = xr.DataArray(upper.reindex(var.upper.indexes[dim]).values, coords=var.upper.coords)
+
+
+def patch_network(n, inputs, s):
+    """Update capital costs, capacity bounds and the emission limit of the solved network `n`
+    and its linopy model in place, so that it represents scenario `s`."""
+    ref = build_network(inputs, s)
+    m = n.model
+
+    for c, attr in [("Generator", "p_nom"), ("Link", "p_nom"), ("StorageUnit", "p_nom"), ("Store", "e_nom")]:
+        static = n.static(c)
+        if static.empty:
+            continue
+        new = ref.static(c).reindex(static.index)
+        static["capital_cost"] = new["capital_cost"]
+        static[f"{attr}_max"] = new[f"{attr}_max"]
+        ext_i = static.index[static[f"{attr}_extendable"]]
+        if len(ext_i):
+            _set_nominal_upper(m, c, attr, static.loc[ext_i, f"{attr}_max"])
+
+    if "emission_limit" in n.global_constraints.index:
+        n.global_constraints.at["emission_limit", "constant"] = s["co2_limit"]
+        m.constraints["GlobalConstraint-emission_limit"].rhs = s["co2_limit"]
+
+    define_objective(n, n.snapshots)  #cheap compared to model creation, picks up the new capital costs
+    n.meta["scenario"] = s #exported with the result
+
+
+def run_chain(chain, threads=None, solver_name=None, results_dir=RESULTS_DIR):
+    """Solve a chain of structurally identical scenarios with one model in memory.
+
+    The first scenario is built and solved normally, every following one is
+    patched into the existing model and solved from the previous basis
+    (if the solver supports bases, see solvers.WARMSTART_SOLVERS).
+    """
+    inputs = get_worker_inputs()
+    basis_dir = tempfile.mkdtemp()
+    basis_fn = str(Path(basis_dir) / "basis.bas")
+
+    n = None
+    results = []
+    try:
+        for overrides in chain:
+            s = make_scenario(overrides)
+            if n is None:
+                n = build_network(inputs, s)
+                create_model(n)
+            else:
+                patch_network(n, inputs, s)
+            status, condition = solvers.solve(
+                n,
+                solver_name=solver_name,
+                threads=threads,
+                basis_fn=basis_fn,
+                warmstart_fn=basis_fn if Path(basis_fn).exists() else None,
+            )
+            if status == "ok" and n.meta["solver"]["solver_name"] in solvers.WARMSTART_SOLVERS and not Path(basis_fn).exists():
+                print(f"{scenario_name(s)}: the solver wrote no basis, the next scenario starts cold")
+            results.append(export_result(n, s, overrides, status, condition, results_dir))
+    finally:
+        shutil.rmtree(basis_dir, ignore_errors=True)
+    return results
@@ -0,0 +1,200 @@
+import hashlib
+import math
+import pickle
+import types
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from affine import Affine
+
+###########################################
+# Plotting layer
+#
+# - Time series are decimated to the pixel width of the figure before plotting. min/max
+#   decimation keeps every peak and trough, so the picture is the same as with all points.
+# - Rasters are reduced to the pixel size of the figure (block mean, or the overviews of
+#   the GeoTIFF) before they are drawn.
+# - render() draws independent figures in a process pool and skips every figure whose
+#   inputs are unchanged since it was last drawn (key stored next to the PNG).
+#
+# A figure is (function, path, kwargs); the function draws and saves to `path` and must be
+# importable at module level so it can be sent to a worker.
+###########################################
+
+FIGSIZE = (12, 5)
+DPI = 300
+
+
+def pixel_budget(figsize=FIGSIZE, dpi=DPI):
+    """Pixels along the width of the figure (upper bound on the points a line can show)."""
+    return int(figsize[0] * dpi)
+
+
+###########################################
+# Time series
+###########################################
+
+def decimate(df, max_points, how="minmax"):
+    """At most `max_points` rows of `df` (snapshots x columns).
+
+    minmax: per bucket the minimum and maximum of every column, in the order they occur
+            (stamped at the start and middle of the bucket), so extremes are kept exactly.
+    mean:   per bucket the mean (for stacked areas, where min/max of parts do not add up).
+    """
+    if len(df) <= max_points:
+        return df
+    n_buckets = max_points // 2 if how == "minmax" else max_points
+    size = math.ceil(len(df) / n_buckets)
+    n_buckets = math.ceil(len(df) / size)
+
+    values = df.to_numpy(dtype=float)
+    padded = np.full((n_buckets * size, values.shape[1]), np.nan)
+    padded[: len(values)] = values
+    blocks = padded.reshape(n_buckets, size, values.shape[1])
+    starts = np.arange(n_buckets) * size
+
+    if how == "mean":
+        return pd.DataFrame(np.nanmean(blocks, axis=1), index=df.index[starts], columns=df.columns)
+
+    filled_lo = np.where(np.isnan(blocks), np.inf, blocks)
+    filled_hi = np.where(np.isnan(blocks), -np.inf, blocks)
+    i_min, i_max = filled_lo.argmin(axis=1), filled_hi.argmax(axis=1)
+    lo = np.take_along_axis(blocks, i_min[:, None], axis=1)[:, 0]
+    hi = np.take_along_axis(blocks, i_max[:, None], axis=1)[:, 0]
+    first = np.where(i_min <= i_max, lo, hi)
+    second = np.where(i_min <= i_max, hi, lo)
+
+    middles = np.minimum(starts + size // 2, len(df) - 1)
+    index = df.index[np.ravel(np.column_stack([starts, middles]))]
+    return pd.DataFrame(np.stack([first, second], axis=1).reshape(-1, values.shape[1]), index=index, columns=df.columns)
+
+
+def line_figure(path, df, ylabel, xlabel="Time", title=None, figsize=FIGSIZE, dpi=DPI,
+                legend=None, hline=None, how="minmax"):
+    """Line plot of all columns of `df`, decimated to the pixel width of the figure."""
+    df = decimate(df.to_frame() if isinstance(df, pd.Series) else df, pixel_budget(figsize, dpi), how)
+    ax = df.plot(figsize=figsize)
+    if hline is not None:
+        ax.axhline(hline, linewidth=1)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if title:
+        ax.set_title(title)
+    ax.legend(**(legend or {}))
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi)
+    plt.close()
+
+
+def stack_figure(path, stacked, line, ylabel, xlabel="Time", title=None, figsize=FIGSIZE, dpi=DPI, legend=None):
+    """Stacked areas of the columns of `stacked` plus the series `line`, mean-decimated."""
+    data = decimate(pd.concat([stacked, line], axis=1), pixel_budget(figsize, dpi), how="mean")
+    plt.figure(figsize=figsize)
+    plt.stackplot(data.index, *(data[c].values for c in stacked.columns), labels=list(stacked.columns))
+    plt.plot(data.index, data[line.name].values, label=line.name)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    if title:
+        plt.title(title)
+    plt.legend(**(legend or {}))
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi)
+    plt.close()
+
+
+###########################################
+# Rasters
+###########################################
+
+def downsample_band(band, transform, max_pixels):
+    """Block mean of `band` so that its longer side has at most `max_pixels` pixels."""
+    factor = max(1, math.ceil(max(band.shape) / max_pixels))
+    if factor == 1:
+        return band, transform
+    rows, cols = math.ceil(band.shape[0] / factor), math.ceil(band.shape[1] / factor)
+    padded = np.zeros((rows * factor, cols * factor), dtype=np.float32)
+    counts = np.zeros_like(padded)
+    padded[: band.shape[0], : band.shape[1]] = band
+    counts[: band.shape[0], : band.shape[1]] = 1
+    sums = padded.reshape(rows, factor, cols, factor).sum(axis=(1, 3))
+    n = counts.reshape(rows, factor, cols, factor).sum(axis=(1, 3))
+    return sums / np.maximum(n, 1), transform * Affine.scale(factor, factor)
+
+
+###########################################
+# Rendering
+###########################################
+
+def update_code_hash(h, code):
+    """Add bytecode, constants and names of `code` (and of nested functions) to the hash `h`.
+    Nested code objects are hashed by content, their repr holds a memory address."""
+    h.update(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            update_code_hash(h, const)
+        else:
+            h.update(repr(const).encode())
+    h.update(repr(code.co_names).encode())
+
+
+def figure_key(func, kwargs):
+    """Hash of the drawing function (name and bytecode, so editing it redraws) and all its inputs."""
+    h = hashlib.sha1(f"{func.__module__}.{func.__qualname__}".encode())
+    update_code_hash(h, func.__code__)
+    for name in sorted(kwargs):
+        value = kwargs[name]
+        h.update(name.encode())
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+            h.update(pickle.dumps((list(getattr(value, "columns", [value.name])), value.index.name)))
+        elif isinstance(value, np.ndarray):
+            h.update(value.tobytes())
+        else:
+            h.update(pickle.dumps(value))
+    return h.hexdigest()
+
+
+def _key_path(path):
+    path = Path(path)
+    return path.with_name(path.name + ".key")
+
+
+def is_current(path, key):
+    return Path(path).exists() and _key_path(path).exists() and _key_path(path).read_text() == key
+
+
+def mark_current(path, key):
+    _key_path(path).write_text(key)
+
+
+def _draw(func, path, kwargs):
+    func(path, **kwargs)
+    return path
+
+
+def render(figures, max_workers=None, force=False):
+    """Draw the (func, path, kwargs) figures whose inputs changed. Returns the drawn paths.
+
+    max_workers=1 draws in this process (e.g. when already running inside a worker).
+    """
+    todo = []
+    for func, path, kwargs in figures:
+        key = figure_key(func, kwargs)
+        if force or not is_current(path, key):
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            todo.append((func, path, kwargs, key))
+
+    if max_workers == 1 or len(todo) <= 1:
+        drawn = [_draw(func, path, kwargs) for func, path, kwargs, _ in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=matplotlib.use, initargs=("Agg",)) as pool:
+            futures = [pool.submit(_draw, func, path, kwargs) for func, path, kwargs, _ in todo]
+            drawn = [f.result() for f in futures]
+
+    for _, path, _, key in todo:
+        mark_current(path, key)
+    return drawn
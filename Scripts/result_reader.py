@@ -0,0 +1,192 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import xarray as xr
+
+###########################################
+# Lazy reader for result networks (n_<scenario>.nc)
+#
+# pypsa.Network(path) loads every static and time-varying table. The reader opens the
+# NetCDF file lazily and only reads the variables a metric asks for:
+#
+#   with ResultReader("../results/n_<scenario>.nc") as r:
+#       r.objective, r.static("generators", "p_nom_opt"), r.series("links", "p0")
+#
+# Layout of the PyPSA export: static attributes are "<list_name>_<attr>" (dimension
+# "<list_name>_i"), time series "<list_name>_t_<attr>" (dimensions "snapshots" and
+# "<list_name>_t_<attr>_i"), network attributes are "network_<attr>" in ds.attrs.
+###########################################
+
+SNAPSHOT_CHUNK = 744 #one month of hours per chunk if dask is installed
+
+try:
+    import dask  # noqa: F401
+    CHUNKS = {"snapshots": SNAPSHOT_CHUNK}
+except ImportError:
+    CHUNKS = None #variables are still read lazily, but each one at once
+
+
+class ResultReader:
+    def __init__(self, path, chunks=CHUNKS):
+        self.path = Path(path)
+        self.ds = xr.open_dataset(self.path, chunks=chunks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.ds.close()
+
+    @property
+    def objective(self):
+        return float(self.ds.attrs.get("network_objective", float("nan")))
+
+    @property
+    def meta(self):
+        meta = self.ds.attrs.get("meta", self.ds.attrs.get("network_meta", "{}"))
+        return json.loads(meta) if isinstance(meta, str) else dict(meta)
+
+    def has(self, list_name, attr, series=False):
+        return f"{list_name}_t_{attr}" in self.ds if series else f"{list_name}_{attr}" in self.ds
+
+    def static(self, list_name, attr):
+        """Static attribute as a Series (empty if the component or attribute is not in the file)."""
+        name = f"{list_name}_{attr}"
+        if name not in self.ds:
+            return pd.Series(dtype=float, name=attr)
+        return self.ds[name].to_series().rename(attr).rename_axis(None)
+
+    def series_lazy(self, list_name, attr):
+        """Time series as a lazy DataArray (snapshots x components), None if not in the file."""
+        name = f"{list_name}_t_{attr}"
+        if name not in self.ds:
+            return None
+        return self.ds[name].rename({f"{name}_i": "component"})
+
+    def series(self, list_name, attr):
+        """Time series as a DataFrame (snapshots x components)."""
+        da = self.series_lazy(list_name, attr)
+        if da is None:
+            return pd.DataFrame(index=self.snapshots)
+        return da.to_pandas()
+
+    @property
+    def snapshots(self):
+        return self.ds.indexes["snapshots"]
+
+    def weightings(self, column="generators"):
+        name = f"snapshots_{column}" #PyPSA exports the weightings as snapshots_objective/_generators/_stores
+        if name in self.ds:
+            return self.ds[name]
+        return xr.DataArray(pd.Series(1.0, index=self.snapshots).rename_axis("snapshots"))
+
+    def weighted_sum(self, list_name, attr, column="generators"):
+        """Sum over the snapshots, weighted; computed chunk by chunk without loading the full table."""
+        da = self.series_lazy(list_name, attr)
+        if da is None:
+            return pd.Series(dtype=float)
+        return (da * self.weightings(column)).sum("snapshots").to_series()
+
+
+###########################################
+# Metrics: each one reads only what it needs
+###########################################
+
+def objective(r):
+    return r.objective
+
+
+def capacity_by_carrier(r):
+    """Optimal power capacity in GW per carrier of the generators and storage units."""
+    frames = []
+    for list_name in ["generators", "storage_units"]:
+        p_nom = r.static(list_name, "p_nom_opt")
+        if not p_nom.empty:
+            frames.append(p_nom.groupby(r.static(list_name, "carrier")).sum())
+    return pd.concat(frames).groupby(level=0).sum().div(1e3) if frames else pd.Series(dtype=float)
+
+
+def link_capacity_by_carrier(r):
+    """Optimal link capacity in GW per carrier (transmission and the chargers/dischargers
+    of continuous storage), reported apart from the generation/storage capacity."""
+    p_nom = r.static("links", "p_nom_opt")
+    return p_nom.groupby(r.static("links", "carrier")).sum().div(1e3) if not p_nom.empty else p_nom
+
+
+def energy_capacity_by_carrier(r):
+    """Optimal energy capacity of the stores in GWh per carrier (continuous storage)."""
+    e_nom = r.static("stores", "e_nom_opt")
+    return e_nom.groupby(r.static("stores", "carrier")).sum().div(1e3) if not e_nom.empty else e_nom
+
+
+def link_capacity(r):
+    """Optimal capacity in GW per link (transmission and storage chargers/dischargers)."""
+    return r.static("links", "p_nom_opt").div(1e3) # GW
+
+
+def co2_price(r):
+    mu = r.static("global_constraints", "mu")
+    return -mu.get("emission_limit", float("nan"))
+
+
+def generation_by_carrier(r):
+    """Generation in TWh per carrier."""
+    p = r.weighted_sum("generators", "p")
+    return p.groupby(r.static("generators", "carrier")).sum().div(1e6)
+
+
+def curtailment_by_carrier(r):
+    """Available minus dispatched energy in TWh for generators with a p_max_pu time series."""
+    p_max_pu = r.series_lazy("generators", "p_max_pu")
+    if p_max_pu is None:
+        return pd.Series(dtype=float)
+    gens = p_max_pu.indexes["component"]
+    p_nom = xr.DataArray(r.static("generators", "p_nom_opt").reindex(gens).values, coords={"component": gens})
+    p = r.series_lazy("generators", "p").sel(component=gens)
+    curtailed = ((p_max_pu * p_nom - p) * r.weightings()).sum("snapshots").to_series()
+    return curtailed.groupby(r.static("generators", "carrier").reindex(gens)).sum().div(1e6)
+
+
+def average_price(r):
+    """Mean marginal price of the AC buses."""
+    mean = r.series_lazy("buses", "marginal_price").mean("snapshots").to_series()
+    carrier = r.static("buses", "carrier").reindex(mean.index)
+    return mean[carrier.eq("AC").values]
+
+
+METRICS = {
+    "objective": objective,
+    "capacity_GW": capacity_by_carrier,
+    "link_capacity_GW": link_capacity_by_carrier,
+    "energy_capacity_GWh": energy_capacity_by_carrier,
+    "co2_price_EUR_per_t": co2_price,
+}
+
+
+def read_kpis(path, metrics=METRICS):
+    """{metric: value} of one result file; Series are flattened to "<metric>|<key>"."""
+    row = {"scenario": Path(path).stem}
+    with ResultReader(path) as r:
+        scenario = r.meta.get("scenario")
+        if scenario:
+            row.update(pd.json_normalize(scenario, sep=".").iloc[0].to_dict())
+        for name, metric in metrics.items():
+            value = metric(r)
+            if isinstance(value, pd.Series):
+                row.update({f"{name}|{k}": v for k, v in value.items()})
+            else:
+                row[name] = value
+    return row
+
+
+def scan_kpis(paths, metrics=METRICS, max_workers=None):
+    """One row per result file. Only the variables the metrics use are read."""
+    paths = [Path(p) for p in paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        rows = list(pool.map(read_kpis, paths, [metrics] * len(paths)))
+    return pd.DataFrame(rows).set_index("scenario").sort_index()
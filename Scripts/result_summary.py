@@ -0,0 +1,145 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pypsa
+
+from analytics import weighted_quantiles
+
+###########################################
+# PATHS
+###########################################
+
+SUMMARY_DIR = "../results/summary"
+DISPATCH_SUMMARY_DIR = "../results/summary_dispatch" #rolling dispatch runs (network_dispatch.py)
+
+###########################################
+# Compact summary of a solved network
+#
+# Written next to the full NetCDF export, a few hundred kB instead of hundreds of MB:
+#
+#   summary/<result stem>/summary.json        version, scenario, objective, CO2 dual, demand
+#                        /capacity.parquet     bus x carrier, MW
+#                        /energy_balance.parquet
+#                        /curtailment.parquet  carrier, MWh
+#                        /prices.parquet       bus x statistic, €/MWh (weighted by the snapshot weightings)
+#                        /soc.parquet          daily mean state of charge, MWh (mean per representative
+#                                              period for typical-period runs)
+#
+# read_summaries() collects all of them into one table keyed by the scenario parameters.
+# Rolling dispatch runs go to summary_dispatch/ with "mode": "dispatch" in summary.json, so
+# they never show up as duplicates of the expansion run whose capacities they use.
+# Bump SUMMARY_VERSION whenever the content changes; readers skip other versions.
+###########################################
+
+SUMMARY_VERSION = 2
+PRICE_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+SOC_RESAMPLE = "D"
+
+
+def summary_dir(result_path, root=SUMMARY_DIR):
+    return Path(root) / Path(result_path).stem
+
+
+def _frame(series, value="value"):
+    return series.rename(value).reset_index()
+
+
+def price_statistics(n):
+    mp = n.buses_t.marginal_price[n.buses.index[n.buses.carrier == "AC"]] #without the store buses
+    values = mp.to_numpy()
+    w = n.snapshot_weightings.objective.reindex(mp.index).to_numpy() #hours each snapshot stands for
+    mean = w @ values / w.sum()
+    stats = pd.DataFrame(
+        {
+            "mean": mean,
+            "std": np.sqrt(w @ (values - mean) ** 2 / w.sum()),
+            "min": values.min(axis=0),
+            "max": values.max(axis=0),
+            **{f"q{int(q * 100)}": v for q, v in zip(PRICE_QUANTILES, weighted_quantiles(values, w, PRICE_QUANTILES))},
+            "hours_zero_or_negative": w @ (values <= 0),
+        },
+        index=mp.columns.rename("bus"),
+    )
+    return stats.reset_index()
+
+
+def soc_profiles(n):
+    """Daily mean state of charge of storage units and stores (float32).
+
+    Typical-period runs have (period, timestep) snapshots: one mean per representative period.
+    """
+    soc = pd.concat([n.storage_units_t.state_of_charge, n.stores_t.e], axis=1)
+    if isinstance(soc.index, pd.MultiIndex):
+        return soc.groupby(level="period").mean().astype("float32")
+    return soc.resample(SOC_RESAMPLE).mean().astype("float32").rename_axis("snapshot")
+
+
+def summarize(n):
+    """(header, {table name: DataFrame}) of a solved network."""
+    mu = n.global_constraints["mu"] if "mu" in n.global_constraints else pd.Series(dtype=float)
+    demand = n.snapshot_weightings.generators @ n.loads_t.p_set.sum(axis=1)
+    header = {
+        "version": SUMMARY_VERSION,
+        "pypsa_version": pypsa.__version__,
+        "scenario": n.meta.get("scenario", {}),
+        "solver": n.meta.get("solver", {}),
+        "objective": float(n.objective),
+        "co2_dual": {k: float(v) for k, v in mu.items()},
+        "demand_MWh": float(demand),
+        "snapshots": len(n.snapshots),
+    }
+    tables = {
+        "capacity": pd.concat(
+            {
+                "p_nom": n.statistics.installed_capacity(groupby=["bus", "carrier"]),
+                "p_nom_opt": n.statistics.optimal_capacity(groupby=["bus", "carrier"]),
+            },
+            axis=1,
+        ).reset_index(),
+        "energy_balance": _frame(n.statistics.energy_balance(groupby=["bus", "carrier"]), "MWh"),
+        "curtailment": _frame(n.statistics.curtailment(groupby="carrier"), "MWh"),
+        "prices": price_statistics(n),
+        "soc": soc_profiles(n),
+    }
+    return header, tables
+
+
+def write_summary(n, result_path, root=SUMMARY_DIR, **header):
+    """Write the summary of `n` (extra `header` entries, e.g. status, go into summary.json)."""
+    outdir = summary_dir(result_path, root)
+    outdir.mkdir(parents=True, exist_ok=True)
+    head, tables = summarize(n)
+    head.update(header, result=str(result_path))
+    for name, table in tables.items():
+        table.to_parquet(outdir / f"{name}.parquet", compression="zstd")
+    (outdir / "summary.json").write_text(json.dumps(head, indent=1, default=str))
+    return outdir
+
+
+def read_summary(path, tables=()):
+    """summary.json of one summary folder, plus the requested tables."""
+    path = Path(path)
+    head = json.loads((path / "summary.json").read_text())
+    return head, {name: pd.read_parquet(path / f"{name}.parquet") for name in tables}
+
+
+def read_summaries(root=SUMMARY_DIR, mode="expansion"):
+    """One row per summary: flattened scenario parameters, objective, CO2 dual and demand.
+
+    mode: "expansion" (capacity expansion runs) or "dispatch" (objective = operating cost).
+    """
+    rows = []
+    for path in sorted(Path(root).glob("*/summary.json")):
+        head, _ = read_summary(path.parent)
+        if head.get("version") != SUMMARY_VERSION or head.get("mode", "expansion") != mode:
+            continue
+        rows.append({
+            "summary": path.parent.name,
+            **(pd.json_normalize(head["scenario"], sep=".").iloc[0].to_dict() if head["scenario"] else {}),
+            "objective": head["objective"],
+            **{f"co2_dual|{k}": v for k, v in head["co2_dual"].items()},
+            "demand_MWh": head["demand_MWh"],
+        })
+    return pd.DataFrame(rows).set_index("summary") if rows else pd.DataFrame()
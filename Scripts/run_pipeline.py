@@ -0,0 +1,283 @@
+import argparse
+import hashlib
+import json
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+###########################################
+# PATHS
+###########################################
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+STATE_PATH = SCRIPTS_DIR / "../Data/processed/.pipeline_state.json"
+
+RAW = "../Data/raw"
+PROC = "../Data/processed"
+
+###########################################
+# Stages
+#
+# script: run with the Scripts folder as working directory
+# inputs / outputs: files or folders (content hashed), relative to the Scripts folder
+# after: stages that have to run first although no file connects them
+# Parameters live in the INPUT section of each script; the script and every local
+# module it imports are part of the stage hash, so editing them makes the stage stale.
+###########################################
+
+STAGES = {
+    "regions": {
+        "script": "01a_regions_define.py",
+        "inputs": [f"{RAW}/gadm", f"{RAW}/marineregions/eez_v11.gpkg"],
+        "outputs": [
+            f"{PROC}/geometry",
+            f"{PROC}/region_centroids_etr.csv",
+            f"{PROC}/region_centroids_wsg.csv",
+            f"{PROC}/region_links.csv",
+        ],
+    },
+    "eligibility": { #02a prepares the shared exclusion sources once, then runs the technologies in parallel
+        "script": "02a_eligibility_all.py",
+        "inputs": [
+            f"{PROC}/geometry/regions_3035.parquet",
+            f"{PROC}/geometry/eez_by_region_3035.parquet",
+            f"{RAW}/gadm/gadm_410-levels-ADM_1-DNK.gpkg",
+            f"{RAW}/copernicus/PROBAV_LC100_global_v3.0.1_2019-nrt_Discrete-Classification-map_EPSG-4326-DK.tif",
+            f"{RAW}/wdpa/WDPA_Oct2022_Public_shp-DNK.tif",
+            f"{RAW}/gebco/GEBCO_2014_2D-DK.nc",
+            f"{RAW}/ne_10m_airports.gpkg",
+            f"{RAW}/ne_10m_roads.gpkg",
+        ],
+        "outputs": [
+            f"{PROC}/eligibility/eligible_pv_areas_DK.tif",
+            f"{PROC}/eligibility/eligible_wind_on_areas_DK.tif",
+            f"{PROC}/eligibility/eligible_wind_off_areas_DK.tif",
+        ],
+    },
+    "capacity_factors": {
+        "script": "02d_capacity factor.py",
+        "inputs": [
+            f"{PROC}/geometry/regions_3035.parquet",
+            f"{PROC}/geometry/eez_by_region_3035.parquet",
+            f"{PROC}/eligibility/eligible_pv_areas_DK.tif",
+            f"{PROC}/eligibility/eligible_wind_on_areas_DK.tif",
+            f"{PROC}/eligibility/eligible_wind_off_areas_DK.tif",
+        ],
+        "outputs": [f"{PROC}/dk_re_max_potentials_by_region.csv", f"{PROC}/dk_re_cf_timeseries"],
+    },
+    "load": {
+        "script": "03_load.py",
+        "inputs": [f"{RAW}/load/load.csv", f"{PROC}/geometry/regions_3035.parquet", f"{RAW}/gadm/gadm_410-levels-ADM_1-DNK.gpkg"],
+        "outputs": [f"{PROC}/load_regions.csv", f"{PROC}/load_regions.parquet"],
+    },
+    "costs": {
+        "script": "03_costs.py",
+        "inputs": [f"{RAW}/costs"],
+        "outputs": [f"{PROC}/costs_2030.csv"],
+    },
+    "powerplants": {
+        "script": "03_conventional_PP.py",
+        "inputs": [f"{RAW}/powerplants/global_power_plant_database.csv", f"{PROC}/geometry/regions_3035.parquet"],
+        "outputs": [f"{PROC}/dk_powerplants_with_region.csv"],
+    },
+    "re_plots": {
+        "script": "02e_re_potential_plots.py",
+        "inputs": [f"{PROC}/dk_re_max_potentials_by_region.csv", f"{PROC}/dk_re_cf_timeseries", f"{PROC}/load_regions.parquet"],
+        "outputs": [],
+    },
+    "model": {
+        "script": "03_pypsa_model.py",
+        "inputs": [
+            f"{PROC}/costs_2030.csv",
+            f"{PROC}/dk_powerplants_with_region.csv",
+            f"{PROC}/region_centroids_wsg.csv",
+            f"{PROC}/region_links.csv",
+            f"{PROC}/load_regions.parquet",
+            f"{PROC}/dk_re_cf_timeseries",
+            f"{PROC}/dk_re_max_potentials_by_region.csv",
+        ],
+        "outputs": [], #file name depends on the scenario in the INPUT section
+    },
+    "analysis": {
+        "script": "04b_Analysis.py",
+        "inputs": [],
+        "outputs": [],
+        "after": ["model"],
+    },
+}
+
+
+###########################################
+# Hashing
+###########################################
+
+def _file_hash(path, cache):
+    """SHA-256 of a file, reused from the state while size and mtime are unchanged."""
+    stat = path.stat()
+    key = str(path.resolve())
+    entry = cache.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+        return entry["hash"]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    cache[key] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "hash": h.hexdigest()}
+    return h.hexdigest()
+
+
+def resolve(path):
+    """Stage paths are relative to the Scripts folder, whatever the working directory."""
+    return (SCRIPTS_DIR / path).resolve()
+
+
+def path_hash(path, cache):
+    """Hash of a file or of all files in a folder; None if it does not exist."""
+    path = resolve(path)
+    if path.is_file():
+        return _file_hash(path, cache)
+    if path.is_dir():
+        h = hashlib.sha256()
+        for p in sorted(q for q in path.rglob("*") if q.is_file()):
+            h.update(str(p.relative_to(path)).encode())
+            h.update(_file_hash(p, cache).encode())
+        return h.hexdigest()
+    return None
+
+
+def local_modules(script, seen=None):
+    """The script and every module of the Scripts folder it imports, recursively."""
+    seen = set() if seen is None else seen
+    path = SCRIPTS_DIR / script
+    if path in seen or not path.exists():
+        return seen
+    seen.add(path)
+    for name in re.findall(r"^\s*(?:from|import)\s+(\w+)", path.read_text(encoding="utf-8"), re.MULTILINE):
+        local_modules(f"{name}.py", seen)
+    return seen
+
+
+def stage_hash(name, state, cache):
+    stage = STAGES[name]
+    key = {
+        "code": {p.name: _file_hash(p, cache) for p in sorted(local_modules(stage["script"]))},
+        "inputs": {p: path_hash(p, cache) for p in stage["inputs"]},
+        "after": {a: state["stages"].get(a) for a in stage.get("after", [])},
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+###########################################
+# Scheduling
+###########################################
+
+def dependencies(name):
+    """Stages that produce an input of `name` (the file itself or its folder), plus its `after` stages."""
+    inputs = [resolve(p) for p in STAGES[name]["inputs"]]
+    producers = {
+        other for other, stage in STAGES.items()
+        if other != name and any(p.is_relative_to(out) for p in inputs for out in map(resolve, stage["outputs"]))
+    }
+    return producers | set(STAGES[name].get("after", []))
+
+
+def with_upstream(targets):
+    todo, selected = list(targets), set()
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(dependencies(name))
+    return selected
+
+
+def load_state():
+    if Path(STATE_PATH).exists():
+        return json.loads(Path(STATE_PATH).read_text())
+    return {"stages": {}, "files": {}}
+
+
+def save_state(state):
+    Path(STATE_PATH).parent.mkdir(parents=True, exist_ok=True)
+    Path(STATE_PATH).write_text(json.dumps(state, indent=1, sort_keys=True))
+
+
+def is_up_to_date(name, state):
+    outputs_exist = all(resolve(p).exists() for p in STAGES[name]["outputs"])
+    return outputs_exist and state["stages"].get(name) == stage_hash(name, state, state["files"])
+
+
+def run_stage(name):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, STAGES[name]["script"]], cwd=SCRIPTS_DIR)
+    return proc.returncode, time.perf_counter() - start
+
+
+def run(targets=None, jobs=4, force=False, dry_run=False):
+    """Run the stale stages among `targets` (all if None) and their upstream stages.
+
+    A stage becomes ready once all its dependencies are done; ready stages run concurrently
+    (e.g. load/costs/powerplants). A stage is skipped if its outputs exist and the hash over
+    its code, inputs and `after` stages is unchanged. In a dry run every stage downstream of
+    a stale one is reported stale as well, since it would run after it.
+    """
+    state = load_state()
+    selected = with_upstream(targets or list(STAGES))
+    pending = {name: dependencies(name) & selected for name in selected}
+    done, failed, stale, running = set(), set(), set(), {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in sorted(n for n, deps in pending.items() if deps <= done):
+                deps = dependencies(name) & selected
+                del pending[name]
+                if not force and not deps & stale and is_up_to_date(name, state):
+                    print(f"[skip] {name} is up to date")
+                    done.add(name)
+                elif dry_run:
+                    print(f"[stale] {name}")
+                    stale.add(name)
+                    done.add(name)
+                else:
+                    print(f"[run ] {name} ({STAGES[name]['script']})")
+                    running[pool.submit(run_stage, name)] = name
+
+            blocked = [n for n, deps in pending.items() if deps & failed]
+            for name in blocked:
+                print(f"[fail] {name}: upstream stage failed")
+                failed.add(name)
+                del pending[name]
+
+            if not running:
+                if pending and not any(deps <= done for deps in pending.values()):
+                    raise RuntimeError(f"Cyclic stage dependencies: {sorted(pending)}")
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                returncode, seconds = future.result()
+                if returncode == 0:
+                    state["stages"][name] = stage_hash(name, state, state["files"])
+                    save_state(state)
+                    print(f"[done] {name} in {seconds:.1f} s")
+                    done.add(name)
+                else:
+                    print(f"[fail] {name} exited with {returncode}")
+                    failed.add(name)
+
+    save_state(state)
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stale stages of the Scripts pipeline.")
+    parser.add_argument("targets", nargs="*", help=f"stages to bring up to date (default: all), from {list(STAGES)}")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="stages run at the same time")
+    parser.add_argument("-f", "--force", action="store_true", help="run the selected stages even if up to date")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="only list the stale stages")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.targets, args.jobs, args.force, args.dry_run) else 1)
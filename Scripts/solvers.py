@@ -0,0 +1,129 @@
+import functools
+
+import linopy
+
+###########################################
+# Solver selection
+###########################################
+
+# first available solver is used if none is requested
+SOLVER_PREFERENCE = ["gurobi", "highs", "cbc", "glpk"]
+
+# solvers that can write a basis and start from it (used for warm-started sweeps)
+WARMSTART_SOLVERS = ["gurobi", "highs"]
+
+# above this number of snapshot x component pairs the LP counts as large:
+# barrier without crossover is much faster than simplex there
+LARGE_LP = 100_000
+
+
+@functools.lru_cache(maxsize=None)
+def gurobi_licensed():
+    """gurobipy also imports without a licence and then only solves models of up to 2000
+    variables, so solve an empty model just above that limit once."""
+    try:
+        import gurobipy
+        with gurobipy.Env(params={"OutputFlag": 0}) as env, gurobipy.Model(env=env) as m:
+            m.addVars(2001)
+            m.optimize()
+        return True
+    except Exception:
+        return False
+
+
+def available_solvers():
+    available = [s for s in SOLVER_PREFERENCE if s in linopy.available_solvers]
+    if "gurobi" in available and not gurobi_licensed():
+        available.remove("gurobi")
+    return available
+
+
+def select_solver(solver_name=None):
+    """Return `solver_name` if it is installed, otherwise the first available solver."""
+    available = available_solvers()
+    if not available:
+        raise RuntimeError(f"None of the solvers {SOLVER_PREFERENCE} is installed.")
+    if solver_name is None:
+        return available[0]
+    if solver_name not in available:
+        raise RuntimeError(f"Solver '{solver_name}' is not installed. Available: {available}")
+    return solver_name
+
+
+def is_large(n, snapshots=None):
+    """Size of the LP over `snapshots` (default: all snapshots of `n`)."""
+    components = len(n.generators) + len(n.links) + len(n.storage_units) + len(n.stores)
+    n_snapshots = len(n.snapshots if snapshots is None else snapshots)
+    return n_snapshots * components > LARGE_LP
+
+
+###########################################
+# Tuned default options per solver
+###########################################
+
+def solver_options(solver_name, threads=None, large=True, warmstart=False, basis=False):
+    """Default options for `solver_name`.
+
+    large: barrier without crossover (duals are still available, the basis is not).
+    warmstart: simplex, which can start from a previous basis.
+    basis: a basis is needed afterwards (basis_fn), so barrier keeps its crossover.
+    """
+    if solver_name == "gurobi":
+        options = {"LogToConsole": 0, "Presolve": 2}
+        if warmstart:
+            options["Method"] = 1 #dual simplex
+        elif large:
+            options.update({"Method": 2, "BarConvTol": 1e-6})
+            if not basis:
+                options["Crossover"] = 0
+        if threads:
+            options["Threads"] = threads
+    elif solver_name == "highs":
+        options = {"log_to_console": False, "presolve": "on"}
+        if warmstart:
+            options["solver"] = "simplex"
+        elif large:
+            options.update({"solver": "ipm", "ipm_optimality_tolerance": 1e-6})
+            options["run_crossover"] = "on" if basis else "off"
+        if threads:
+            options.update({"threads": threads, "parallel": "on"})
+    elif solver_name == "cbc":
+        options = {"presolve": "on"}
+        if threads:
+            options["threads"] = threads
+    else:
+        options = {} #glpk: single-threaded simplex, no tuning knobs worth setting
+    return options
+
+
+def solve(n, solver_name=None, threads=None, warmstart_fn=None, basis_fn=None, log_fn=None, reuse_model=True, large=None, **kwargs):
+    """Solve `n` with the selected solver and tuned options.
+
+    If the network already holds a model (n.optimize.create_model or a previous solve)
+    that model is solved again, otherwise a new one is built. The solver and options
+    are stored in n.meta and therefore end up in the exported result file.
+    log_fn: file for the solver log (parsed by instrumentation.parse_solver_log).
+    reuse_model=False always builds a new model (e.g. for the next window of a rolling dispatch).
+    large: barrier options, by default from the size of the LP over the solved snapshots.
+    """
+    solver_name = select_solver(solver_name)
+    warmstart = warmstart_fn is not None and solver_name in WARMSTART_SOLVERS
+    if large is None:
+        large = is_large(n, kwargs.get("snapshots"))
+    basis = basis_fn is not None and solver_name in WARMSTART_SOLVERS
+    options = solver_options(solver_name, threads=threads, large=large, warmstart=warmstart, basis=basis)
+
+    if solver_name in WARMSTART_SOLVERS:
+        if basis_fn is not None:
+            kwargs["basis_fn"] = basis_fn
+        if warmstart:
+            kwargs["warmstart_fn"] = warmstart_fn
+
+    if log_fn is not None:
+        kwargs["log_fn"] = str(log_fn)
+
+    n.meta["solver"] = {"solver_name": solver_name, "solver_options": options, "warmstart": warmstart}
+
+    if reuse_model and getattr(n, "model", None) is not None:
+        return n.optimize.solve_model(solver_name=solver_name, solver_options=options, assign_all_duals=True, **kwargs)
+    return n.optimize(solver_name=solver_name, solver_options=options, assign_all_duals=True, **kwargs)
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, linkage
+
+###########################################
+# Time series aggregation of the model inputs
+#
+# Two methods, selected with the scenario entry "time_aggregation":
+#   {"method": "resample", "hours": 3}
+#       N-hourly averages. Chronology is kept, so cyclic storage behaves as in the full model.
+#   {"method": "typical_periods", "n_periods": 12, "period_hours": 24}
+#       k representative days/weeks from hierarchical (Ward) clustering of the normalized
+#       load and capacity factor profiles. Each representative is the medoid of its cluster
+#       and gets the cluster size as weight. The snapshots become a (period, timestep)
+#       MultiIndex and storage is cyclic within each representative period, so storage
+#       cannot shift energy between periods (seasonal hydrogen storage is underestimated;
+#       use "resample" when that matters).
+###########################################
+
+
+def aggregation_tag(time_aggregation):
+    """Suffix for the scenario name."""
+    if not time_aggregation:
+        return ""
+    if time_aggregation["method"] == "resample":
+        return f"_TA{time_aggregation['hours']}h"
+    return f"_TP{time_aggregation['n_periods']}x{time_aggregation['period_hours']}h"
+
+
+def _weightings(objective, stores):
+    return pd.DataFrame({"objective": objective, "generators": objective, "stores": stores})
+
+
+def resample(loads, re_cf, hours):
+    """N-hourly means. Returns loads, re_cf and the snapshot weightings (hours per snapshot)."""
+    rule = f"{hours}h"
+    hours_per_snapshot = loads.iloc[:, 0].resample(rule).count().astype(float)
+    weightings = _weightings(hours_per_snapshot, hours_per_snapshot)
+    return loads.resample(rule).mean(), re_cf.resample(rule).mean(), weightings
+
+
+def typical_periods(loads, re_cf, n_periods, period_hours=24):
+    """k representative periods of `period_hours` hours (medoids of a Ward clustering)."""
+    n_complete = len(loads) // period_hours
+    used = n_complete * period_hours #an incomplete last period is dropped, its hours are spread over the weights
+
+    profiles = pd.concat([loads.drop(columns="DK", errors="ignore"), re_cf], axis=1).iloc[:used]
+    profiles = profiles / profiles.abs().max().replace(0, 1)
+    X = profiles.to_numpy().reshape(n_complete, -1) #one row per period
+
+    labels = fcluster(linkage(X, method="ward"), t=n_periods, criterion="maxclust")
+
+    medoids, occurrences = [], []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        dist = np.linalg.norm(X[members] - X[members].mean(axis=0), axis=1)
+        medoids.append(members[dist.argmin()])
+        occurrences.append(len(members))
+    order = np.argsort(medoids) #keep the representatives in chronological order
+    medoids = np.asarray(medoids)[order]
+    occurrences = np.asarray(occurrences, dtype=float)[order] * len(loads) / used
+
+    rows = (medoids[:, None] * period_hours + np.arange(period_hours)).ravel()
+    snapshots = pd.MultiIndex.from_arrays(
+        [np.repeat(np.arange(1, len(medoids) + 1), period_hours), loads.index[rows]],
+        names=["period", "timestep"],
+    )
+
+    loads_agg = pd.DataFrame(loads.to_numpy()[rows], index=snapshots, columns=loads.columns)
+    re_cf_agg = pd.DataFrame(re_cf.to_numpy()[rows], index=snapshots, columns=re_cf.columns)
+
+    # flows count for every day/week the representative stands for, the state of charge only within it
+    hours_per_snapshot = (loads.index[1] - loads.index[0]) / pd.Timedelta("1h")
+    weightings = _weightings(
+        np.repeat(occurrences, period_hours) * hours_per_snapshot,
+        np.full(len(rows), hours_per_snapshot),
+    )
+    weightings.index = snapshots
+    return loads_agg, re_cf_agg, weightings
+
+
+def aggregate_inputs(inputs, time_aggregation):
+    """Copy of `inputs` with aggregated "loads" and "re_cf" plus their "snapshot_weightings"."""
+    method = time_aggregation["method"]
+    if method == "resample":
+        loads, re_cf, weightings = resample(inputs["loads"], inputs["re_cf"], time_aggregation["hours"])
+    elif method == "typical_periods":
+        loads, re_cf, weightings = typical_periods(
+            inputs["loads"], inputs["re_cf"], time_aggregation["n_periods"], time_aggregation.get("period_hours", 24)
+        )
+    else:
+        raise ValueError(f"Unknown time aggregation method '{method}'")
+    return {**inputs, "loads": loads, "re_cf": re_cf, "snapshot_weightings": weightings}
+
+
+###########################################
+# Error against the full resolution run
+###########################################
+
+def aggregation_error(n, n_full):
+    """Objective and optimal capacities by carrier of the aggregated run `n` against `n_full`."""
+    objective = pd.DataFrame(
+        {"aggregated": [n.objective], "full": [n_full.objective]},
+        index=pd.MultiIndex.from_tuples([("objective", "total")], names=["quantity", "carrier"]),
+    )
+    capacities = pd.concat(
+        {
+            "aggregated": n.statistics.optimal_capacity(groupby="carrier"),
+            "full": n_full.statistics.optimal_capacity(groupby="carrier"),
+        },
+        axis=1,
+    ).fillna(0)
+    capacities.index = pd.MultiIndex.from_tuples(
+        [("optimal_capacity_MW", idx[-1] if isinstance(idx, tuple) else idx) for idx in capacities.index],
+        names=["quantity", "carrier"],
+    )
+    capacities = capacities.groupby(level=[0, 1]).sum()
+
+    error = pd.concat([objective, capacities])
+    error["abs_error"] = error["aggregated"] - error["full"]
+    error["rel_error_%"] = 100 * error["abs_error"] / error["full"].replace(0, np.nan)
+    return error
@@ -0,0 +1,130 @@
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+###########################################
+# PATHS
+###########################################
+
+# one Parquet file per weather year: dk_re_cf_timeseries/year=<year>/data.parquet
+CF_STORE = "../Data/processed/dk_re_cf_timeseries"
+LOAD_CSV = "../Data/processed/load_regions.csv"
+LOAD_STORE = "../Data/processed/load_regions.parquet"
+
+TECHNOLOGIES = ["onwind", "offwind", "solar"]
+SEP = "|" #Parquet needs flat string column names: "<technology>|<region>"
+
+###########################################
+# Layout
+#
+# Wide tables, index = timestamp, float64 by default (float32 on request halves the size).
+# CF columns are a (technology, region) MultiIndex, load columns are the regions (+ "DK").
+# Readers only load the requested columns and hand back the frame the model/plots use directly.
+###########################################
+
+
+def _flatten(columns):
+    return [SEP.join(map(str, c)) for c in columns]
+
+
+def _unflatten(columns):
+    return pd.MultiIndex.from_tuples([tuple(c.split(SEP, 1)) for c in columns], names=["technology", "region"])
+
+
+def _write(df, path, float32):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if float32:
+        df = df.astype("float32")
+    df.to_parquet(path, engine="pyarrow", compression="zstd")
+    return path
+
+
+def align_to_snapshots(df, snapshots):
+    """Put an hourly weather-year frame on the model snapshots (hour of year), dropping 29 February."""
+    df = df[~((df.index.month == 2) & (df.index.day == 29))]
+    if len(df) != len(snapshots):
+        raise ValueError(f"Weather year has {len(df)} hours, the model {len(snapshots)} snapshots")
+    return df.set_axis(snapshots)
+
+
+###########################################
+# Capacity factors by weather year
+###########################################
+
+def cf_path(year, store=CF_STORE):
+    return Path(store) / f"year={year}" / "data.parquet"
+
+
+def write_cf(cf, year, store=CF_STORE, float32=False):
+    """Write (or replace) the CF table of one weather year.
+    `cf`: index timestamp, columns (technology, region)."""
+    cf = cf.copy()
+    cf.columns = _flatten(cf.columns)
+    cf.index.name = "timestamp"
+    return _write(cf, cf_path(year, store), float32)
+
+
+def available_years(store=CF_STORE):
+    return sorted(int(p.name.split("=")[1]) for p in Path(store).glob("year=*"))
+
+
+def cf_regions(year, store=CF_STORE):
+    """Regions stored for `year`, read from the Parquet schema only."""
+    names = pq.read_schema(cf_path(year, store)).names
+    return sorted({c.split(SEP, 1)[1] for c in names if SEP in c})
+
+
+def read_cf(year, technologies=None, regions=None, snapshots=None, store=CF_STORE, float32=False):
+    """CF table of one weather year with (technology, region) columns.
+
+    Only the requested technologies/regions are read; pairs without data (e.g. offwind of an
+    inland region) are left out. With `snapshots` the table is put on the model snapshots
+    (see align_to_snapshots).
+    """
+    path = cf_path(year, store)
+    if not path.exists():
+        raise FileNotFoundError(f"No capacity factors for weather year {year} in {store}")
+    columns = None
+    if technologies is not None or regions is not None:
+        technologies = TECHNOLOGIES if technologies is None else technologies
+        regions = cf_regions(year, store) if regions is None else regions
+        stored = set(pq.read_schema(path).names)
+        columns = [c for c in _flatten(pd.MultiIndex.from_product([technologies, regions])) if c in stored]
+
+    cf = pd.read_parquet(path, columns=columns, engine="pyarrow")
+    cf.columns = _unflatten(cf.columns)
+    if not float32:
+        cf = cf.astype("float64")
+    if snapshots is not None:
+        cf = align_to_snapshots(cf, snapshots)
+    return cf
+
+
+def read_cf_years(years=None, **kwargs):
+    """{year: CF table} for `years` (all stored years if None)."""
+    years = available_years(kwargs.get("store", CF_STORE)) if years is None else years
+    return {year: read_cf(year, **kwargs) for year in years}
+
+
+###########################################
+# Load
+###########################################
+
+def write_load(load, path=LOAD_STORE, float32=False):
+    load = load.copy()
+    load.index.name = "time"
+    return _write(load, path, float32)
+
+
+def read_load(regions=None, path=LOAD_STORE, float32=False):
+    """Load per region (index time). The store is (re)built from the CSV of 03_load.py if it
+    is missing or older than the CSV."""
+    path, csv = Path(path), Path(LOAD_CSV)
+    if not path.exists() or (csv.exists() and csv.stat().st_mtime > path.stat().st_mtime):
+        if path.exists():
+            print(f"{csv} is newer than {path}, rebuilding the load store")
+        write_load(pd.read_csv(csv, index_col="time", parse_dates=["time"]), path)
+    load = pd.read_parquet(path, columns=regions, engine="pyarrow")
+    return load if float32 else load.astype("float64")